@@ -10,16 +10,23 @@
 
 import os
 import sys
+import uuid
+import itertools
+import threading
+import subprocess
 
 import sgtk
 from sgtk.platform.qt import QtCore, QtGui
 from sgtk.util.process import subprocess_check_output, SubprocessCalledProcessError
 from ..external_command import ExternalCommand
 from ..util import create_parameter_file
+from ..runner_pool import ExternalRunnerPool, ExternalRunnerError
 from .. import file_cache
 
 logger = sgtk.platform.get_logger(__name__)
 
+task_manager = sgtk.platform.current_bundle().import_module("task_manager")
+
 
 class ExternalConfiguration(QtCore.QObject):
     """
@@ -39,6 +46,14 @@ class ExternalConfiguration(QtCore.QObject):
     # grouping used by the background task manager
     TASK_GROUP = "tk-framework-shotgunutils.external_config.ExternalConfiguration"
 
+    # priority of the tasks prefetching commands, lower than the priority of
+    # the requested commands.
+    PREFETCH_PRIORITY = -10
+
+    # how often, in seconds, a running external process checks if its task
+    # was cancelled.
+    _PROCESS_POLL_INTERVAL = 0.5
+
     # Status enums:
     CONFIGURATION_READY = 1
     CONFIGURATION_INACCESSIBLE = 2
@@ -105,6 +120,23 @@ class ExternalConfiguration(QtCore.QObject):
         self._commands_evaluated_once = False
 
         self._task_ids = {}
+        # task id -> (project_id, entity_type, link_entity_type, engine_fallback)
+        # for the tasks prefetching commands.
+        self._prefetch_task_ids = {}
+
+        # requests whose commands can be cached along with the commands of
+        # other requests, see _claim_queued_requests. Accessed from worker threads.
+        self._request_ids = itertools.count()
+        self._batch_lock = threading.Lock()
+        # request id -> request parameters, for requests whose task didn't start.
+        self._queued_requests = {}
+        # request id -> threading.Event set once the batch caching the commands
+        # of the request completed.
+        self._batched_requests = {}
+
+        # identifies this instance in the keys of the external runners it uses,
+        # see _get_runner_key.
+        self._instance_id = uuid.uuid4().hex
 
         # keep a handle to the current app/engine/fw bundle for convenience
         self._bundle = sgtk.platform.current_bundle()
@@ -225,7 +257,13 @@ class ExternalConfiguration(QtCore.QObject):
         return False
 
     def request_commands(
-        self, project_id, entity_type, entity_id, link_entity_type, engine_fallback=None
+        self,
+        project_id,
+        entity_type,
+        entity_id,
+        link_entity_type,
+        engine_fallback=None,
+        priority=None,
     ):
         """
         Request commands for the given shotgun entity.
@@ -242,6 +280,9 @@ class ExternalConfiguration(QtCore.QObject):
         :param str engine_fallback: If the main engine isn't available for the given
             entity id and project, request generate commands for the fallback engine
             specified. This can be useful in backwards compatibility scenarios.
+        :param int priority: Priority of the request, e.g. a higher priority for
+            the entity the user is currently viewing. Requests with a higher
+            priority are processed first.
 
         :raises: RuntimeError if this configuration's status does not allow for
             commands requests.
@@ -251,19 +292,76 @@ class ExternalConfiguration(QtCore.QObject):
             % (self, entity_type, entity_id, link_entity_type)
         )
 
-        # run entire command check and generation in worker
-        task_id = self._bg_task_manager.add_task(
-            self._request_commands,
-            group=self.TASK_GROUP,
-            task_kwargs={
+        request = {
+            "project_id": project_id,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "link_entity_type": link_entity_type,
+            "engine_fallback": engine_fallback,
+        }
+        self._task_ids[self._add_request_task(request, priority)] = (
+            project_id,
+            entity_type,
+            entity_id,
+            link_entity_type,
+        )
+
+    def prefetch_commands(
+        self, project_id, entity_types, link_entity_type=None, engine_fallback=None
+    ):
+        """
+        Cache the commands of the given entity types in the background, so they
+        are readily available once requested.
+
+        The commands are cached with a low priority, once the requested commands
+        are, and no signals are emitted for them. Entity types whose commands are
+        already being prefetched are skipped.
+
+        :param int project_id: Associated project id
+        :param list entity_types: Entity types to cache commands for.
+        :param str link_entity_type: Entity type that the items are linked to.
+        :param str engine_fallback: If the main engine isn't available, generate
+            commands for the fallback engine specified.
+        """
+        pending = set(self._prefetch_task_ids.values())
+        for entity_type in entity_types:
+            key = (project_id, entity_type, link_entity_type, engine_fallback)
+            if key in pending:
+                continue
+            pending.add(key)
+            logger.debug(
+                "Prefetching commands for %s: %s %s"
+                % (self, entity_type, link_entity_type)
+            )
+            request = {
                 "project_id": project_id,
                 "entity_type": entity_type,
-                "entity_id": entity_id,
+                "entity_id": None,
                 "link_entity_type": link_entity_type,
                 "engine_fallback": engine_fallback,
-            },
+            }
+            task_id = self._add_request_task(request, self.PREFETCH_PRIORITY)
+            self._prefetch_task_ids[task_id] = key
+
+    def _add_request_task(self, request, priority):
+        """
+        Queue a request for commands and add the task processing it.
+
+        :param dict request: Parameters of :meth:`_request_commands` for the request.
+        :param int priority: Priority of the request.
+        :returns: The id of the task.
+        """
+        request_id = next(self._request_ids)
+        with self._batch_lock:
+            self._queued_requests[request_id] = dict(request, priority=priority)
+
+        # run entire command check and generation in worker
+        return self._bg_task_manager.add_task(
+            self._request_commands,
+            priority=priority,
+            group=self.TASK_GROUP,
+            task_kwargs=dict(request, request_id=request_id, priority=priority),
         )
-        self._task_ids[task_id] = (project_id, entity_type, entity_id, link_entity_type)
 
     def _compute_config_hash_keys(self, entity_type, entity_id, link_entity_type):
         """
@@ -281,12 +379,25 @@ class ExternalConfiguration(QtCore.QObject):
 
     @sgtk.LogManager.log_timing
     def _request_commands(
-        self, project_id, entity_type, entity_id, link_entity_type, engine_fallback
+        self,
+        project_id,
+        entity_type,
+        entity_id,
+        link_entity_type,
+        engine_fallback,
+        request_id=None,
+        priority=None,
     ):
         """
         Execution, runs in a separate thread and launches an external
         process to cache commands.
 
+        The commands of other requests for the same project whose task didn't
+        start yet are cached by the same external process, which only bootstraps
+        once for all of them. Their tasks wait for it to complete and load the
+        cached commands. Requested commands are not cached along with prefetched
+        ones, which would delay them.
+
         :param int project_id: Associated project id
         :param str entity_type: Associated entity type
         :param int entity_id: Associated entity id
@@ -296,7 +407,19 @@ class ExternalConfiguration(QtCore.QObject):
         :param str engine_fallback: If the main engine isn't available for the given
             entity id and project, request generate commands for the fallback engine
             specified. This can be useful in backwards compatibility scenarios.
-        """
+        :param int request_id: Id of the request, as queued by :meth:`request_commands`.
+        :param int priority: Priority of the request.
+        """
+        with self._batch_lock:
+            self._queued_requests.pop(request_id, None)
+            batch_completed = self._batched_requests.pop(request_id, None)
+        if batch_completed is not None:
+            logger.debug(
+                "Waiting for the commands of %s %s to be cached with another request."
+                % (entity_type, entity_id)
+            )
+            self._wait_for_batch(batch_completed)
+
         self._commands_evaluated_once = True
 
         # figure out if we have a suitable config for this on disk already
@@ -304,104 +427,262 @@ class ExternalConfiguration(QtCore.QObject):
             entity_type, entity_id, link_entity_type
         )
         cache_path = file_cache.get_cache_path(cache_hash)
+        cached_data = self._load_cached_commands(cache_hash)
 
+        if cached_data is None:
+            logger.debug("Begin caching commands")
+
+            # if entity_id is None, we need to figure out an actual entity id
+            # go get items for. This is done by choosing the most recently
+            # updated item for the project
+            if entity_id is None:
+                entity_id = self._get_most_recent_entity_id(project_id, entity_type)
+
+            cache_requests = [
+                {
+                    "entity_type": entity_type,
+                    "entity_id": entity_id,
+                    "cache_path": cache_path,
+                }
+            ]
+            batch_completed = threading.Event()
+            try:
+                claimed_requests, priority = self._claim_queued_requests(
+                    project_id, engine_fallback, cache_path, batch_completed, priority
+                )
+                cache_requests.extend(claimed_requests)
+                self._cache_commands(cache_requests, engine_fallback, priority)
+            finally:
+                batch_completed.set()
+
+            # now try again
+            cached_data = file_cache.load_cache(cache_hash)
+
+            if cached_data is None:
+                raise RuntimeError("Could not locate cached commands for %s" % self)
+
+        return cached_data
+
+    def _load_cached_commands(self, cache_hash):
+        """
+        Load cached commands, if they are valid.
+
+        :param dict cache_hash: Identifiers of the cache, as returned by
+            :meth:`_compute_config_hash_keys`.
+        :returns: The cached data, or ``None`` if it needs to be cached.
+        """
         if self.tracking_latest and not self._commands_evaluated_once:
             # this configuration is tracking an external latest version
             # so it's by definition never up to date. For performance
             # reasons, we memoize it, and only evaluate the list of
             # commands once per external config instance, tracked
             # via the _commands_evaluated_once boolean.
-            cached_data = None
-        else:
-            cached_data = file_cache.load_cache(cache_hash)
+            return None
 
+        cached_data = file_cache.load_cache(cache_hash)
         if (
             cached_data is None
             or not ExternalCommand.is_compatible(cached_data)
             or not ExternalCommand.is_valid_data(cached_data)
         ):
-            logger.debug("Begin caching commands")
+            return None
+        return cached_data
 
-            # if entity_id is None, we need to figure out an actual entity id
-            # go get items for. This is done by choosing the most recently
-            # updated item for the project
-            if entity_id is None:
-                logger.debug(
-                    "No entity id specified. Resolving most most recent %s "
-                    "id for project." % entity_type
-                )
+    def _get_most_recent_entity_id(self, project_id, entity_type):
+        """
+        Resolve the id of the most recently created entity of a type in a project.
 
-                most_recent_id = self._bundle.shotgun.find_one(
-                    entity_type,
-                    [["project", "is", {"type": "Project", "id": project_id}]],
-                    ["id"],
-                    order=[{"field_name": "id", "direction": "desc"}],
-                )
+        :param int project_id: Associated project id
+        :param str entity_type: Associated entity type
+        :returns: The entity id.
+        :raises: RuntimeError if the project has no entities of that type.
+        """
+        logger.debug(
+            "No entity id specified. Resolving most most recent %s "
+            "id for project." % entity_type
+        )
 
-                if most_recent_id is None:
-                    raise RuntimeError(
-                        "There are no %s objects for project %s."
-                        % (entity_type, project_id)
-                    )
+        most_recent_id = self._bundle.shotgun.find_one(
+            entity_type,
+            [["project", "is", {"type": "Project", "id": project_id}]],
+            ["id"],
+            order=[{"field_name": "id", "direction": "desc"}],
+        )
 
-                entity_id = most_recent_id["id"]
-                logger.debug("Will cache using %s %s" % (entity_type, entity_id))
+        if most_recent_id is None:
+            raise RuntimeError(
+                "There are no %s objects for project %s." % (entity_type, project_id)
+            )
+
+        logger.debug("Will cache using %s %s" % (entity_type, most_recent_id["id"]))
+        return most_recent_id["id"]
 
+    def _claim_queued_requests(
+        self, project_id, engine_fallback, cache_path, batch_completed, priority=None
+    ):
+        """
+        Claim the queued requests whose commands can be cached along with the
+        commands of a request, and need to be. The tasks of the claimed requests
+        wait for the given event before loading their commands.
+
+        :param int project_id: Project id of the request.
+        :param str engine_fallback: Fallback engine of the request.
+        :param str cache_path: Path to the cache file of the request.
+        :param batch_completed: ``threading.Event`` set once the commands are cached.
+        :param int priority: Priority of the request. Requests with a negative
+            priority, prefetching commands, are only claimed by requests with a
+            negative priority.
+        :returns: A list of dictionaries with the ``entity_type``, ``entity_id``
+            and ``cache_path`` of the claimed requests, and the highest priority
+            of the request and the claimed requests.
+        """
+        prefetching = (priority or 0) < 0
+        with self._batch_lock:
+            claimed = dict(
+                (request_id, request)
+                for request_id, request in self._queued_requests.items()
+                if request["project_id"] == project_id
+                and request["engine_fallback"] == engine_fallback
+                and (prefetching or (request["priority"] or 0) >= 0)
+            )
+            for request_id in claimed:
+                del self._queued_requests[request_id]
+                self._batched_requests[request_id] = batch_completed
+
+        cache_requests = []
+        cache_paths = set([cache_path])
+        excluded_ids = []
+        for request_id, request in claimed.items():
             try:
-                # run the external process. It will write a cache file to disk or fail.
-                #
-                # We're pre-caching here, which triggers a CACHE_FULL caching policy
-                # for the ToolkitManager used for bootstrapping when getting commands.
-                # This is required because tk-multi-launchapp requires access to all
-                # of the engines in the config when operating via Software entities. If
-                # we don't have all of the engines cached on disk yet, this will cause
-                # them to be cached prior to us getting a list of commands.
-                self._run_external_process(
-                    cache_path, entity_type, entity_id, self.engine_name, pre_cache=True
+                cache_hash = self._compute_config_hash_keys(
+                    request["entity_type"],
+                    request["entity_id"],
+                    request["link_entity_type"],
                 )
+                cache_path = file_cache.get_cache_path(cache_hash)
+                if (
+                    cache_path in cache_paths
+                    or self._load_cached_commands(cache_hash) is not None
+                ):
+                    excluded_ids.append(request_id)
+                    continue
+
+                entity_id = request["entity_id"]
+                if entity_id is None:
+                    entity_id = self._get_most_recent_entity_id(
+                        project_id, request["entity_type"]
+                    )
+            except Exception as e:
+                # the task of the request will report it.
+                logger.debug("Not caching the commands of %s: %s", request, e)
+                excluded_ids.append(request_id)
+                continue
+
+            cache_paths.add(cache_path)
+            priority = max(priority or 0, request["priority"] or 0)
+            cache_requests.append(
+                {
+                    "entity_type": request["entity_type"],
+                    "entity_id": entity_id,
+                    "cache_path": cache_path,
+                }
+            )
 
-            except SubprocessCalledProcessError as e:
-                # caching failed!
-                if e.returncode == 2 and engine_fallback:
-                    # An indication that the engine could not be started.
-                    # If a fallback engine is defined, try to launch this
-                    # Note: the reason we are doing this as two separate
-                    # process invocation is because older cores don't
-                    # have the ability to bootstrap and then bootstrap again.
-                    try:
-                        self._run_external_process(
-                            cache_path,
-                            entity_type,
-                            entity_id,
-                            engine_fallback,
-                            pre_cache=True,
-                        )
-                    except SubprocessCalledProcessError as e:
-                        raise RuntimeError("Error retrieving actions: %s" % e.output)
-
-                else:
-                    raise RuntimeError("Error retrieving actions: %s" % e.output)
+        # the tasks of the requests which are not cached in the batch don't
+        # need to wait for it.
+        with self._batch_lock:
+            for request_id in excluded_ids:
+                self._batched_requests.pop(request_id, None)
 
-            # now try again
-            cached_data = file_cache.load_cache(cache_hash)
+        if cache_requests:
+            logger.debug(
+                "Caching the commands of %d other queued requests along with this one."
+                % len(cache_requests)
+            )
+        return cache_requests, priority
 
-            if cached_data is None:
-                raise RuntimeError("Could not locate cached commands for %s" % self)
+    def _wait_for_batch(self, batch_completed):
+        """
+        Wait for the commands of a batch to be cached.
 
-        return cached_data
+        :param batch_completed: ``threading.Event`` set once the commands are cached.
+        :raises: :class:`~task_manager.TaskCancelledError` if the task is cancelled.
+        """
+        token = task_manager.CancellationToken.current()
+        while not batch_completed.wait(self._PROCESS_POLL_INTERVAL):
+            if token is not None:
+                token.raise_if_cancelled()
+
+    def _cache_commands(self, cache_requests, engine_fallback, priority=None):
+        """
+        Cache the commands of several entities with a single external process.
+
+        Only caching the commands of the first entity is required, the commands
+        of the other ones are cached on a best effort basis.
+
+        :param list cache_requests: Entities to cache commands for, as
+            dictionaries with ``entity_type``, ``entity_id`` and ``cache_path`` keys.
+        :param str engine_fallback: If the main engine isn't available, generate
+            commands for the fallback engine specified.
+        :param int priority: Priority of the external process.
+        :raises: RuntimeError if caching failed.
+        """
+        try:
+            # run the external process. It will write the cache files to disk or fail.
+            #
+            # We're pre-caching here, which triggers a CACHE_FULL caching policy
+            # for the ToolkitManager used for bootstrapping when getting commands.
+            # This is required because tk-multi-launchapp requires access to all
+            # of the engines in the config when operating via Software entities. If
+            # we don't have all of the engines cached on disk yet, this will cause
+            # them to be cached prior to us getting a list of commands.
+            self._run_external_process(
+                cache_requests, self.engine_name, pre_cache=True, priority=priority
+            )
+
+        except SubprocessCalledProcessError as e:
+            # caching failed!
+            if e.returncode == 2 and engine_fallback:
+                # An indication that the engine could not be started.
+                # If a fallback engine is defined, try to launch this
+                # Note: the reason we are doing this as two separate
+                # process invocation is because older cores don't
+                # have the ability to bootstrap and then bootstrap again.
+                try:
+                    self._run_external_process(
+                        cache_requests,
+                        engine_fallback,
+                        pre_cache=True,
+                        priority=priority,
+                    )
+                except SubprocessCalledProcessError as e:
+                    raise RuntimeError("Error retrieving actions: %s" % e.output)
+
+            else:
+                raise RuntimeError("Error retrieving actions: %s" % e.output)
 
     @sgtk.LogManager.log_timing
     def _run_external_process(
-        self, cache_path, entity_type, entity_id, engine_name, pre_cache=False
+        self, cache_requests, engine_name, pre_cache=False, priority=None
     ):
         """
-        Helper method. Executes the external caching process.
+        Helper method. Executes the external caching process, which caches the
+        commands of several entities, bootstrapping once for all of them.
 
-        :param int cache_path: Path to cache file to write
-        :param str entity_type: Associated entity type
-        :param int entity_id: Associated entity id
+        The request is sent to a long-lived external runner from the
+        :class:`~runner_pool.ExternalRunnerPool`, which only bootstraps into the
+        configuration for the first request it serves. A new process is launched
+        if no external runner can serve it. The pool bounds the number of
+        external processes running at the same time, and runs the ones with the
+        highest priority first.
+
+        :param list cache_requests: Entities to cache commands for, as
+            dictionaries with ``entity_type``, ``entity_id`` and ``cache_path`` keys.
+            Caching the commands of the entities after the first one is done on a
+            best effort basis.
         :param str engine_name: Engine to start
         :param bool pre_cache: Whether to pre-cache all bundles during bootstrap
+        :param int priority: Priority of the external process.
 
         :raises: SubprocessCalledProcessError
         """
@@ -418,32 +699,24 @@ class ExternalConfiguration(QtCore.QObject):
                 sgtk.get_authenticated_user(), use_json=True
             )
 
-        args_file = create_parameter_file(
-            dict(
-                action="cache_actions",
-                background=True,
-                cache_path=cache_path,
-                configuration_uri=self.descriptor_uri,
-                pipeline_config_id=self.pipeline_configuration_id,
-                plugin_id=self.plugin_id,
-                engine_name=engine_name,
-                entity_type=entity_type,
-                entity_id=entity_id,
-                bundle_cache_fallback_paths=self._bundle.engine.sgtk.bundle_cache_fallback_paths,
-                # the engine icon becomes the process icon
-                icon_path=self._bundle.engine.icon_256,
-                pre_cache=pre_cache,
-                user=serialized_user,
-            )
+        parameters = dict(
+            background=True,
+            configuration_uri=self.descriptor_uri,
+            pipeline_config_id=self.pipeline_configuration_id,
+            plugin_id=self.plugin_id,
+            engine_name=engine_name,
+            bundle_cache_fallback_paths=self._bundle.engine.sgtk.bundle_cache_fallback_paths,
+            # the engine icon becomes the process icon
+            icon_path=self._bundle.engine.icon_256,
+            user=serialized_user,
         )
+        request = dict(cache_requests=cache_requests, pre_cache=pre_cache)
 
         args = [
             self.interpreter,
             script,
             sgtk.bootstrap.ToolkitManager.get_core_python_path(),
-            args_file,
         ]
-        logger.debug("Launching external script: %s", args)
 
         # Ensure the credentials are still valid before launching the command in
         # a separate process. We need do to this in advance because the process
@@ -451,6 +724,65 @@ class ExternalConfiguration(QtCore.QObject):
         # to prompt the user to re-authenticate.
         sgtk.get_authenticated_user().refresh_credentials()
 
+        token = task_manager.CancellationToken.current()
+        pool = ExternalRunnerPool.get_instance()
+        try:
+            output = pool.execute(
+                self._get_runner_key(engine_name, parameters),
+                args,
+                dict(parameters, action="serve_actions"),
+                request,
+                token,
+                priority,
+            )
+        except ExternalRunnerError as e:
+            logger.debug("%s Launching a new external process instead.", e)
+            with pool.process_slot(priority, token):
+                output = self._run_external_runner_process(
+                    args, dict(parameters, action="cache_actions", **request), token
+                )
+        logger.debug("External caching complete. Output: %s" % output)
+
+    def _get_runner_key(self, engine_name, parameters):
+        """
+        Returns the key identifying the long-lived external runners which can
+        cache commands for this configuration.
+
+        :param str engine_name: Engine to start
+        :param dict parameters: Parameters the external runner is started with.
+        :returns: A tuple.
+        """
+        user = sgtk.get_authenticated_user()
+        return (
+            self.interpreter,
+            self.descriptor_uri,
+            self.pipeline_configuration_id,
+            self.plugin_id,
+            engine_name,
+            # the commands depend on the software entities.
+            self.software_hash,
+            tuple(parameters["bundle_cache_fallback_paths"]),
+            user.login if user else None,
+            # configurations tracking a latest version are resolved again by each
+            # instance, so they don't share external runners.
+            self._instance_id if self.tracking_latest else None,
+        )
+
+    def _run_external_runner_process(self, args, parameters, token):
+        """
+        Launch a new external runner process and wait for it to complete.
+
+        :param list args: The command to run, without the path of its parameter file.
+        :param dict parameters: Parameters of the external runner.
+        :param token: The :class:`~task_manager.CancellationToken` of the running
+            task, or ``None``.
+        :returns: The output of the process.
+        :raises: SubprocessCalledProcessError
+        """
+        args_file = create_parameter_file(parameters)
+        args = args + [args_file]
+        logger.debug("Launching external script: %s", args)
+
         try:
             # Note: passing a copy of the environment in resolves some odd behavior with
             # the environment of processes spawned from the external_runner. This caused
@@ -459,12 +791,43 @@ class ExternalConfiguration(QtCore.QObject):
             # prior to launch. This is less critical here when caching configs, because
             # we're unlikely to spawn additional processes from the external_runner, but
             # just to cover our backsides, this is safest.
-            output = subprocess_check_output(args)
-            logger.debug("External caching complete. Output: %s" % output)
+            if token is None:
+                return subprocess_check_output(args)
+            else:
+                return self._run_cancellable_process(args, token)
         finally:
             # clean up temp file
             sgtk.util.filesystem.safe_delete_file(args_file)
 
+    def _run_cancellable_process(self, args, token):
+        """
+        Run a process and return its output, killing it if the given cancellation
+        token is cancelled.
+
+        :param list args: The command to run.
+        :param token: The :class:`~task_manager.CancellationToken` of the running task.
+        :returns: The output of the process.
+        :raises: SubprocessCalledProcessError if the process fails, or
+            :class:`~task_manager.TaskCancelledError` if the token is cancelled.
+        """
+        process = subprocess.Popen(
+            args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+        while True:
+            try:
+                output, _ = process.communicate(timeout=self._PROCESS_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if token.is_cancelled:
+                    logger.debug("Task cancelled, killing external process %s", args)
+                    process.kill()
+                    process.communicate()
+                    token.raise_if_cancelled()
+
+        if process.returncode:
+            raise SubprocessCalledProcessError(process.returncode, args, output=output)
+        return output
+
     def _task_completed(self, unique_id, group, result):
         """
         Called after command caching completes.
@@ -473,6 +836,7 @@ class ExternalConfiguration(QtCore.QObject):
         :param str group: task group
         :param str result: return data from worker
         """
+        self._prefetch_task_ids.pop(unique_id, None)
         if unique_id not in self._task_ids:
             # this was not for us
             return
@@ -513,6 +877,8 @@ class ExternalConfiguration(QtCore.QObject):
         :param message: error message
         :param traceback_str: callstack
         """
+        if self._prefetch_task_ids.pop(unique_id, None) is not None:
+            logger.debug("Failed to prefetch commands: %s", message)
         if unique_id not in self._task_ids:
             # this was not for us
             return
@@ -96,3 +96,10 @@ class InvalidExternalConfiguration(ExternalConfiguration):
         raise RuntimeError(
             "It is not possible to request commands from an invalid configuration."
         )
+
+    def prefetch_commands(self, *args, **kwargs):
+        """
+        This implementation does nothing, as an invalid configuration has no
+        commands to prefetch.
+        """
+        logger.debug("Commands were prefetched from an invalid configuration: %r", self)
@@ -19,6 +19,7 @@ logger = sgtk.platform.get_logger(__name__)
 
 shotgun_model = sgtk.platform.current_bundle().import_module("shotgun_model")
 ShotgunModel = shotgun_model.ShotgunModel
+sanitize_qt = shotgun_model.sanitize_qt
 
 
 class ConfigurationState(QtCore.QObject):
@@ -156,8 +157,20 @@ class ConfigStateModel(ShotgunModel):
 
     Internally, the hash is build based on the aggregate of updated_at
     values found for all records that the model tracks.
+
+    The records are cached on disk and only queried again when a cheap summary
+    of them, their count and their most recent update, indicates that they
+    changed since they were last queried. The summary is saved next to the
+    cached records, so they are not queried again in a new session either.
     """
 
+    # summaries of the records compared to detect changes. Summaries are keyed
+    # by field, so each field can only be summarized once.
+    _SUMMARY_FIELDS = [
+        {"field": "id", "type": "count"},
+        {"field": "updated_at", "type": "maximum"},
+    ]
+
     def __init__(self, entity_type, filters, bg_task_manager, parent):
         """
         :param bg_task_manager: Background task manager to use for any asynchronous work.
@@ -169,19 +182,176 @@ class ConfigStateModel(ShotgunModel):
         self._entity_type = entity_type
         self._filters = filters
 
+        # summary of the records when they were last queried, None until they are.
+        self._summary = None
+        self._summary_request_id = None
+        # summary of the records being queried, saved once they are.
+        self._queried_summary = None
+        self._sg_data_retriever.work_completed.connect(self._on_summary_completed)
+        self._sg_data_retriever.work_failure.connect(self._on_summary_failed)
+        self.data_refreshed.connect(self._on_data_refreshed)
+        self.data_refresh_fail.connect(self._on_refresh_failed)
+
     def load_and_refresh(self):
         """
         Load cached data into the model and request a refresh.
+
+        The records are only queried again if their summary changed since
+        they were last queried. Otherwise, ``data_refreshed`` is emitted
+        without any change.
+        """
+        if self._data_handler is None:
+            hierarchy = ["id"]
+            fields = ["updated_at", "id"]
+            self._load_data(self._entity_type, self._filters, hierarchy, fields)
+
+        if self._summary is None:
+            # the records cached on disk are not queried again if they didn't
+            # change since they were cached.
+            self._summary = self._load_summary()
+
+        self._summary_request_id = self._sg_data_retriever.execute_method(
+            self._summarize
+        )
+
+    def _summarize(self, sg):
+        """
+        Summarizes the records, executed in a background thread.
+
+        :param sg: Shotgun API instance.
+        :returns: Dictionary of summaries.
+        """
+        return sg.summarize(self._entity_type, self._filters, self._SUMMARY_FIELDS)[
+            "summaries"
+        ]
+
+    def _on_summary_completed(self, uid, request_type, data):
+        """
+        Queries the records if their summary changed.
+
+        :param uid: The unique id of the work that completed
+        :param request_type: Type of work completed
+        :param data: Result of the work
+        """
+        uid = sanitize_qt(uid)  # qstring on pyqt, str on pyside
+        if uid != self._summary_request_id:
+            return
+        self._summary_request_id = None
+
+        summary = self._normalize_summary(sanitize_qt(data)["return_value"])
+        if summary == self._summary:
+            logger.debug("%s records didn't change." % self._entity_type)
+            self.data_refreshed.emit(False)
+            return
+
+        # the summary is recorded before querying the records, so changes made
+        # in the meantime are detected by the next refresh.
+        self._summary = summary
+        self._queried_summary = summary
+        self._refresh_data()
+
+    def _on_summary_failed(self, uid, msg):
         """
-        # Clear the cache first. It's important that we not let the disk cache
-        # get in the way of having an accurate state to test against.
-        self.hard_refresh()
+        Queries the records if they could not be summarized.
 
-        hierarchy = ["id"]
-        fields = ["updated_at", "id"]
-        self._load_data(self._entity_type, self._filters, hierarchy, fields)
+        :param uid: The unique id of the work that failed
+        :param msg: The error message returned for the failure
+        """
+        uid = sanitize_qt(uid)  # qstring on pyqt, str on pyside
+        if uid != self._summary_request_id:
+            return
+        self._summary_request_id = None
+
+        logger.debug(
+            "Could not summarize %s records, querying them: %s"
+            % (self._entity_type, sanitize_qt(msg))
+        )
+        self._summary = None
+        self._queried_summary = None
         self._refresh_data()
 
+    def _on_refresh_failed(self, msg):
+        """
+        Makes sure the records are queried again by the next refresh if they
+        could not be queried.
+
+        :param str msg: The error message.
+        """
+        self._summary = None
+        self._queried_summary = None
+
+    def _on_data_refreshed(self, has_changed):
+        """
+        Saves the summary of the records once they were queried.
+
+        :param bool has_changed: The cached data changed
+        """
+        if self._queried_summary is not None:
+            self._save_summary(self._queried_summary)
+            self._queried_summary = None
+
+    def _normalize_summary(self, summary):
+        """
+        Converts a summary to the values it is saved on disk with, so summaries
+        returned by Shotgun can be compared with saved ones.
+
+        :param dict summary: Summary returned by Shotgun.
+        :returns: The summary with JSON values.
+        """
+        return json.loads(json.dumps(summary, sort_keys=True, default=str))
+
+    def _get_summary_path(self):
+        """
+        Returns the path of the file the summary of the records is saved to,
+        next to the records cached on disk.
+
+        :returns: Path to the summary file, or None if no records are loaded.
+        """
+        if self._data_handler is None:
+            return None
+        return "%s.summary" % self._data_handler.cache_path
+
+    def _load_summary(self):
+        """
+        Loads the summary of the records saved with :meth:`_save_summary`.
+
+        :returns: The summary, or None if there is none for the records which
+            are currently loaded.
+        """
+        summary_path = self._get_summary_path()
+        if summary_path is None or not os.path.exists(summary_path):
+            return None
+        try:
+            with open(summary_path, "r") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError) as e:
+            logger.debug("Could not load %s summary: %s" % (self._entity_type, e))
+            return None
+        # the cached records may have been saved without the summary, or the
+        # other way around.
+        if data.get("hash") != self.get_hash():
+            return None
+        return data.get("summary")
+
+    def _save_summary(self, summary):
+        """
+        Saves the summary of the records currently loaded next to their cache.
+
+        :param dict summary: The summary of the records.
+        """
+        summary_path = self._get_summary_path()
+        if summary_path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+            with open(summary_path, "w") as fh:
+                json.dump({"summary": summary, "hash": self.get_hash()}, fh)
+        except OSError as e:
+            logger.warning(
+                "Could not save %s summary to '%s': %s"
+                % (self._entity_type, summary_path, e)
+            )
+
     def get_hash(self):
         """
         Computes a hash representing the state of all entities.
@@ -13,6 +13,7 @@ from sgtk.platform.qt import QtCore, QtGui
 from .configuration_state import ConfigurationState
 from . import file_cache
 from .errors import ExternalConfigParseError
+from .runner_pool import ExternalRunnerPool
 from . import config
 
 logger = sgtk.platform.get_logger(__name__)
@@ -72,6 +73,18 @@ class ExternalConfigurationLoader(QtCore.QObject):
 
         self._task_ids = {}
 
+        # the external runners of the shared pool are shut down once all the
+        # loaders using them are shut down.
+        self._runner_pool = ExternalRunnerPool.acquire()
+
+        # the commands loaded for an entity type are prefetched by the other
+        # configurations of the project, see _on_commands_loaded():
+        # project id -> configurations last loaded for the project
+        self._project_configs = {}
+        # project id -> set of (configuration, entity type, link entity type)
+        # whose commands were loaded or prefetched
+        self._prefetched_commands = {}
+
         self._plugin_id = plugin_id
         self._base_config_uri = base_config
         self._engine_name = engine_name
@@ -97,6 +110,9 @@ class ExternalConfigurationLoader(QtCore.QObject):
         Shut down and deallocate.
         """
         self._shotgun_state.shut_down()
+        if self._runner_pool:
+            self._runner_pool = None
+            ExternalRunnerPool.release()
 
     def refresh_shotgun_global_state(self):
         """
@@ -210,6 +226,7 @@ class ExternalConfigurationLoader(QtCore.QObject):
                         "Detected an invalid config in the cache. Recaching from scratch..."
                     )
                 else:
+                    self._set_project_configurations(project_id, config_objects)
                     self.configurations_loaded.emit(project_id, config_objects)
                     config_data_emitted = True
 
@@ -316,6 +333,7 @@ class ExternalConfigurationLoader(QtCore.QObject):
             % (project_id, config_objects)
         )
 
+        self._set_project_configurations(project_id, config_objects)
         self.configurations_loaded.emit(project_id, config_objects)
 
     def _task_failed(self, unique_id, group, message, traceback_str):
@@ -336,4 +354,64 @@ class ExternalConfigurationLoader(QtCore.QObject):
         logger.error("Could not determine project configurations: %s" % message)
 
         # emit an empty list of configurations
+        self._set_project_configurations(project_id, [])
         self.configurations_loaded.emit(project_id, [])
+
+    def _set_project_configurations(self, project_id, config_objects):
+        """
+        Keep track of the configurations loaded for a project, so the commands
+        loaded by one of them are prefetched by the other ones.
+
+        :param int project_id: Project the configurations were loaded for.
+        :param list config_objects: The :class:`ExternalConfiguration` instances.
+        """
+        self._project_configs[project_id] = config_objects
+        self._prefetched_commands[project_id] = set()
+        for config_object in config_objects:
+            config_object.commands_loaded.connect(self._on_commands_loaded)
+
+    def _on_commands_loaded(
+        self, project_id, entity_type, entity_id, link_entity_type, config, commands
+    ):
+        """
+        Called when commands requested for an entity type are loaded by a
+        configuration of a project.
+
+        The combinations of the configurations of the project and the entity
+        types whose commands were requested so far which are not cached yet are
+        prefetched in the background, with a low priority so they are only cached
+        when no commands are requested, and are readily available if the user
+        switches configurations or goes back to a previous entity type.
+
+        :param int project_id: Project the commands were loaded for.
+        :param str entity_type: Entity type the commands were loaded for.
+        :param int entity_id: Entity id the commands were loaded for.
+        :param str link_entity_type: Entity type the entity is linked to.
+        :param config: The :class:`ExternalConfiguration` which loaded the commands.
+        :param list commands: The loaded :class:`ExternalCommand` instances.
+        """
+        config_objects = self._project_configs.get(project_id, [])
+        if config not in config_objects:
+            # the configurations of the project were loaded again in the meantime.
+            return
+
+        prefetched = self._prefetched_commands[project_id]
+        prefetched.add((config, entity_type, link_entity_type))
+        entity_types = set(
+            (prefetched_type, prefetched_link_type)
+            for _, prefetched_type, prefetched_link_type in prefetched
+        )
+        for config_object in config_objects:
+            # link entity type -> entity types to prefetch
+            to_prefetch = {}
+            for prefetched_type, prefetched_link_type in sorted(entity_types, key=str):
+                key = (config_object, prefetched_type, prefetched_link_type)
+                if key not in prefetched:
+                    prefetched.add(key)
+                    to_prefetch.setdefault(prefetched_link_type, []).append(
+                        prefetched_type
+                    )
+            for prefetched_link_type, prefetched_types in to_prefetch.items():
+                config_object.prefetch_commands(
+                    project_id, prefetched_types, prefetched_link_type
+                )
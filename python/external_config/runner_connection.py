@@ -0,0 +1,125 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Connection between a process and the external runners it starts.
+"""
+
+import pickle
+import select
+import socket
+import struct
+
+#############################################################################
+# WARNING!!!! This file is loaded by the external runner before it has
+# bootstrapped, with the interpreter of the configuration, which may differ
+# from the current one. Only use the standard library in this file.
+
+# pickle protocol understood by all supported interpreters.
+PICKLE_PROTOCOL = 2
+
+# size of the token an external runner authenticates with.
+TOKEN_SIZE = 32
+
+
+class RunnerConnection(object):
+    """
+    Socket connection exchanging pickled messages between a process and an
+    external runner it started.
+
+    The external runner connects to a socket the process listens to on the
+    local host and sends the token it was given, which the process checks
+    before reading any message from the connection::
+
+        connection = RunnerConnection.connect(address, token)
+        while connection.poll(idle_timeout):
+            request = connection.receive()
+            connection.send({"returncode": 0, "output": ""})
+    """
+
+    # size of a message, which precedes its data.
+    _HEADER = struct.Struct(">Q")
+
+    def __init__(self, sock):
+        """
+        :param sock: Connected ``socket.socket``.
+        """
+        self._socket = sock
+
+    @classmethod
+    def connect(cls, address, token, timeout=30):
+        """
+        Connect to a process waiting for an external runner to connect.
+
+        :param tuple address: Host and port to connect to.
+        :param bytes token: The token the external runner was given.
+        :param float timeout: Number of seconds to wait for the connection.
+        :returns: A :class:`RunnerConnection`.
+        """
+        sock = socket.create_connection(tuple(address), timeout)
+        sock.settimeout(None)
+        sock.sendall(token)
+        return cls(sock)
+
+    def send(self, data):
+        """
+        Send a message.
+
+        :param data: Data to send, which must be picklable.
+        """
+        payload = pickle.dumps(data, PICKLE_PROTOCOL)
+        self._socket.sendall(self._HEADER.pack(len(payload)) + payload)
+
+    def poll(self, timeout=None):
+        """
+        Wait until data is available to read from the connection.
+
+        :param timeout: Maximum number of seconds to wait, or None to wait until
+                        data is available.
+        :returns: True if data is available, False if the timeout expired.
+        """
+        readable, _, _ = select.select([self._socket], [], [], timeout)
+        return bool(readable)
+
+    def receive(self):
+        """
+        Receive a message, waiting until it is available.
+
+        :returns: The data which was sent.
+        :raises: ``EOFError`` if the connection was closed.
+        """
+        (size,) = self._HEADER.unpack(self.receive_bytes(self._HEADER.size))
+        return pickle.loads(self.receive_bytes(size))
+
+    def receive_bytes(self, size):
+        """
+        Receive a number of bytes, waiting until they are available.
+
+        :param int size: Number of bytes to receive.
+        :returns: The bytes received.
+        :raises: ``EOFError`` if the connection was closed.
+        """
+        chunks = []
+        while size:
+            chunk = self._socket.recv(min(size, 1024 * 1024))
+            if not chunk:
+                raise EOFError("The connection was closed.")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        """
+        Close the connection.
+        """
+        try:
+            self._socket.close()
+        except socket.error:
+            pass
@@ -0,0 +1,626 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import hmac
+import heapq
+import time
+import atexit
+import binascii
+import itertools
+import contextlib
+import socket
+import threading
+import subprocess
+
+import sgtk
+from sgtk.util.process import SubprocessCalledProcessError
+
+from .runner_connection import RunnerConnection, TOKEN_SIZE
+from .util import create_parameter_file
+
+logger = sgtk.platform.get_logger(__name__)
+
+
+class ExternalRunnerError(Exception):
+    """
+    Raised when a request couldn't be served by a long-lived external runner,
+    and should be run by a new external process instead.
+    """
+
+
+class ExternalRunnerPool(object):
+    """
+    Pool of long-lived external runner processes.
+
+    Starting an external runner means bootstrapping into its configuration and
+    starting an engine, which takes seconds. The external runners of the pool
+    stay bootstrapped after serving a request, and serve the following requests
+    with the same key, e.g. for the same interpreter, configuration and engine,
+    so bootstrapping is only done once for all of them::
+
+        pool = ExternalRunnerPool.get_instance()
+        try:
+            output = pool.execute(key, args, parameters, request)
+        except ExternalRunnerError:
+            # run the request in a new process instead.
+
+    An external runner is started with the command ``args`` followed by the path
+    of a parameter file holding ``parameters``, to which the pool adds the
+    ``address`` and ``token`` the runner connects with, see
+    :class:`~runner_connection.RunnerConnection`, and the ``idle_timeout`` after
+    which it shuts down if it didn't get any request. The first request it gets
+    is sent as soon as it connects. A runner replies to each request with a
+    dictionary holding the ``returncode`` and ``output`` a new process running
+    the request would have exited with, and shuts down after a failed request.
+
+    Requests with the same key are served one at a time. The number of external
+    processes running at the same time, including the ones started by callers
+    with :meth:`process_slot`, is bounded by the number of CPUs and the available
+    memory. Processes are handed out to the requests with the highest priority
+    first, and requests with a negative priority, e.g. prefetching commands in
+    the background, always leave a process available for the other ones. Idle
+    external runners are shut down to make room for new ones.
+    """
+
+    # number of seconds after which an external runner which didn't get any
+    # request is shut down.
+    IDLE_TIMEOUT = 300
+
+    # additional number of seconds external runners wait for a request before
+    # shutting down on their own, in case this process doesn't shut them down.
+    _RUNNER_IDLE_GRACE = 60
+
+    # number of seconds to wait for a new external runner to connect.
+    _CONNECT_TIMEOUT = 60
+
+    # how often, in seconds, a request checks if its task was cancelled.
+    _POLL_INTERVAL = 0.5
+
+    # approximate memory used by an external process, which bounds the number of
+    # processes run at the same time.
+    _PROCESS_MEMORY = 512 * 1024 * 1024
+
+    __instance = None
+    __instance_lock = threading.Lock()
+    # number of users which acquired the shared pool and didn't release it.
+    __user_count = 0
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Returns the pool shared by all the external configurations, which is shut
+        down when the process exits.
+
+        :returns: A :class:`ExternalRunnerPool`.
+        """
+        with cls.__instance_lock:
+            if cls.__instance is None:
+                cls.__instance = cls()
+                atexit.register(cls.__instance.shut_down)
+            return cls.__instance
+
+    @classmethod
+    def acquire(cls):
+        """
+        Returns the pool shared by all the external configurations, and counts
+        the caller as one of its users until it calls :meth:`release`.
+
+        :returns: A :class:`ExternalRunnerPool`.
+        """
+        instance = cls.get_instance()
+        with cls.__instance_lock:
+            cls.__user_count += 1
+        return instance
+
+    @classmethod
+    def release(cls):
+        """
+        Stop counting the caller as a user of the shared pool, acquired with
+        :meth:`acquire`. The external runners of the pool are shut down once it
+        has no users left, the pool itself can still be used afterwards.
+        """
+        with cls.__instance_lock:
+            if cls.__user_count <= 0:
+                return
+            cls.__user_count -= 1
+            if cls.__user_count:
+                return
+            instance = cls.__instance
+        instance.shut_down()
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, max_processes=None):
+        """
+        :param float idle_timeout: Number of seconds after which an external
+                                   runner which didn't get any request is shut down.
+        :param int max_processes: Maximum number of external processes to run at
+                                  the same time. Defaults to the number of CPUs,
+                                  bounded by the available memory.
+        """
+        self._idle_timeout = idle_timeout
+        self._max_processes = max_processes or self._get_default_max_processes()
+        self._slots = _ProcessSlots(self._max_processes)
+        self._lock = threading.Lock()
+        # key -> _ExternalRunner
+        self._runners = {}
+
+    @property
+    def max_processes(self):
+        """
+        Maximum number of external processes run at the same time.
+        """
+        return self._max_processes
+
+    @classmethod
+    def _get_default_max_processes(cls):
+        """
+        Computes how many external processes can run at the same time, from the
+        number of CPUs and the memory available on Linux.
+
+        :returns: The number of processes, at least 1.
+        """
+        max_processes = os.cpu_count() or 1
+        available_memory = _get_available_memory()
+        if available_memory is not None:
+            max_processes = min(max_processes, available_memory // cls._PROCESS_MEMORY)
+        return max(max_processes, 1)
+
+    def process_slot(self, priority=None, token=None):
+        """
+        Context manager waiting until an external process can be run, and
+        counting it as running until the block is exited. It is used to run
+        external processes which are not external runners of the pool::
+
+            with pool.process_slot(priority):
+                subprocess.check_output(args)
+
+        :param int priority: Priority of the process, processes with a higher
+            priority run first. Processes with a negative priority always leave a
+            process available for the other ones.
+        :param token: Optional :class:`~task_manager.CancellationToken` of the
+            task waiting for the process.
+        :raises: :class:`~task_manager.TaskCancelledError` if the token is
+            cancelled while waiting.
+        """
+        return self._slots.acquire(priority or 0, token, self._POLL_INTERVAL)
+
+    def execute(self, key, args, parameters, request, token=None, priority=None):
+        """
+        Send a request to the external runner for the given key, starting one if
+        needed, and wait for it to be served. This can be called from any thread.
+
+        :param key: Hashable key identifying the external runners which can serve
+            the request.
+        :param list args: Command starting an external runner, without the path of
+            its parameter file.
+        :param dict parameters: Parameters to start an external runner with.
+        :param dict request: Request to send to the external runner.
+        :param token: Optional :class:`~task_manager.CancellationToken` of the task
+            waiting for the request. The external runner is killed if it is
+            cancelled.
+        :param int priority: Priority of the request, see :meth:`process_slot`.
+        :returns: The output of the request.
+        :raises: ``SubprocessCalledProcessError`` if the request failed in an
+            external runner started for it, :class:`ExternalRunnerError` if it
+            couldn't be served by an external runner of the pool, and
+            :class:`~task_manager.TaskCancelledError` if the token was cancelled.
+        """
+        while True:
+            runner = self._get_runner(key)
+            # the lock of the runner is acquired before a process slot, so the
+            # slots are only used by requests which can be served.
+            with runner.lock:
+                if runner.is_closed:
+                    # shut down while we were waiting for it, get a new one.
+                    continue
+                with self.process_slot(priority, token):
+                    return self._execute(runner, args, parameters, request, token)
+
+    def shut_down(self):
+        """
+        Shut down all the external runners.
+        """
+        with self._lock:
+            runners = list(self._runners.values())
+            self._runners.clear()
+
+        # let them all shut down at the same time. Requests they are serving
+        # fail with an ExternalRunnerError.
+        for runner in runners:
+            runner.is_closed = True
+            runner.disconnect()
+        for runner in runners:
+            runner.close()
+
+    def _get_runner(self, key):
+        """
+        Return the external runner for the given key, shutting down the ones
+        which were idle for too long.
+
+        :param key: Key identifying the external runner.
+        :returns: An :class:`_ExternalRunner`, which may not be started yet.
+        """
+        idle_runners = []
+        with self._lock:
+            now = time.monotonic()
+            for runner_key, runner in list(self._runners.items()):
+                # runners serving a request are not idle.
+                if not runner.lock.acquire(False):
+                    continue
+                try:
+                    if runner.has_exited or now - runner.last_used > self._idle_timeout:
+                        runner.is_closed = True
+                        del self._runners[runner_key]
+                        idle_runners.append(runner)
+                finally:
+                    runner.lock.release()
+
+            runner = self._runners.get(key)
+            if runner is None:
+                runner = _ExternalRunner(key)
+                self._runners[key] = runner
+
+        for idle_runner in idle_runners:
+            logger.debug("Shutting down idle external runner %s", idle_runner)
+            idle_runner.close()
+
+        return runner
+
+    def _execute(self, runner, args, parameters, request, token):
+        """
+        Send a request to an external runner, starting it if needed. The lock of
+        the runner must be held.
+
+        :param runner: The :class:`_ExternalRunner` to use.
+        :param list args: Command starting an external runner.
+        :param dict parameters: Parameters to start an external runner with.
+        :param dict request: Request to send to the external runner.
+        :param token: Optional :class:`~task_manager.CancellationToken`.
+        :returns: The output of the request.
+        """
+        try:
+            if runner.process is None:
+                self._shut_down_idle_runners(runner)
+                runner.start(
+                    args,
+                    dict(
+                        parameters,
+                        idle_timeout=self._idle_timeout + self._RUNNER_IDLE_GRACE,
+                    ),
+                    self._CONNECT_TIMEOUT,
+                    self._POLL_INTERVAL,
+                    token,
+                )
+            reply = runner.request(request, self._POLL_INTERVAL, token)
+        except BaseException:
+            self._discard(runner, kill=True)
+            raise
+
+        if reply["returncode"]:
+            # external runners shut down after a failed request.
+            self._discard(runner)
+            if runner.request_count > 1:
+                # this may be caused by the state the runner was left in by a
+                # previous request, which a new process doesn't have.
+                raise ExternalRunnerError(
+                    "Request failed in external runner %s: %s"
+                    % (runner, reply["output"])
+                )
+            raise SubprocessCalledProcessError(
+                reply["returncode"], runner.args, output=reply["output"]
+            )
+
+        return reply["output"]
+
+    def _shut_down_idle_runners(self, new_runner):
+        """
+        Shut down the least recently used idle external runners, so starting a
+        new one doesn't make more of them run than the maximum number of
+        processes.
+
+        :param new_runner: The :class:`_ExternalRunner` about to be started.
+        """
+        idle_runners = []
+        with self._lock:
+            running = [
+                runner
+                for runner in self._runners.values()
+                if runner is not new_runner and runner.process is not None
+            ]
+            excess = len(running) - self._max_processes + 1
+            for runner in sorted(running, key=lambda runner: runner.last_used):
+                if excess <= 0:
+                    break
+                # runners serving a request are not idle.
+                if not runner.lock.acquire(False):
+                    continue
+                try:
+                    runner.is_closed = True
+                    del self._runners[runner.key]
+                    idle_runners.append(runner)
+                    excess -= 1
+                finally:
+                    runner.lock.release()
+
+        for idle_runner in idle_runners:
+            logger.debug("Shutting down external runner %s for a new one", idle_runner)
+            idle_runner.close()
+
+    def _discard(self, runner, kill=False):
+        """
+        Shut down an external runner and remove it from the pool. The lock of
+        the runner must be held.
+
+        :param runner: The :class:`_ExternalRunner` to discard.
+        :param bool kill: Kill the runner instead of waiting for it to exit.
+        """
+        runner.is_closed = True
+        with self._lock:
+            if self._runners.get(runner.key) is runner:
+                del self._runners[runner.key]
+        runner.close(kill)
+
+
+def _get_available_memory():
+    """
+    Returns the memory available for new processes, on Linux.
+
+    :returns: A number of bytes, or None if it is unknown.
+    """
+    try:
+        with open("/proc/meminfo") as fh:
+            for line in fh:
+                if line.startswith("MemAvailable:"):
+                    # the value is in kB.
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class _ProcessSlots(object):
+    """
+    Bounded number of slots to run processes, handed out to the waiting callers
+    with the highest priority first. Callers with a negative priority can't take
+    the last free slot, unless there is a single slot.
+    """
+
+    def __init__(self, count):
+        """
+        :param int count: Number of slots.
+        """
+        self._count = count
+        self._used = 0
+        self._condition = threading.Condition()
+        # heap of (-priority, order) for the waiting callers.
+        self._waiting = []
+        self._order = itertools.count()
+
+    @contextlib.contextmanager
+    def acquire(self, priority, token, poll_interval):
+        """
+        Context manager holding a slot, waiting until one is free.
+
+        :param int priority: Priority of the caller.
+        :param token: Optional :class:`~task_manager.CancellationToken`.
+        :param float poll_interval: How often, in seconds, to check if the token
+            was cancelled.
+        """
+        entry = (-priority, next(self._order))
+        reserved = 1 if priority < 0 and self._count > 1 else 0
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while self._waiting[0] != entry or self._used >= self._count - reserved:
+                    self._condition.wait(poll_interval)
+                    if token is not None:
+                        token.raise_if_cancelled()
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._used += 1
+            # let the next caller check if it can take a slot.
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._used -= 1
+                self._condition.notify_all()
+
+
+class _ExternalRunner(object):
+    """
+    Long-lived external runner process of an :class:`ExternalRunnerPool`.
+    """
+
+    # number of seconds to wait for the process to exit after its connection is
+    # closed before killing it.
+    _EXIT_TIMEOUT = 10
+
+    def __init__(self, key):
+        """
+        :param key: Key identifying the runner in its pool.
+        """
+        self.key = key
+        # held while the runner is started or serves a request.
+        self.lock = threading.Lock()
+        self.is_closed = False
+        self.args = None
+        self.process = None
+        self.request_count = 0
+        self.last_used = time.monotonic()
+        self._connection = None
+
+    def __repr__(self):
+        """
+        String representation
+        """
+        pid = self.process.pid if self.process else None
+        return "<ExternalRunner pid %s, %d requests>" % (pid, self.request_count)
+
+    @property
+    def has_exited(self):
+        """
+        Whether the process was started and has exited.
+        """
+        return self.process is not None and self.process.poll() is not None
+
+    def start(self, args, parameters, connect_timeout, poll_interval, token):
+        """
+        Start the process and wait for it to connect.
+
+        :param list args: Command starting the process.
+        :param dict parameters: Parameters to start the process with.
+        :param float connect_timeout: Number of seconds to wait for the process
+            to connect.
+        :param float poll_interval: How often, in seconds, to check if the
+            process exited or the token was cancelled.
+        :param token: Optional :class:`~task_manager.CancellationToken`.
+        :raises: :class:`ExternalRunnerError` if the process didn't connect.
+        """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        param_file = None
+        try:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(1)
+            listener.settimeout(poll_interval)
+
+            secret = os.urandom(TOKEN_SIZE)
+            param_file = create_parameter_file(
+                dict(
+                    parameters,
+                    address=listener.getsockname(),
+                    token=binascii.hexlify(secret).decode("ascii"),
+                )
+            )
+            self.args = list(args) + [param_file]
+            logger.debug("Starting external runner: %s", self.args)
+            # requests return their output, the process doesn't write anything
+            # we need.
+            self.process = subprocess.Popen(
+                self.args,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            self._connection = self._accept(
+                listener, secret, connect_timeout, poll_interval, token
+            )
+        except OSError as e:
+            raise ExternalRunnerError("Could not start external runner: %s" % e)
+        finally:
+            listener.close()
+            # the process reads its parameters before connecting.
+            if param_file:
+                sgtk.util.filesystem.safe_delete_file(param_file)
+
+        logger.debug("External runner %s connected.", self)
+
+    def _accept(self, listener, secret, connect_timeout, poll_interval, token):
+        """
+        Wait for the process to connect and authenticate.
+
+        :param listener: Listening ``socket.socket``.
+        :param bytes secret: Token the process authenticates with.
+        :param float connect_timeout: Number of seconds to wait.
+        :param float poll_interval: How often, in seconds, to check if the
+            process exited or the token was cancelled.
+        :param token: Optional :class:`~task_manager.CancellationToken`.
+        :returns: The :class:`~runner_connection.RunnerConnection` to the process.
+        """
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except socket.timeout:
+                if self.process.poll() is not None:
+                    raise ExternalRunnerError(
+                        "External runner exited with code %s before connecting."
+                        % self.process.returncode
+                    )
+                if token is not None and token.is_cancelled:
+                    token.raise_if_cancelled()
+                if time.monotonic() > deadline:
+                    raise ExternalRunnerError(
+                        "External runner didn't connect within %s seconds."
+                        % connect_timeout
+                    )
+                continue
+
+            connection = RunnerConnection(sock)
+            try:
+                sock.settimeout(poll_interval)
+                received = connection.receive_bytes(TOKEN_SIZE)
+            except (EOFError, OSError):
+                received = None
+            if received is None or not hmac.compare_digest(received, secret):
+                logger.warning("Rejected a connection which didn't authenticate.")
+                connection.close()
+                continue
+            sock.settimeout(None)
+            return connection
+
+    def request(self, request, poll_interval, token):
+        """
+        Send a request and wait for its reply.
+
+        :param dict request: The request.
+        :param float poll_interval: How often, in seconds, to check if the token
+            was cancelled.
+        :param token: Optional :class:`~task_manager.CancellationToken`.
+        :returns: The reply of the runner.
+        :raises: :class:`ExternalRunnerError` if the connection was lost.
+        """
+        self.request_count += 1
+        try:
+            self._connection.send(request)
+            while not self._connection.poll(poll_interval):
+                if token is not None and token.is_cancelled:
+                    logger.debug("Task cancelled, killing external runner %s", self)
+                    token.raise_if_cancelled()
+            reply = self._connection.receive()
+        except (EOFError, OSError) as e:
+            raise ExternalRunnerError(
+                "Lost connection to external runner %s: %s" % (self, e)
+            )
+        self.last_used = time.monotonic()
+        return reply
+
+    def disconnect(self):
+        """
+        Close the connection to the process, which makes it shut down.
+        """
+        if self._connection is not None:
+            self._connection.close()
+
+    def close(self, kill=False):
+        """
+        Close the connection to the process and wait for it to exit, killing it
+        if it doesn't.
+
+        :param bool kill: Kill the process instead of waiting for it to exit.
+        """
+        self.disconnect()
+        if self.process is None:
+            return
+        if not kill:
+            try:
+                self.process.wait(self._EXIT_TIMEOUT)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+        if self.process.poll() is None:
+            logger.debug("Killing external runner %s", self)
+            self.process.kill()
+        self.process.wait()
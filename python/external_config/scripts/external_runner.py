@@ -8,11 +8,16 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+import io
 import os
 import re
 import sys
+import time
 import errno
 import inspect
+import binascii
+import contextlib
+import importlib
 import importlib.util
 import traceback
 
@@ -37,6 +42,10 @@ qt_importer = sgtk.util.qt_importer.QtImporter()
 LOGGER_NAME = "tk-framework-shotgunutils.multi_context.external_runner"
 logger = sgtk.LogManager.get_logger(LOGGER_NAME)
 
+# how often, in seconds, a runner serving requests processes Qt events while
+# waiting for a request.
+SERVE_POLL_INTERVAL = 0.5
+
 
 class EngineStartupError(Exception):
     """
@@ -338,6 +347,241 @@ def start_engine(
     return engine
 
 
+def start_cache_engine(user, arg_data, entity_type, entity_id, pre_cache):
+    """
+    Bootstraps into the engine to cache commands for.
+
+    :param ShotgunUser user: The user that have to be used while bootstraping the engine.
+    :param dict arg_data: Parameters of the external runner.
+    :param str entity_type: Entity type to launch
+    :param str entity_id: Entity id to launch
+    :param bool pre_cache: If set to True, starting up the command
+        will also include a full caching of all necessary
+        dependencies for all contexts and engines.
+    :returns: The engine, or None if the entity type doesn't have any actions.
+    """
+    try:
+        return start_engine(
+            user,
+            arg_data["configuration_uri"],
+            arg_data["pipeline_config_id"],
+            arg_data["plugin_id"],
+            arg_data["engine_name"],
+            entity_type,
+            entity_id,
+            arg_data["bundle_cache_fallback_paths"],
+            pre_cache,
+        )
+    except Exception as e:
+        # catch the special case where a shotgun engine has falled back
+        # to its legacy mode, looking for a shotgun_entitytype.yml file
+        # and cannot find it. In this case, we shouldn't handle that as
+        # an error but as an indication that the given entity type and
+        # entity id doesn't have any actions defined, and thus produce
+        # an empty list.
+        #
+        # Because this operation needs to be backwards compatible, we
+        # have to parse the exception message in order to extract the
+        # relevant state. The error to look for is on the following form:
+        # TankMissingEnvironmentFile: Missing environment file: /path/to/env/shotgun_camera.yml
+        #
+        if re.match("^Missing environment file:.*shotgun_[a-zA-Z0-9]+\\.yml$", str(e)):
+            logger.debug(
+                "Bootstrap returned legacy fallback exception '%s'. "
+                "An empty list of actions will be cached for the "
+                "given entity type.",
+                str(e),
+            )
+            return None
+        else:
+            # bubble the error
+            raise
+
+
+def change_cache_context(engine, entity_type, entity_id):
+    """
+    Switches a running engine to the context of the given entity, restarting it
+    if it doesn't support context changes.
+
+    :param engine: The running engine.
+    :param str entity_type: Entity type to switch to
+    :param str entity_id: Entity id to switch to
+    :returns: The engine running in the new context.
+    """
+    if engine is None:
+        # the previous bootstrap didn't start an engine, and older cores can't
+        # bootstrap again.
+        raise RuntimeError("No engine is running to switch context with.")
+
+    # the core was swapped when bootstrapping, use the one the engine runs with.
+    current_sgtk = importlib.import_module("sgtk")
+    context = engine.sgtk.context_from_entity(entity_type, entity_id)
+    if context != engine.context:
+        logger.debug("Switching %s to context %s", engine, context)
+        current_sgtk.platform.change_context(context)
+        engine = current_sgtk.platform.current_engine()
+    return engine
+
+
+def get_cache_requests(arg_data):
+    """
+    Returns the entities to cache commands for, given the parameters of a
+    ``cache_actions`` action. These are given by the ``cache_requests``
+    parameter, a list of dictionaries with ``entity_type``, ``entity_id`` and
+    ``cache_path`` keys, or by the ``entity_type``, ``entity_id`` and
+    ``cache_path`` parameters for a single entity.
+
+    :param dict arg_data: Parameters of the action.
+    :returns: List of dictionaries.
+    """
+    if arg_data.get("cache_requests"):
+        return arg_data["cache_requests"]
+    return [
+        {
+            "entity_type": arg_data["entity_type"],
+            "entity_id": arg_data["entity_id"],
+            "cache_path": arg_data["cache_path"],
+        }
+    ]
+
+
+def cache_requested_commands(
+    user, arg_data, cache_requests, pre_cache, engine=None, bootstrapped=False
+):
+    """
+    Caches the commands of several entities. The engine is started for the first
+    entity unless it was already, and switched to the context of each following
+    one.
+
+    Caching the commands of the first entity is required, any error is raised.
+    Caching the commands of the following ones is done on a best effort basis:
+    errors are logged and no cache file is written for them.
+
+    :param ShotgunUser user: The user that have to be used while bootstraping the engine.
+    :param dict arg_data: Parameters of the external runner.
+    :param list cache_requests: Entities to cache commands for, see
+        :meth:`get_cache_requests`.
+    :param bool pre_cache: If set to True, starting up the engine
+        will also include a full caching of all necessary
+        dependencies for all contexts and engines.
+    :param engine: The running engine, if it was started already.
+    :param bool bootstrapped: Whether the engine was started already.
+    :returns: A tuple with the running engine and True if the commands of all
+        the entities were cached, False otherwise.
+    """
+    cached_all = True
+    for index, cache_request in enumerate(cache_requests):
+        try:
+            if bootstrapped:
+                engine = change_cache_context(
+                    engine, cache_request["entity_type"], cache_request["entity_id"]
+                )
+            else:
+                bootstrapped = True
+                engine = start_cache_engine(
+                    user,
+                    arg_data,
+                    cache_request["entity_type"],
+                    cache_request["entity_id"],
+                    pre_cache,
+                )
+            cache_commands(
+                engine,
+                cache_request["entity_type"],
+                cache_request["entity_id"],
+                cache_request["cache_path"],
+            )
+        except Exception:
+            if index == 0:
+                raise
+            logger.exception(
+                "Could not cache commands for %s %s.",
+                cache_request["entity_type"],
+                cache_request["entity_id"],
+            )
+            cached_all = False
+    return engine, cached_all
+
+
+def serve_actions(user, arg_data):
+    """
+    Serves ``cache_actions`` requests sent by the process which started the
+    external runner, bootstrapping once for all of them. The engine is switched
+    to the context of each request.
+
+    Each request is a dictionary with the ``cache_requests`` and ``pre_cache``
+    parameters of a ``cache_actions`` action, see :meth:`get_cache_requests`.
+    Each reply is a dictionary with the ``returncode`` and ``output`` the process
+    would have exited with if it had run the action. Serving stops after a
+    request which failed for any of its entities, when the connection is closed,
+    or when no request is received for ``idle_timeout`` seconds.
+
+    :param ShotgunUser user: The user that have to be used while bootstraping the engine.
+    :param dict arg_data: Parameters of the external runner.
+    """
+    utils_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    runner_connection = _import_py_file(utils_folder, "runner_connection")
+    connection = runner_connection.RunnerConnection.connect(
+        arg_data["address"], binascii.unhexlify(arg_data["token"])
+    )
+
+    engine = None
+    bootstrapped = False
+    deadline = time.monotonic() + arg_data["idle_timeout"]
+    try:
+        while True:
+            if not connection.poll(SERVE_POLL_INTERVAL):
+                # let the engine process its events between requests.
+                qt_importer.QtCore.QCoreApplication.processEvents()
+                if time.monotonic() > deadline:
+                    logger.debug(
+                        "No request received for %s seconds, shutting down.",
+                        arg_data["idle_timeout"],
+                    )
+                    break
+                continue
+
+            try:
+                request = connection.receive()
+            except EOFError:
+                logger.debug("Connection closed, shutting down.")
+                break
+
+            returncode = QtTaskRunner.SUCCESS
+            # the state of the engine is unknown after a failure.
+            cached_all = False
+            output = io.StringIO()
+            try:
+                with contextlib.redirect_stdout(output):
+                    engine, cached_all = cache_requested_commands(
+                        user,
+                        arg_data,
+                        get_cache_requests(request),
+                        request.get("pre_cache") or False,
+                        engine,
+                        bootstrapped,
+                    )
+            except EngineStartupError as e:
+                returncode = QtTaskRunner.ERROR_ENGINE_NOT_STARTED
+                logger.exception("Could not start engine.")
+                output.write(
+                    "Engine could not be started: %s. For details, see log files.\n" % e
+                )
+            except Exception:
+                returncode = QtTaskRunner.GENERAL_ERROR
+                logger.exception("Could not cache commands.")
+                output.write("A general error was raised:\n")
+                output.write(traceback.format_exc())
+
+            bootstrapped = True
+            connection.send({"returncode": returncode, "output": output.getvalue()})
+            if not cached_all:
+                break
+            deadline = time.monotonic() + arg_data["idle_timeout"]
+    finally:
+        connection.close()
+
+
 def cache_commands(engine, entity_type, entity_id, cache_path):
     """
     Caches registered commands for the given engine.
@@ -399,51 +643,16 @@ def main():
         user = sgtk.authentication.deserialize_user(arg_data["user"])
 
     if action == "cache_actions":
-        try:
-            engine = start_engine(
-                user,
-                arg_data["configuration_uri"],
-                arg_data["pipeline_config_id"],
-                arg_data["plugin_id"],
-                arg_data["engine_name"],
-                arg_data["entity_type"],
-                arg_data["entity_id"],
-                arg_data["bundle_cache_fallback_paths"],
-                arg_data.get("pre_cache") or False,
-            )
-        except Exception as e:
-            # catch the special case where a shotgun engine has falled back
-            # to its legacy mode, looking for a shotgun_entitytype.yml file
-            # and cannot find it. In this case, we shouldn't handle that as
-            # an error but as an indication that the given entity type and
-            # entity id doesn't have any actions defined, and thus produce
-            # an empty list.
-            #
-            # Because this operation needs to be backwards compatible, we
-            # have to parse the exception message in order to extract the
-            # relevant state. The error to look for is on the following form:
-            # TankMissingEnvironmentFile: Missing environment file: /path/to/env/shotgun_camera.yml
-            #
-            if re.match(
-                "^Missing environment file:.*shotgun_[a-zA-Z0-9]+\\.yml$", str(e)
-            ):
-                logger.debug(
-                    "Bootstrap returned legacy fallback exception '%s'. "
-                    "An empty list of actions will be cached for the "
-                    "given entity type.",
-                    str(e),
-                )
-            else:
-                # bubble the error
-                raise
-
-        cache_commands(
-            engine,
-            arg_data["entity_type"],
-            arg_data["entity_id"],
-            arg_data["cache_path"],
+        cache_requested_commands(
+            user,
+            arg_data,
+            get_cache_requests(arg_data),
+            arg_data.get("pre_cache") or False,
         )
 
+    elif action == "serve_actions":
+        serve_actions(user, arg_data)
+
     elif action == "execute_command":
         engine = start_engine(
             user,
@@ -8,4 +8,12 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
-from .shotgun_data_retriever import ShotgunDataRetriever
+from sgtk.platform.qt import QtCore
+
+from .query_cache import QueryResultCache
+from .headless_data_retriever import HeadlessShotgunDataRetriever
+
+# The Qt based retriever is only available when Qt is, the headless retriever
+# can be used otherwise.
+if QtCore is not None:
+    from .shotgun_data_retriever import ShotgunDataRetriever
@@ -0,0 +1,2522 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Shotgun data retrieval logic shared by the data retrievers.
+"""
+
+import os
+import time
+import random
+import urllib
+import glob
+import hashlib
+import contextlib
+from collections import OrderedDict
+from threading import Lock
+
+import sgtk
+from sgtk import TankError
+
+from .query_cache import QueryResultCache
+
+task_manager = sgtk.platform.current_bundle().import_module("task_manager")
+
+
+def _indicate_resource_accessed(file_path):
+    """
+    Helper to indicate a resource was accessed and shouldn't be considered
+    old when cleaning up old cached data.
+    """
+    os.utime(file_path, None)
+
+
+class BaseShotgunDataRetriever(object):
+    """
+    Retrieves data and thumbnails from Shotgun and from the disk thumbnail cache
+    asynchronously, using a task manager to run tasks in background threads. This
+    class holds the retrieval logic and doesn't depend on Qt, see
+    :class:`ShotgunDataRetriever` and :class:`HeadlessShotgunDataRetriever`.
+
+    Subclasses must define the ``work_completed`` and ``work_failure`` signals and
+    implement :meth:`_create_task_manager`, :meth:`_call_later`,
+    :meth:`_on_future_cancelled`, :meth:`_load_image` and :meth:`_scale_image`.
+    """
+
+    # Individual task priorities used when adding tasks to the task manager
+    # Note: a higher value means more important and will get run before lower
+    # priority tasks
+
+    # Attachment checks and downloads are more important than thumbnails,
+    # as having access to that data will often be required instead of as
+    # a nice-to-have. As a result, this gets a bit more priority.
+    _CHECK_ATTACHMENT_PRIORITY = 55
+
+    # thumbnail checks are local disk checks and very fast.  These
+    # are always carried out before any shotgun calls
+    _CHECK_THUMB_PRIORITY = 50
+
+    # the shotgun schema is often useful to have as early on as possible,
+    # sometimes other shotgun operations also need the shotgun schema
+    # (and it's typically also cached) so this call has a higher priority
+    # than the rest of the shotgun calls
+    _SG_DOWNLOAD_SCHEMA_PRIORITY = 40
+
+    # next the priority for any other Shotgun calls (e.g. find, create,
+    # update, delete, etc.)
+    _SG_CALL_PRIORITY = 30
+
+    # Attachment downloads are not necessarily fast (but might be), but unlike
+    # thumbnails they will be required for functionality in the calling code.
+    # As such, we'll give these downloads a bit more priority.
+    _DOWNLOAD_ATTACHMENT_PRIORITY = 25
+
+    # thumbnails are downloaded last as they are considered low-priority
+    # and can take a relatively significant amount of time
+    _DOWNLOAD_THUMB_PRIORITY = 20
+
+    # Read-only Shotgun calls failing with a transient error, e.g. because the
+    # server is throttling requests, are retried with an exponential backoff.
+    _MAX_RETRIES = 3
+    _RETRY_BASE_DELAY = 0.5
+    _RETRY_MAX_DELAY = 8.0
+    # HTTP error codes considered transient.
+    _TRANSIENT_HTTP_CODES = (429, 502, 503, 504)
+
+    # Number of records retrieved per query by finds which can be cancelled.
+    _FIND_PAGE_SIZE = 500
+
+    # Sizes, in pixels, of the pre-scaled variants generated for cached thumbnails.
+    # See request_thumbnail().
+    THUMBNAIL_VARIANT_SIZES = (64, 128, 256)
+
+    def __init__(self, sg=None, bg_task_manager=None):
+        """
+        :param sg: Optional Shotgun API Instance
+        :param bg_task_manager: Optional Task manager
+        """
+        self._bundle = sgtk.platform.current_bundle()
+
+        # set up the background task manager:
+        self._task_manager = bg_task_manager or self._create_task_manager()
+        self._owns_task_manager = bg_task_manager is None
+        self._bg_tasks_group = self._task_manager.next_group_id()
+        self._task_manager.task_completed.connect(self._on_task_completed)
+        self._task_manager.task_failed.connect(self._on_task_failed)
+        self._task_manager.task_progress.connect(self._on_task_progress)
+
+        self._thumb_task_id_map = {}
+        self._attachment_task_id_map = {}
+
+        # futures handed out for requests, see get_future():
+        self._futures = task_manager.TaskFutures(self._on_future_cancelled)
+        self.work_completed.connect(self._on_work_completed)
+        self.work_failure.connect(self._on_work_failure)
+
+        # batched thumbnail source requests, see request_thumbnail_sources():
+        # check or download task id -> batch
+        self._thumb_batch_task_map = {}
+        # resolve task id -> batch
+        self._thumb_batch_resolve_map = {}
+
+        # number of Shotgun calls retried after a transient error, updated from
+        # worker threads.
+        self._retry_count = 0
+        self._retry_count_lock = Lock()
+
+        # optional memoization of find queries, see enable_query_cache()
+        self._query_cache = None
+        # task id -> (cache key, ttl, silent) for queries whose result should
+        # be added to the query cache once completed.
+        self._query_cache_task_map = {}
+        # results served from the query cache which are waiting to be emitted,
+        # request id -> (action, sg result)
+        self._pending_cached_results = OrderedDict()
+        # ids for requests answered from the query cache. They are negative so
+        # they never clash with the ids handed out by the task manager.
+        self._next_cached_request_id = -1
+
+    ############################################################################################################
+    # Public methods
+
+    def _create_task_manager(self):
+        """
+        Create the task manager used when none is given to this retriever. Must be
+        implemented by subclasses.
+
+        :returns: A task manager running a single thread.
+        """
+        raise NotImplementedError
+
+    def _call_later(self, callback):
+        """
+        Call a function from the thread this retriever lives in, once control
+        returns to its event loop. Must be implemented by subclasses.
+
+        :param callback: Callable to call.
+        """
+        raise NotImplementedError
+
+    def _on_future_cancelled(self, request_id):
+        """
+        Called when the future of a request is cancelled by its user, possibly from
+        another thread. Must be implemented by subclasses to stop the request from
+        the thread this retriever lives in.
+
+        :param str request_id: The id of the request.
+        """
+        raise NotImplementedError
+
+    def _load_image(self, path):
+        """
+        Load an image, from a background task. Must be implemented by subclasses.
+
+        :param str path: Path to the image file.
+        :returns: A QImage, or None if images can't be loaded.
+        """
+        raise NotImplementedError
+
+    def _scale_image(self, image, size):
+        """
+        Scale an image loaded by :meth:`_load_image`, keeping its aspect ratio.
+        Must be implemented by subclasses which can load images.
+
+        :param image: The image to scale.
+        :param int size: The size, in pixels, of the largest side of the scaled image.
+        :returns: The scaled image.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def download_thumbnail(url, bundle):
+        """
+        Convenience and compatibility method for quick and easy synchrnous thumbnail download.
+        This will retrieve a shotgun thumbnail given a url - if it already exists in the cache,
+        a path to it will be returned instantly. If not, it will be downloaded from Shotgun,
+        placed in the standard cache location on disk and its path will be returned.
+
+        This method returns the transcoded version of the thumbnail originally uploaded to
+        Shotgun. The image returned will always be a fixed-sized jpeg. To retrieve the thumbnail
+        file in its original format and resolution, use :meth:`BaseShotgunDataRetriever.download_thumbnail_source`
+        instead.
+
+        This is a helper method meant to make it easy to port over synchronous legacy
+        code - for a better solution, we recommend using the thumbnail retrieval
+        that runs in a background thread.
+
+        Because Shotgun thumbnail urls have an expiry time, make sure to only
+        pass urls to this method that have been very recently retrieved via a Shotgun find call.
+
+        :param url: The thumbnail url string that is associated with this thumbnail. This is
+                    the field value as returned by a Shotgun query.
+        :param bundle: App, Framework or Engine object requesting the download.
+
+        :returns: A path to the thumbnail on disk.
+        """
+
+        path_to_cached_thumb, thumb_exists = (
+            BaseShotgunDataRetriever._get_thumbnail_path(url, bundle)
+        )
+        if not thumb_exists:
+            # create folders on disk
+            bundle.ensure_folder_exists(os.path.dirname(path_to_cached_thumb))
+
+            # download using standard core method. This will ensure that
+            # proxy and connection settings as set in the PTR API are used
+            try:
+                # Ask sgtk.util.download_url() to append the file type extension
+                # to the input path_to_cached_thumb to get the full path to the
+                # cache file.
+                full_path = sgtk.util.download_url(
+                    bundle.shotgun, url, path_to_cached_thumb, True
+                )
+                path_to_cached_thumb = full_path
+            except TypeError:
+                # This may be raised if an older version of core is in use
+                # that doesn't have the final `use_url_extension` arg implemented
+                # in sgtk.util.download_url() (set to True above). Since the url
+                # is not being checked for an extension, also revert to the
+                # previous behavior of _get_thumbnail_path() which hard-coded a
+                # ".jpeg" extension to the thumbnail file path.
+                path_to_cached_thumb = "%s.jpeg" % path_to_cached_thumb
+                sgtk.util.download_url(bundle.shotgun, url, path_to_cached_thumb)
+
+            # modify the permissions of the file so it's writeable by others
+            old_umask = os.umask(0)
+            try:
+                os.chmod(path_to_cached_thumb, 0o666)
+            finally:
+                os.umask(old_umask)
+        else:
+            # Update access and modified time to "now" so the file will be kept
+            # around when culling old files in the cache.
+            # `_get_thumbnail_path` returns a full path with the extension if
+            # the thumb exists.
+            _indicate_resource_accessed(path_to_cached_thumb)
+        return path_to_cached_thumb
+
+    @staticmethod
+    def download_thumbnail_source(entity_type, entity_id, bundle):
+        """
+        Convenience and compatibility method for quick and easy synchronous thumbnail download.
+        This will retrieve the source file for a thumbnail given a shotgun entity type and id.
+        If the resolved thumbnail source file has already been cached, a path to it will be
+        returned instantly. Otherwise, it will be downloaded from Shotgun and placed in the
+        standard cache location on disk. The full path to cached thumbnail is returned.
+
+        This method returns the thumbnail file in the original format and resolution it was
+        uploaded to Shotgun as, which should be considered arbitrary. To retrieve a transcoded
+        fixed-size jpeg version of the thumbnail, use :meth:`BaseShotgunDataRetriever.download_thumbnail`
+        instead.
+
+        This is a helper method meant to make it easy to port over synchronous legacy
+        code - for a better solution, we recommend using the thumbnail retrieval
+        that runs in a background thread.
+
+        :param str entity_type: Shotgun entity type with which the thumb is associated.
+        :param int entity_id: Shotgun entity id with which the thumb is associated.
+        :param bundle: App, Framework or Engine object requesting the download.
+
+        :returns: A path to the thumbnail on disk.
+        """
+        thumb_source_url = BaseShotgunDataRetriever._get_thumbnail_source_url(
+            entity_type, entity_id, bundle
+        )
+
+        path_to_cached_thumb, thumb_exists = (
+            BaseShotgunDataRetriever._get_thumbnail_path(thumb_source_url, bundle)
+        )
+        if not thumb_exists:
+            # create folders on disk
+            bundle.ensure_folder_exists(os.path.dirname(path_to_cached_thumb))
+
+            # download using standard core method. This will ensure that
+            # proxy and connection settings as set in the PTR API are used.
+            # Allow the core method to determine the file type extension
+            # for the url about to be downloaded. Capture the full path to the
+            # thumbnail file as returned by sgtk.util.download_url().
+            try:
+                full_path = sgtk.util.download_url(
+                    bundle.shotgun, thumb_source_url, path_to_cached_thumb, True
+                )
+                path_to_cached_thumb = full_path
+            except TypeError as e:
+                # This may be raised if an older version of core is in use
+                # that doesn't have the final `use_url_extension` arg implemented
+                # in sgtk.util.download_url() (set to True above). Since the source
+                # thumbnail url spec does not contain the file type extension, there
+                # is no way to determine the proper file name to download to.
+                # Raise a TankError indicating that a newer version of core must be
+                # used in conjunction with this method.
+                raise TankError(
+                    "Caught error: \n%s\n"
+                    "Unable to download source thumbnail URL '%s' because the "
+                    "file type extension cannot be determined. Must update to a "
+                    "newer version of core to use BaseShotgunDataRetriever."
+                    "download_thumbnail_source()." % (e, thumb_source_url)
+                )
+
+            # modify the permissions of the file so it's writeable by others
+            old_umask = os.umask(0)
+            try:
+                os.chmod(path_to_cached_thumb, 0o666)
+            finally:
+                os.umask(old_umask)
+        else:
+            # Update access and modified time to "now" so the file will be kept
+            # around when culling old files in the cache.
+            # `_get_thumbnail_path` returns a full path with the extension if
+            # the thumb exists.
+            _indicate_resource_accessed(path_to_cached_thumb)
+        return path_to_cached_thumb
+
+    def start(self):
+        """
+        Start the retriever thread.
+
+        :raises:    TankError if there is no :class:`~task_manager.BackgroundTaskManager` associated with this instance
+        """
+        if not self._task_manager:
+            raise TankError(
+                "Unable to start the ShotgunDataRetriever as it has no BackgroundTaskManager!"
+            )
+        self._task_manager.start_processing()
+
+    def stop(self):
+        """
+        Gracefully stop the receiver.
+
+        Once stop() has been called, the object needs to be discarded.
+        This is a blocking call. It will synchronously wait
+        until any potential currently processing item has completed.
+
+        Note that once stopped the data retriever can't be restarted as the handle to the
+        :class:`~task_manager.BackgroundTaskManager` instance is released.
+        """
+        if not self._task_manager:
+            return
+
+        self._futures.cancel_all()
+        self._pending_cached_results.clear()
+        self._query_cache_task_map = {}
+        self._thumb_batch_task_map = {}
+        self._thumb_batch_resolve_map = {}
+        if self._query_cache:
+            self._query_cache.save()
+
+        if self._owns_task_manager:
+            # we own the task manager so we'll need to completely shut it down before
+            # returning
+            self._task_manager.shut_down()
+            self._task_manager = None
+        else:
+            # we don't own the task manager so just stop any tasks we might be running
+            # and disconnect from it:
+            self._task_manager.stop_task_group(self._bg_tasks_group)
+
+            # make sure we don't get exceptions trying to disconnect if the
+            # signals were never connected or somehow disconnected externally.
+            try:
+                self._task_manager.task_completed.disconnect(self._on_task_completed)
+            except (TypeError, RuntimeError) as e:  # was never connected
+                self._bundle.log_warning(
+                    "Could not disconnect '_on_task_completed' slot from the "
+                    "task manager's 'task_completed' signal: %s" % (e,)
+                )
+            try:
+                self._task_manager.task_failed.disconnect(self._on_task_failed)
+            except (TypeError, RuntimeError) as e:  # was never connected
+                self._bundle.log_debug(
+                    "Could not disconnect '_on_task_failed' slot from the "
+                    "task manager's 'task_failed' signal: %s" % (e,)
+                )
+            try:
+                self._task_manager.task_progress.disconnect(self._on_task_progress)
+            except (TypeError, RuntimeError) as e:  # was never connected
+                self._bundle.log_debug(
+                    "Could not disconnect '_on_task_progress' slot from the "
+                    "task manager's 'task_progress' signal: %s" % (e,)
+                )
+
+            self._task_manager = None
+
+    def clear(self):
+        """
+        Clears the queue.
+
+        Any currently processing item will complete without interruption, and signals will be
+        sent out for these items.
+        """
+        if not self._task_manager:
+            return
+        self._futures.cancel_all()
+        # drop any results from the query cache which were not emitted yet:
+        self._pending_cached_results.clear()
+        self._query_cache_task_map = {}
+        self._thumb_batch_task_map = {}
+        self._thumb_batch_resolve_map = {}
+        # stop any tasks running in the task group:
+        self._task_manager.stop_task_group(self._bg_tasks_group)
+
+    def stop_work(self, task_id):
+        """
+        Stop the specified task
+
+        :param task_id: The task to stop
+        """
+        if not self._task_manager:
+            return
+        self._futures.cancel(str(task_id))
+        if self._pending_cached_results.pop(str(task_id), None) is not None:
+            # the request was answered from the query cache and not emitted yet.
+            return
+        # request ids are task ids cast to strings, see _add_task.
+        try:
+            task_id = int(task_id)
+        except (TypeError, ValueError):
+            # not a task id, there is no task to stop.
+            return
+        if task_id in self._thumb_batch_task_map:
+            self._stop_thumbnail_batch_request(task_id)
+        # stop the task:
+        self._task_manager.stop_task(task_id)
+
+    @contextlib.contextmanager
+    def deferred_scheduling(self):
+        """
+        Context manager deferring the scheduling of the tasks of the requests made
+        in the block until it is exited, so they are all scheduled with a single
+        pass, e.g. the thumbnails requested by a model populating many items::
+
+            with retriever.deferred_scheduling():
+                for entity in entities:
+                    retriever.request_thumbnail(entity["image"], ...)
+
+        See :meth:`~task_manager.BackgroundTaskManager.deferred_scheduling`.
+        """
+        if not self._task_manager:
+            yield
+            return
+        with self._task_manager.deferred_scheduling():
+            yield
+
+    def get_future(self, request_id):
+        """
+        Return a :class:`~concurrent.futures.Future` for the result of a request, as an
+        alternative to the work_completed and work_failure signals, which are still
+        emitted.
+
+        The future is resolved with the ``data_dict`` payload of the work_completed
+        signal, or a :class:`~task_manager.TaskFailedError` with the error message of
+        the work_failure signal. It is cancelled if the request is stopped, and
+        cancelling it stops the request.
+
+        This must be called in the thread this retriever lives in, before control
+        returns to the event loop after the request was made.
+
+        :param str request_id: The unique identifier returned by a request method, e.g.
+                               :meth:`execute_find`.
+        :returns: A :class:`~concurrent.futures.Future`.
+        """
+        return self._futures.get_future(str(request_id))
+
+    def get_async_future(self, request_id, loop=None):
+        """
+        Return an :class:`asyncio.Future` for the result of a request which can be
+        awaited, see :meth:`get_future`. The future is only resolved while the events
+        of the thread this retriever lives in are processed.
+
+        :param str request_id: The unique identifier returned by a request method, e.g.
+                               :meth:`execute_find`.
+        :param loop:           The asyncio event loop to use, the current one if None.
+        :returns: An :class:`asyncio.Future`.
+        """
+        return task_manager.TaskFutures.wrap(self.get_future(request_id), loop)
+
+    @property
+    def retry_count(self):
+        """
+        The number of Shotgun calls which were retried after a transient error
+        since this retriever was created.
+        """
+        return self._retry_count
+
+    def get_throttling_stats(self):
+        """
+        Returns monitoring information about how requests are throttled.
+
+        :returns: A dictionary with the ``retries`` count for this retriever and
+                  the current ``concurrency_limit`` of its task manager. If the
+                  task manager has an adaptive concurrency limiter, its statistics
+                  are also included under the ``limiter`` key.
+        """
+        stats = {"retries": self._retry_count, "concurrency_limit": None}
+        if self._task_manager:
+            stats["concurrency_limit"] = self._task_manager.concurrency_limit
+            limiter = self._task_manager.concurrency_limiter
+            if limiter is not None:
+                stats["limiter"] = limiter.get_stats()
+        return stats
+
+    def get_schema(self, project_id=None, cached_type_schema=None, entity_types=None):
+        """
+        Execute the schema_read and schema_entity_read methods asynchronously
+
+        If a previously retrieved entity type schema is given, only the fields of
+        the entity types which were added or changed since, and of the given entity
+        types, are read with schema_field_read, instead of reading the fields of all
+        the entity types. The payload then has its "partial" key set to True, and
+        holds the fields of these entity types only.
+
+        :param project_id:  If specified, the schema listing returned will
+                            be constrained by the schema settings for
+                            the given project.
+        :param dict cached_type_schema: Entity type schema returned by a previous
+                                        request, to only read changed fields.
+        :param list entity_types: Entity types to read the fields of even if they
+                                  didn't change, when cached_type_schema is given.
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        return self._add_task(
+            self._task_get_schema,
+            priority=BaseShotgunDataRetriever._SG_DOWNLOAD_SCHEMA_PRIORITY,
+            task_kwargs={
+                "project_id": project_id,
+                "cached_type_schema": cached_type_schema,
+                "entity_types": entity_types,
+            },
+        )
+
+    def enable_query_cache(self, max_entries=256, persistent=False):
+        """
+        Enable memoization of :meth:`execute_find` and :meth:`execute_find_one`
+        results.
+
+        Once enabled, queries issued with a ``cache_ttl`` value are answered
+        from the cache if an identical query completed less than ``cache_ttl``
+        seconds ago. Queries issued without a ``cache_ttl`` are not affected.
+
+        :param int max_entries: Maximum number of query results kept in memory.
+            Least recently used results are discarded first.
+        :param bool persistent: If True, the cache is loaded from and saved to
+            the bundle cache location, allowing results to be reused across
+            sessions while they are not expired. The cache is saved when the
+            retriever is stopped.
+        """
+        cache_path = None
+        if persistent:
+            cache_path = self._get_query_cache_path()
+        self._query_cache = QueryResultCache(max_entries, cache_path)
+        self._query_cache.load()
+
+    def clear_query_cache(self):
+        """
+        Discard all results memoized by the query cache, if enabled.
+        """
+        if self._query_cache:
+            self._query_cache.invalidate()
+
+    def execute_find(
+        self, *args, cache_ttl=None, revalidate=False, stream_pages=False, **kwargs
+    ):
+        """
+        Executes a Shotgun find query asynchronously.
+
+        This method takes the same parameters as the Shotgun find() call.
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        If ``stream_pages`` is set, records are retrieved one page at a time and a
+        work_progress signal is emitted with the records of each page as soon as it
+        is retrieved, before work_completed is emitted with all the records. No
+        work_progress signal is emitted for results served from the query cache.
+
+        If the query cache was enabled with :meth:`enable_query_cache` and
+        ``cache_ttl`` is set, a matching result which is not older than
+        ``cache_ttl`` seconds is emitted with the work_completed signal as soon
+        as control returns to the event loop, without querying Shotgun.
+
+        :param ``*args``:       args to be passed to the Shotgun find() call
+        :param cache_ttl:       Optional number of seconds the result of this query
+                                can be served from the query cache.
+        :param bool revalidate: If True and the result was served from the query
+                                cache, the query is also run in the background to
+                                refresh the cache. No signal is emitted for the
+                                refresh.
+        :param bool stream_pages: If True, emit the records of each page with the
+                                work_progress signal.
+        :param ``**kwargs``:    Named parameters to be passed to the Shotgun find() call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+
+        """
+        if stream_pages:
+            task_cb = self._task_execute_find_pages
+        else:
+            task_cb = self._task_execute_find
+        return self._add_query_task(
+            task_cb, "find", args, kwargs, cache_ttl, revalidate
+        )
+
+    def execute_find_one(self, *args, cache_ttl=None, revalidate=False, **kwargs):
+        """
+        Executes a Shotgun find_one query asynchronously.
+
+        This method takes the same parameters as the Shotgun find_one() call.
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        See :meth:`execute_find` for details about query caching.
+
+        :param ``*args``:       args to be passed to the Shotgun find_one() call
+        :param cache_ttl:       Optional number of seconds the result of this query
+                                can be served from the query cache.
+        :param bool revalidate: If True and the result was served from the query
+                                cache, the query is also run in the background to
+                                refresh the cache.
+        :param ``**kwargs``:    Named parameters to be passed to the Shotgun find_one() call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+
+        """
+        return self._add_query_task(
+            self._task_execute_find_one,
+            "find_one",
+            args,
+            kwargs,
+            cache_ttl,
+            revalidate,
+        )
+
+    def execute_update(self, *args, **kwargs):
+        """
+        Execute a Shotgun update call asynchronously
+
+        This method takes the same parameters as the Shotgun update() call.
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        :param ``*args``:       args to be passed to the Shotgun update() call
+        :param ``**kwargs``:    Named parameters to be passed to the Shotgun update() call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        return self._add_task(
+            self._task_execute_update,
+            priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+            task_args=args,
+            task_kwargs=kwargs,
+        )
+
+    def execute_create(self, *args, **kwargs):
+        """
+        Execute a Shotgun create call asynchronously
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        This method takes the same parameters as the Shotgun create() call.
+
+        :param ``*args``:       args to be passed to the Shotgun create() call
+        :param ``**kwargs``:    Named parameters to be passed to the Shotgun create() call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        return self._add_task(
+            self._task_execute_create,
+            priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+            task_args=args,
+            task_kwargs=kwargs,
+        )
+
+    def execute_delete(self, *args, **kwargs):
+        """
+        Execute a Shotgun delete call asynchronously
+
+        This method takes the same parameters as the Shotgun delete() call.
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        :param ``*args``:       args to be passed to the Shotgun delete() call
+        :param ``**kwargs``:    Named parameters to be passed to the Shotgun delete() call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        return self._add_task(
+            self._task_execute_delete,
+            priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+            task_args=args,
+            task_kwargs=kwargs,
+        )
+
+    def execute_method(self, method, *args, **kwargs):
+        """
+        Executes a generic execution of a method asynchronously.  This is pretty much a
+        wrapper for executing a task through the :class:`~task_manager.BackgroundTaskManager`.
+
+        The specified method will be called on the following form::
+
+            method(sg, data)
+
+        Where sg is a shotgun API instance. Data is typically
+        a dictionary with specific data that the method needs.
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        :param method:      The method that should be executed.
+        :param ``*args``:       args to be passed to the method
+        :param ``**kwargs``:    Named parameters to be passed to the method
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        # note that as the 'task' is actually going to call through to another method, we
+        # encode the method name, args and kwargs in the task's kwargs dictionary as this
+        # keeps them nicely encapsulated.
+        task_kwargs = {"method": method, "method_args": args, "method_kwargs": kwargs}
+        return self._add_task(
+            self._task_execute_method,
+            priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+            task_kwargs=task_kwargs,
+        )
+
+    def execute_text_search(self, *args, **kwargs):
+        """
+        Executes a Shotgun ``text_search`` query asynchronously.
+
+        See the python api documentation here:
+            https://github.com/shotgunsoftware/python-api/wiki
+
+        This method takes the same parameters as the Shotgun ``text_search()`` call.
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        :param ``*args``: args to be passed to the Shotgun ``text_search()`` call
+        :param ``**kwargs``: Named parameters to be passed to the Shotgun ``text_search()`` call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        return self._add_task(
+            self._task_execute_text_search,
+            priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+            task_args=args,
+            task_kwargs=kwargs,
+        )
+
+    def execute_nav_expand(self, *args, **kwargs):
+        """
+        Executes a Shotgun ``nav_expand`` query asynchronously.
+
+        See the python api documentation here:
+            https://github.com/shotgunsoftware/python-api/wiki
+
+        This method takes the same parameters as the Shotgun ``nav_expand()`` call.
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        :param ``*args``: args to be passed to the Shotgun ``nav_expand()`` call
+        :param ``**kwargs``: Named parameters to be passed to the Shotgun ``nav_expand()`` call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        return self._add_task(
+            self._task_execute_nav_expand,
+            priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+            task_args=args,
+            task_kwargs=kwargs,
+        )
+
+    def execute_nav_search_string(self, *args, **kwargs):
+        """
+        Executes a Shotgun ``nav_search_string`` query asynchronously.
+
+        See the python api documentation here:
+            https://github.com/shotgunsoftware/python-api/wiki
+
+        This method takes the same parameters as the Shotgun ``nav_search_string()`` call.
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        :param ``*args``: args to be passed to the Shotgun ``nav_search_string()`` call
+        :param ``**kwargs``: Named parameters to be passed to the Shotgun ``nav_search_string()`` call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        return self._add_task(
+            self._task_execute_nav_search_string,
+            priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+            task_args=args,
+            task_kwargs=kwargs,
+        )
+
+    def execute_nav_search_entity(self, *args, **kwargs):
+        """
+        Executes a Shotgun ``nav_search_entity`` query asynchronously.
+
+        See the python api documentation here:
+            https://github.com/shotgunsoftware/python-api/wiki
+
+        This method takes the same parameters as the Shotgun ``nav_search_entity()`` call.
+
+        The query will be queued up and once processed, either a
+        work_completed or work_failure signal will be emitted.
+
+        :param ``*args``: args to be passed to the Shotgun ``nav_search_entity()`` call
+        :param ``**kwargs``: Named parameters to be passed to the Shotgun ``nav_search_entity()`` call
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        return self._add_task(
+            self._task_execute_nav_search_entity,
+            priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+            task_args=args,
+            task_kwargs=kwargs,
+        )
+
+    def _add_task(self, task_cb, priority, task_args=None, task_kwargs=None):
+        """
+        Simplified wrapper to add a task to the task manager.  All tasks get added into
+        the same group (self._bg_tasks_group) and the returned task_id is cast to a string
+        to retain backwards compatibility (it used to return a uuid string).
+
+        :param task_cb:     The function to execute for the task
+        :param priority:    The priority the task should be run with
+        :param task_args:   Arguments that should be passed to the task callback
+        :param task_kwargs: Named arguments that should be passed to the task callback
+        :returns:           String representation of the task id
+        :raises:            TankError if there is no task manager available to add the task to!
+        """
+        if not self._task_manager:
+            raise TankError(
+                "Data retriever does not have a task manager to add the task to!"
+            )
+
+        task_id = self._task_manager.add_task(
+            task_cb,
+            priority,
+            group=self._bg_tasks_group,
+            task_args=task_args,
+            task_kwargs=task_kwargs,
+        )
+        return str(task_id)
+
+    def _add_query_task(self, task_cb, action, args, kwargs, cache_ttl, revalidate):
+        """
+        Add a Shotgun query task to the task manager, or answer it from the query
+        cache if possible.
+
+        :param task_cb:         The function to execute for the task
+        :param str action:      The action name reported for the query, e.g. "find"
+        :param args:            Arguments that should be passed to the task callback
+        :param dict kwargs:     Named arguments that should be passed to the task callback
+        :param cache_ttl:       Number of seconds the result can be served from the
+                                query cache, or None to bypass the cache.
+        :param bool revalidate: Whether to refresh the cache in the background when
+                                the result is served from the cache.
+        :returns:               String representation of the request id
+        """
+        if not cache_ttl or self._query_cache is None:
+            return self._add_task(
+                task_cb,
+                priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+                task_args=args,
+                task_kwargs=kwargs,
+            )
+
+        if not self._task_manager:
+            raise TankError(
+                "Data retriever does not have a task manager to add the task to!"
+            )
+
+        cache_key = self._query_cache.make_key(action, args, kwargs)
+        found, sg_result = self._query_cache.get(cache_key)
+        if not found:
+            task_id = self._add_task(
+                task_cb,
+                priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+                task_args=args,
+                task_kwargs=kwargs,
+            )
+            self._query_cache_task_map[int(task_id)] = (cache_key, cache_ttl, False)
+            return task_id
+
+        request_id = str(self._next_cached_request_id)
+        self._next_cached_request_id -= 1
+        if not self._pending_cached_results:
+            # emit from the event loop so the caller can register the request id
+            # before the result is delivered, like for any other request.
+            self._call_later(self._emit_cached_results)
+        self._pending_cached_results[request_id] = (action, sg_result)
+
+        if revalidate:
+            task_id = self._add_task(
+                task_cb,
+                priority=BaseShotgunDataRetriever._SG_CALL_PRIORITY,
+                task_args=args,
+                task_kwargs=kwargs,
+            )
+            self._query_cache_task_map[int(task_id)] = (cache_key, cache_ttl, True)
+
+        return request_id
+
+    def _emit_cached_results(self):
+        """
+        Emit the work_completed signal for all requests answered from the query
+        cache since the last call.
+        """
+        while self._pending_cached_results:
+            request_id, (action, sg_result) = self._pending_cached_results.popitem(
+                last=False
+            )
+            self.work_completed.emit(request_id, action, {"sg": sg_result})
+
+    def _get_query_cache_path(self):
+        """
+        Returns the path to the file the query cache is persisted to.
+
+        Cached results are user specific, as what a query returns depends on the
+        permissions of the user running it.
+
+        :returns: Path as a string.
+        """
+        user_hash = hashlib.md5()
+        user = sgtk.get_authenticated_user()
+        if user and user.login:
+            user_hash.update(user.login.encode("utf-8"))
+
+        # note: the "sg" folder is culled by the framework old data clean up.
+        return os.path.join(
+            self._bundle.cache_location,
+            "sg",
+            "query_cache",
+            "%s.%s" % (user_hash.hexdigest(), QueryResultCache.FORMAT_VERSION),
+        )
+
+    def request_attachment(self, attachment_entity):
+        """
+        Downloads an attachment from Shotgun asynchronously or returns a cached
+        file path if found.
+
+        .. note:: The provided Attachment entity definition must contain, at a
+                  minimum, the "this_file" substructure.
+
+        .. code-block:: python
+
+            {
+                "id": 597,
+                "this_file": {
+                    "content_type": "image/png",
+                    "id": 597,
+                    "link_type": "upload",
+                    "name": "test.png",
+                    "type": "Attachment",
+                    "url": "https://abc.shotgunstudio.com/file_serve/attachment/597"
+                },
+                "type": "Attachment"
+            }
+
+        :param dict attachment_entity: The Attachment entity to download data from.
+
+        :returns: A unique identifier representing this request.
+        """
+        if not self._task_manager:
+            self._bundle.log_warning(
+                "No task manager has been associated with this data retriever. "
+                "Unable to request attachment."
+            )
+            return
+
+        # always add check for attachments already downloaded:
+        check_task_id = self._task_manager.add_task(
+            self._task_check_attachment,
+            priority=self._CHECK_ATTACHMENT_PRIORITY,
+            group=self._bg_tasks_group,
+            task_kwargs=dict(attachment_entity=attachment_entity),
+        )
+
+        # Add download thumbnail task.  This is dependent on the check task above and will be passed
+        # the returned results from that task in addition to the kwargs specified below.  This allows
+        # a task dependency chain to be created with different priorities for the separate tasks.
+        dl_task_id = self._task_manager.add_task(
+            self._task_download_attachment,
+            upstream_task_ids=[check_task_id],
+            priority=self._DOWNLOAD_ATTACHMENT_PRIORITY,
+            group=self._bg_tasks_group,
+            task_kwargs=dict(attachment_entity=attachment_entity),
+        )
+
+        # all results for requesting a thumbnail should be returned with the same id so use
+        # a mapping to track the 'primary' task id:
+        self._attachment_task_id_map[dl_task_id] = check_task_id
+        return str(check_task_id)
+
+    def request_attachments(self, attachment_entities):
+        """
+        Downloads several attachments from Shotgun asynchronously, one after the
+        other, or returns their cached file paths if found.
+
+        A work_progress signal is emitted with a ``download_attachments`` request
+        type each time an attachment is available, with the ``attachment`` entity and
+        its ``file_path`` in the payload. The work_completed signal is then emitted
+        with the ``file_paths`` of all the attachments, keyed by Attachment id.
+
+        .. note:: The provided Attachment entity definitions must contain, at a
+                  minimum, the "this_file" substructure, see :meth:`request_attachment`.
+
+        :param list attachment_entities: The Attachment entities to download data from.
+
+        :returns: A unique identifier representing this request.
+        """
+        if not self._task_manager:
+            self._bundle.log_warning(
+                "No task manager has been associated with this data retriever. "
+                "Unable to request attachments."
+            )
+            return
+
+        return self._add_task(
+            self._task_download_attachments,
+            priority=BaseShotgunDataRetriever._DOWNLOAD_ATTACHMENT_PRIORITY,
+            task_kwargs=dict(attachment_entities=list(attachment_entities)),
+        )
+
+    def request_thumbnail(
+        self, url, entity_type, entity_id, field, load_image=False, size=None
+    ):
+        """
+        Downloads a thumbnail from Shotgun asynchronously or returns a cached thumbnail
+        if found.  Optionally loads the thumbnail into a QImage.
+
+        If a ``size`` is given, pre-scaled variants of the thumbnail are generated
+        in the background for all :attr:`THUMBNAIL_VARIANT_SIZES` and cached on disk
+        next to it. The smallest variant which is at least ``size`` pixels wide and
+        high is then returned instead of the full size thumbnail, so views
+        displaying small thumbnails don't have to load and scale large images.
+        The full size thumbnail is returned if no such variant exists.
+
+        :param url:         The thumbnail url string that is associated with this thumbnail. This is
+                            the field value as returned by a Shotgun query.
+        :param entity_type: Shotgun entity type with which the thumb is associated.
+        :param entity_id:   Shotgun entity id with which the thumb is associated.
+        :param field:       Thumbnail field. Normally 'image' but could also for example be a deep
+                            link field such as ``sg_sequence.Sequence.image``
+        :param load_image:  If set to True, the return data structure will contain a QImage object
+                            with the image data loaded.
+        :param int size:    Optional size, in pixels, the thumbnail will be displayed at.
+
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        if not self._task_manager:
+            self._bundle.log_warning(
+                "No task manager has been associated with this data retriever. "
+                "Unable to request thumbnail."
+            )
+            return
+
+        # the check and the download of the thumbnail are scheduled together.
+        with self._task_manager.deferred_scheduling():
+            # always add check for thumbnail already downloaded:
+            check_task_id = self._task_manager.add_task(
+                self._task_check_thumbnail,
+                priority=self._CHECK_THUMB_PRIORITY,
+                group=self._bg_tasks_group,
+                task_kwargs={"url": url, "load_image": load_image, "size": size},
+            )
+
+            # Add download thumbnail task.  This is dependent on the check task above and will be passed
+            # the returned results from that task in addition to the kwargs specified below.  This allows
+            # a task dependency chain to be created with different priorities for the separate tasks.
+            dl_task_id = self._task_manager.add_task(
+                self._task_download_thumbnail,
+                upstream_task_ids=[check_task_id],
+                priority=self._DOWNLOAD_THUMB_PRIORITY,
+                group=self._bg_tasks_group,
+                task_kwargs={
+                    "url": url,
+                    "entity_type": entity_type,
+                    "entity_id": entity_id,
+                    "field": field,
+                    "load_image": load_image,
+                    "size": size,
+                    # "thumb_path":<passed from check task>
+                    # "image":<passed from check task>
+                },
+            )
+
+        # all results for requesting a thumbnail should be returned with the same id so use
+        # a mapping to track the 'primary' task id:
+        self._thumb_task_id_map[dl_task_id] = check_task_id
+
+        return str(check_task_id)
+
+    def request_thumbnail_source(
+        self, entity_type, entity_id, load_image=False, size=None
+    ):
+        """
+        Downloads a thumbnail from Shotgun asynchronously or returns a cached thumbnail
+        if found.  Optionally loads the thumbnail into a QImage.
+
+        :param entity_type: Shotgun entity type with which the thumb is associated.
+        :param entity_id:   Shotgun entity id with which the thumb is associated.
+        :param load_image:  If set to True, the return data structure will contain a
+                            QImage object with the image data loaded.
+        :param int size:    Optional size, in pixels, the thumbnail will be displayed at.
+                            See :meth:`request_thumbnail`.
+
+        :returns: A unique identifier representing this request. This
+                  identifier is also part of the payload sent via the
+                  work_completed and work_failure signals, making it
+                  possible to match them up.
+        """
+        # construct the url that refers to the thumbnail's source image
+        thumb_source_url = self._get_thumbnail_source_url(
+            entity_type, entity_id, self._bundle
+        )
+
+        return self.request_thumbnail(
+            thumb_source_url, entity_type, entity_id, None, load_image, size
+        )
+
+    def request_thumbnail_sources(
+        self, entities, load_image=False, size=None, max_concurrent_downloads=4
+    ):
+        """
+        Batched version of :meth:`request_thumbnail_source`, for example to populate
+        a gallery of many entities.
+
+        Which entities have a thumbnail is resolved with a single Shotgun query per
+        entity type, while the thumbnail cache on disk is checked for all of them.
+        Thumbnails which are not cached are then downloaded, with at most
+        ``max_concurrent_downloads`` downloads for this batch running at any time
+        so other requests can still be processed.
+
+        Results are reported for each entity with the work_completed and
+        work_failure signals, exactly like for :meth:`request_thumbnail_source`.
+        Entities without a thumbnail are reported as a ``download_thumbnail``
+        completion with a ``None`` thumbnail path.
+
+        :param entities:    A list of ``(entity_type, entity_id)`` tuples.
+        :param load_image:  If set to True, the return data structures will contain a
+                            QImage object with the image data loaded.
+        :param int size:    Optional size, in pixels, the thumbnails will be displayed at.
+                            See :meth:`request_thumbnail`.
+        :param int max_concurrent_downloads: Maximum number of thumbnails from this batch
+                            downloaded at the same time.
+        :returns: A dictionary where keys are the ``(entity_type, entity_id)`` tuples
+                  and values the unique identifiers for the requests, which are part
+                  of the payload sent via the work_completed and work_failure signals.
+        """
+        if not self._task_manager:
+            self._bundle.log_warning(
+                "No task manager has been associated with this data retriever. "
+                "Unable to request thumbnails."
+            )
+            return {}
+
+        entities = list(dict.fromkeys(entities))
+        batch = {
+            "load_image": load_image,
+            "size": size,
+            "max_downloads": max(1, max_concurrent_downloads),
+            # set of (entity_type, entity_id) with a thumbnail, None until resolved
+            "has_thumbnail": None,
+            # check task ids which didn't find a cached thumbnail, in request order
+            "to_download": [],
+            "downloading": 0,
+            # download task id -> check task id of the request
+            "downloads": {},
+            # check task id -> (url, entity_type, entity_id)
+            "requests": {},
+        }
+
+        entity_ids_by_type = OrderedDict()
+        for entity_type, entity_id in entities:
+            entity_ids_by_type.setdefault(entity_type, []).append(entity_id)
+        tasks = [
+            {
+                "cbl": self._task_resolve_thumbnail_sources,
+                "priority": self._SG_CALL_PRIORITY,
+                "group": self._bg_tasks_group,
+                "task_kwargs": {"entity_ids_by_type": entity_ids_by_type},
+            }
+        ]
+        urls = []
+        for entity_type, entity_id in entities:
+            url = self._get_thumbnail_source_url(entity_type, entity_id, self._bundle)
+            urls.append(url)
+            tasks.append(
+                {
+                    "cbl": self._task_check_thumbnail,
+                    "priority": self._CHECK_THUMB_PRIORITY,
+                    "group": self._bg_tasks_group,
+                    "task_kwargs": {"url": url, "load_image": load_image, "size": size},
+                }
+            )
+        task_ids = self._task_manager.add_tasks(tasks)
+        self._thumb_batch_resolve_map[task_ids[0]] = batch
+
+        request_ids = {}
+        for (entity_type, entity_id), url, check_task_id in zip(
+            entities, urls, task_ids[1:]
+        ):
+            batch["requests"][check_task_id] = (url, entity_type, entity_id)
+            self._thumb_batch_task_map[check_task_id] = batch
+            request_ids[(entity_type, entity_id)] = str(check_task_id)
+
+        return request_ids
+
+    def _process_thumbnail_batch(self, batch):
+        """
+        Queue downloads for a batch of thumbnail source requests, within the limit of
+        concurrent downloads for the batch, once it is known which entities have a
+        thumbnail.
+
+        :param dict batch: A batch created by :meth:`request_thumbnail_sources`.
+        """
+        if batch["has_thumbnail"] is None or not self._task_manager:
+            return
+
+        to_download = batch["to_download"]
+        batch["to_download"] = []
+        for check_task_id in to_download:
+            if check_task_id not in batch["requests"]:
+                # stopped while results were emitted.
+                continue
+            url, entity_type, entity_id = batch["requests"][check_task_id]
+            if (entity_type, entity_id) not in batch["has_thumbnail"]:
+                # nothing to download for this one, it doesn't need to wait for
+                # the downloads.
+                del batch["requests"][check_task_id]
+                del self._thumb_batch_task_map[check_task_id]
+                self.work_completed.emit(
+                    str(check_task_id),
+                    "download_thumbnail",
+                    {"thumb_path": None, "image": None},
+                )
+                continue
+            if batch["downloading"] >= batch["max_downloads"]:
+                batch["to_download"].append(check_task_id)
+                continue
+
+            del batch["requests"][check_task_id]
+            dl_task_id = self._task_manager.add_task(
+                self._task_download_thumbnail,
+                priority=self._DOWNLOAD_THUMB_PRIORITY,
+                group=self._bg_tasks_group,
+                task_kwargs={
+                    "thumb_path": None,
+                    "url": url,
+                    "entity_type": entity_type,
+                    "entity_id": entity_id,
+                    "field": None,
+                    "load_image": batch["load_image"],
+                    "size": batch["size"],
+                },
+            )
+            batch["downloading"] += 1
+            batch["downloads"][dl_task_id] = check_task_id
+            self._thumb_task_id_map[dl_task_id] = check_task_id
+            self._thumb_batch_task_map[dl_task_id] = batch
+
+    def _on_thumbnail_batch_task_done(self, task_id, result):
+        """
+        Update the state of a batch of thumbnail source requests when one of its
+        tasks completes or fails.
+
+        :param int task_id: The id of the task which is done.
+        :param result: The task result, or None if the task failed.
+        """
+        batch = self._thumb_batch_resolve_map.pop(task_id, None)
+        if batch is not None:
+            if result is None:
+                # the query failed, just try to download everything.
+                batch["has_thumbnail"] = set(
+                    (entity_type, entity_id)
+                    for _, entity_type, entity_id in batch["requests"].values()
+                )
+            else:
+                batch["has_thumbnail"] = result["has_thumbnail"]
+            self._process_thumbnail_batch(batch)
+            return
+
+        batch = self._thumb_batch_task_map.pop(task_id, None)
+        if batch is None:
+            return
+        if task_id in batch["requests"]:
+            # a check task, the request is done unless the thumbnail is not cached.
+            if result is not None and not result.get("thumb_path"):
+                batch["to_download"].append(task_id)
+                # the request can still be stopped with its id until the download
+                # is done.
+                self._thumb_batch_task_map[task_id] = batch
+            else:
+                del batch["requests"][task_id]
+        else:
+            # a download task.
+            batch["downloading"] -= 1
+            self._thumb_batch_task_map.pop(batch["downloads"].pop(task_id), None)
+        self._process_thumbnail_batch(batch)
+
+    def _stop_thumbnail_batch_request(self, task_id):
+        """
+        Remove a stopped request from its batch of thumbnail source requests, and
+        stop its download, so the batch moves on with the other requests.
+
+        :param int task_id: The id of the check task of the request, or of its
+                            download task.
+        """
+        batch = self._thumb_batch_task_map.pop(task_id, None)
+        check_task_id = batch["downloads"].get(task_id, task_id)
+        self._thumb_batch_task_map.pop(check_task_id, None)
+        batch["requests"].pop(check_task_id, None)
+        if check_task_id in batch["to_download"]:
+            batch["to_download"].remove(check_task_id)
+        for dl_task_id, request_task_id in list(batch["downloads"].items()):
+            if request_task_id != check_task_id:
+                continue
+            del batch["downloads"][dl_task_id]
+            self._thumb_batch_task_map.pop(dl_task_id, None)
+            self._thumb_task_id_map.pop(dl_task_id, None)
+            batch["downloading"] -= 1
+            self._task_manager.stop_task(dl_task_id)
+        self._process_thumbnail_batch(batch)
+
+    # ------------------------------------------------------------------------------------------------
+    # Background task management and methods
+
+    def _is_transient_error(self, error):
+        """
+        Check if an error raised by a Shotgun call is likely to go away if the
+        call is retried, e.g. a connection reset or the server being busy.
+
+        Errors raised while handling another error, e.g. the ``TankError`` raised
+        by ``sgtk.util.download_url``, are transient if the original error is.
+
+        :param error: The raised exception.
+        :returns: True if the error is transient, False otherwise.
+        """
+        while error is not None:
+            if isinstance(error, (ConnectionError, TimeoutError)):
+                return True
+            # Shotgun API protocol errors have an errcode, urllib HTTP errors a code.
+            http_code = getattr(error, "errcode", None) or getattr(error, "code", None)
+            if http_code in self._TRANSIENT_HTTP_CODES:
+                return True
+            error = error.__cause__ or error.__context__
+        return False
+
+    def _call_shotgun(self, method_name, *args, retry=True, **kwargs):
+        """
+        Call a Shotgun API method from a background task.
+
+        The latency and transient failures of the call are reported to the task
+        manager concurrency limiter, if any. Transient failures are retried with
+        an exponential backoff if ``retry`` is True, which must only be the case
+        for calls which are safe to repeat.
+
+        :param str method_name: Name of the Shotgun API method to call.
+        :param ``*args``:       Unnamed arguments for the call.
+        :param bool retry:      Whether the call can be retried.
+        :param ``**kwargs``:    Named arguments for the call.
+        :returns: The value returned by the Shotgun API method.
+        """
+        return self._call_with_retries(
+            getattr(self._bundle.shotgun, method_name), *args, retry=retry, **kwargs
+        )
+
+    def _call_with_retries(self, method, *args, retry=True, **kwargs):
+        """
+        Call a function talking to the Shotgun server from a background task, e.g.
+        a Shotgun API method or a download, see :meth:`_call_shotgun`.
+
+        :param method:          The function to call.
+        :param ``*args``:       Unnamed arguments for the call.
+        :param bool retry:      Whether the call can be retried.
+        :param ``**kwargs``:    Named arguments for the call.
+        :returns: The value returned by the function.
+        """
+        manager = self._task_manager
+        limiter = manager.concurrency_limiter if manager else None
+        token = task_manager.CancellationToken.current()
+        attempt = 0
+        while True:
+            if token is not None:
+                token.raise_if_cancelled()
+            start = time.monotonic()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                if not self._is_transient_error(e):
+                    raise
+                if limiter is not None:
+                    limiter.record_failure()
+                if not retry or attempt >= self._MAX_RETRIES:
+                    raise
+                # exponential backoff, with some jitter so throttled clients
+                # don't hit the server again all at the same time.
+                delay = min(self._RETRY_BASE_DELAY * 2**attempt, self._RETRY_MAX_DELAY)
+                delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                with self._retry_count_lock:
+                    self._retry_count += 1
+                if token is None:
+                    time.sleep(delay)
+                elif token.wait(delay):
+                    token.raise_if_cancelled()
+            else:
+                if limiter is not None:
+                    limiter.record_success(time.monotonic() - start)
+                return result
+
+    def _download_url(self, file_path, url, entity_type, entity_id, field):
+        """
+        Downloads a file located at the given url to the provided file path.
+
+        :param str file_path: The target path.
+        :param str url: The url location of the file to download.
+        :param str entity_type: The Shotgun entity type that the url is
+                                associated with. In the event that the
+                                provided url has expired, the entity
+                                type and id provided will be used to query
+                                a fresh url.
+        :param int entity_id: The Shotgun entity id that the url is
+                              associated with. In the event that the
+                              provided url has expired, the entity type and
+                              id provided will be used to query a fresh url.
+        :param str field: The name of the field that contains the url. If
+                          the url needs to be requeried, this field will be
+                          where the fresh url is pulled from.
+        :returns: Full path the downloaded file. This value may be different
+                  than the input `file_path` if the resolved url's extension
+                  differed from what was specified.
+        """
+        self._raise_if_cancelled()
+        try:
+            # download using standard core method. This will ensure that
+            # proxy and connection settings as set in the PTR API are used
+            try:
+                # Ask sgtk.util.download_url() to append the file type extension
+                # to the input file_path to get the full path to the cache file.
+                download_path = self._call_with_retries(
+                    sgtk.util.download_url, self._bundle.shotgun, url, file_path, True
+                )
+                file_path = download_path
+            except TypeError:
+                # This may be raised if an older version of core is in use
+                # that doesn't have the final `use_url_extension` arg implemented
+                # in sgtk.util.download_url() (set to True above). Since the url
+                # is not being checked for an extension, also revert to the
+                # previous behavior of _get_thumbnail_path() which hard-coded a
+                # ".jpeg" extension to the thumbnail file path.
+                file_path = "%s.jpeg" % file_path
+                self._call_with_retries(
+                    sgtk.util.download_url, self._bundle.shotgun, url, file_path
+                )
+
+        except TankError as e:
+            if field is not None:
+                self._raise_if_cancelled()
+                sg_data = self._call_shotgun(
+                    "find_one", entity_type, [["id", "is", entity_id]], [field]
+                )
+
+                if sg_data is None or sg_data.get(field) is None:
+                    # This means there's nothing in Shotgun for this field, which
+                    # means we can't download anything.
+                    raise IOError(
+                        "Field %s does not contain data for %s (id=%s)."
+                        % (field, entity_type, entity_id)
+                    )
+                else:
+                    # Again, download using standard core method. This will ensure that
+                    # proxy and connection settings as set in the PTR API are used.
+                    url = sg_data[field]
+                    try:
+                        # Ask sgtk.util.download_url() to append the file type extension
+                        # to the input file_path to get the full path to the cache file.
+                        download_path = self._call_with_retries(
+                            sgtk.util.download_url,
+                            self._bundle.shotgun,
+                            url,
+                            file_path,
+                            True,
+                        )
+                        file_path = download_path
+                    except TypeError:
+                        # This may be raised if an older version of core is in use
+                        # that doesn't have the final `use_url_extension` arg implemented
+                        # in sgtk.util.download_url() (set to True above). Since the url
+                        # is not being checked for an extension, also revert to the
+                        # previous behavior of _get_thumbnail_path() which hard-coded a
+                        # ".jpeg" extension to the thumbnail file path.
+                        file_path = "%s.jpeg" % file_path
+                        self._call_with_retries(
+                            sgtk.util.download_url, self._bundle.shotgun, url, file_path
+                        )
+
+        # now we have a thumbnail on disk, either via the direct download, or via the
+        # url-fresh-then-download approach.  Because the file is downloaded with user-only
+        # permissions we have to modify the permissions so that it's writeable by others
+        old_umask = os.umask(0)
+        try:
+            os.chmod(file_path, 0o666)
+        finally:
+            os.umask(old_umask)
+
+        return file_path
+
+    @staticmethod
+    def _raise_if_cancelled():
+        """
+        Raise an error if the background task running in the current thread was
+        cancelled, e.g. because it was stopped or timed out.
+
+        :raises: :class:`~task_manager.TaskCancelledError`
+        """
+        token = task_manager.CancellationToken.current()
+        if token is not None:
+            token.raise_if_cancelled()
+
+    @staticmethod
+    def _get_thumbnail_source_url(entity_type, entity_id, bundle):
+        """
+        Returns the url referring to the source image of an entity thumbnail.
+
+        :param str entity_type: Shotgun entity type with which the thumb is associated.
+        :param int entity_id: Shotgun entity id with which the thumb is associated.
+        :param bundle: App, Engine or Framework instance
+        :returns: Url as a string.
+        """
+        return urllib.parse.urlunparse(
+            (
+                bundle.shotgun.config.scheme,
+                bundle.shotgun.config.server,
+                "/thumbnail/full/%s/%s"
+                % (
+                    urllib.parse.quote(str(entity_type)),
+                    urllib.parse.quote(str(entity_id)),
+                ),
+                None,
+                None,
+                None,
+            )
+        )
+
+    @staticmethod
+    def _get_attachment_path(attachment_entity, bundle):
+        """
+        Returns the location on disk suitable for an attachment file.
+
+        :param dict attachment_entity: The Attachment entity definition.
+        :param bundle: App, Engine or Framework instance
+
+        :returns: Path as a string.
+        """
+        url = attachment_entity["this_file"]["url"]
+        file_name = attachment_entity["this_file"]["name"]
+
+        directory_path, path_exists = BaseShotgunDataRetriever._get_thumbnail_path(
+            url, bundle, directory_only=True
+        )
+
+        return os.path.join(directory_path, file_name)
+
+    @staticmethod
+    def _get_thumbnail_path(url, bundle, directory_only=False):
+        """
+        Returns the location on disk suitable for a thumbnail given its url and
+        whether a cached file for the specified ``url`` already exists. Two cases
+        are handled:
+
+        Case A: ``directory_only`` is set to False and the ``url`` cache file does not exist:
+
+            >>> (path, cache_exists) = _get_thumbnail_path("https://foo/bar/baz.jpg")
+
+            Where return data ``(path, cache_exists) = ('/tmp/xx/yy/1245/6678', False)``
+
+            This will always return a file path without an extension. Since the cache
+            file does not exist, download it using sgtk.util.download_url(), setting
+            the ``use_url_extension`` arg to True, which will return the full path to the
+            cached file:
+
+            >>> full_path = sgtk.util.download_url(sg, "https://foo/bar/baz.jpg", path, True)
+
+            Where ``full_path`` now contains a file extension: /tmp/xx/yy/1245/6678.jpg
+
+        Case B: ``directory_only`` is set to False and the ``url`` cache file does exist:
+
+            >>> (path, cache_exists) = _get_thumbnail_path("https://foo/bar/baz.jpg")
+
+            Where return data ``(path, cache_exists) = ('/tmp/xx/yy/1245/6678.jpg', True)``
+
+            This will always return the full path to the cached file, so no need to
+            do any addtional work.
+
+
+        :param str url: Path to a thumbnail
+        :param bundle: App, Engine or Framework instance
+        :param bool directory_only: Whether to return a directory path or a
+                                    full file path. Default is False, which
+                                    indicates a full file path, including
+                                    file name, will be returned.
+
+        :returns: Tuple (str, bool) Path or path with basename as a string,
+                                    cached thumbnail exists on disk
+        """
+        # If we don't have a URL, then we know we don't
+        # have a thumbnail to worry about.
+        if not url:
+            return (None, None)
+
+        # hash the path portion of the thumbnail url
+        url_obj = urllib.parse.urlparse(url)
+        url_hash = hashlib.md5()
+        url_hash.update(url_obj.path.encode("utf-8"))
+        hash_str = url_hash.hexdigest()
+
+        # Now turn this hash into a tree structure. For a discussion about sensible
+        # sharding methodology, see
+        # http://stackoverflow.com/questions/13841931/using-guids-as-folder-names-splitting-up
+        #
+        # From the hash, generate paths on the form C1C2/C3C4/rest_of_hash
+        # (where C1 is the first character of the hash). For a million evenly distributed
+        # items, this means ~15 items per folder.
+        first_folder = hash_str[0:2]
+        second_folder = hash_str[2:4]
+
+        # Establish the cache path directory
+        # If possible we share thumbnails at the site cache level.
+        # Site cache location was introduced in tk-core > v0.18.118, to not
+        # introduce a dependency on a tk-core release, we simply check if the method
+        # is available or not.
+        if hasattr(bundle, "site_cache_location"):
+            cache_path_items = [
+                bundle.site_cache_location,
+                "thumbs",
+                first_folder,
+                second_folder,
+            ]
+        else:
+            # Fallback to caching per project/pipeline config/plugin id.
+            cache_path_items = [
+                bundle.cache_location,
+                "thumbs",
+                first_folder,
+                second_folder,
+            ]
+
+        cached_thumb_exists = False
+        # If we were only asked to give back a directory path then we can
+        # skip building and appending a file name.
+        if not directory_only:
+            # Look for an existing cache file. Use the glob module since
+            # we do not know what the file type of the cache file is.
+            path_base = hash_str[4:]
+            cache_base = os.path.join(*(cache_path_items + [path_base]))
+
+            # Attempt to match something that looks like:
+            #   /bundle_cache_location/thumbs/C1C2/C3C4/rest_of_hash.*
+            cache_matches = glob.glob("%s.*" % cache_base)
+            if len(cache_matches):
+                if len(cache_matches) > 1:
+                    # If somehow more than one cache file exists, the wrong icon may be displayed.
+                    # Log some information about how to resolve this problem.
+                    bundle.log_debug(
+                        "More than one cached file found for url '%s':" % url
+                    )
+                    [
+                        bundle.log_debug("    %s" % cache_match)
+                        for cache_match in cache_matches
+                    ]
+                    bundle.log_debug(
+                        "Using '%s'. "
+                        "If this is incorrect, manually remove the undesired cache file."
+                        % cache_matches[0]
+                    )
+
+                # Cache file exists, so append the full file name (e.g. rest_of_hash.png)
+                cache_path_items.append(os.path.basename(cache_matches[0]))
+                cached_thumb_exists = True
+            else:
+                # Cache file does not exist, so only append the basename of the cached
+                # thumbnail that does NOT include the file type extension (e.g. rest_of_hash).
+                # The extension will be appended later by a call to sgtk.util.download_url()
+                cache_path_items.append(path_base)
+
+        # Join up the path cache items which result in either a directory like
+        # '/bundle_cache_location/thumbs/C1C2/C3C4' or a file path like
+        # '/bundle_cache_location/thumbs/C1C2/C3C4/rest_of_hash' if the cache file
+        # does not exist or '/bundle_cache_location/thumbs/C1C2/C3C4/rest_of_hash.ext'
+        # if it does.
+        path_to_cached_thumb = os.path.join(*cache_path_items)
+
+        return (path_to_cached_thumb, cached_thumb_exists)
+
+    @staticmethod
+    def _get_thumbnail_variant_path(thumb_path, size):
+        """
+        Returns the location on disk of a pre-scaled variant of a cached thumbnail.
+
+        Variants are stored in a sub-folder next to the cached thumbnail, e.g.
+        '/bundle_cache_location/thumbs/C1C2/C3C4/scaled/128/rest_of_hash.png', so
+        they don't interfere with the lookup of the cached thumbnail itself.
+
+        :param str thumb_path: Full path to the cached thumbnail.
+        :param int size: The variant size, in pixels.
+        :returns: Path as a string.
+        """
+        base_name = os.path.splitext(os.path.basename(thumb_path))[0]
+        return os.path.join(
+            os.path.dirname(thumb_path), "scaled", str(size), "%s.png" % base_name
+        )
+
+    def _get_thumbnail_variant(self, thumb_path, size):
+        """
+        Returns the path to the pre-scaled variant of a cached thumbnail best suited
+        for the given display size, generating the variants if needed.
+
+        This is meant to be called from a background task.
+
+        :param str thumb_path: Full path to the cached thumbnail.
+        :param int size: The size, in pixels, the thumbnail will be displayed at.
+        :returns: Path to the smallest variant at least as large as ``size`` or
+                  ``thumb_path`` if there is no such variant.
+        """
+        candidate_sizes = [s for s in self.THUMBNAIL_VARIANT_SIZES if s >= size]
+        if not candidate_sizes:
+            return thumb_path
+
+        variant_path = self._get_thumbnail_variant_path(
+            thumb_path, min(candidate_sizes)
+        )
+        if os.path.exists(variant_path):
+            _indicate_resource_accessed(variant_path)
+            return variant_path
+
+        # Generate all variants in one go, to only load the full image once.
+        image = self._load_image(thumb_path)
+        if image is None or image.isNull():
+            return thumb_path
+        source_size = max(image.width(), image.height())
+        for variant_size in self.THUMBNAIL_VARIANT_SIZES:
+            if variant_size >= source_size:
+                # Never upscale, the full thumbnail is used instead.
+                break
+            path = self._get_thumbnail_variant_path(thumb_path, variant_size)
+            if os.path.exists(path):
+                continue
+            self._bundle.ensure_folder_exists(os.path.dirname(path))
+            scaled = self._scale_image(image, variant_size)
+            # Write to a temporary file first so other threads or processes never
+            # see a partially written variant.
+            tmp_path = "%s.%d.tmp" % (path, os.getpid())
+            if scaled.save(tmp_path, "PNG"):
+                os.replace(tmp_path, path)
+
+        if os.path.exists(variant_path):
+            return variant_path
+        return thumb_path
+
+    def _task_get_schema(self, project_id, cached_type_schema=None, entity_types=None):
+        """
+        Method that gets executed in a background task/thread to retrieve the fields
+        and types schema from Shotgun
+
+        :param project_id:  The id of the project to query the schema for or None to
+                            retrieve for all projects
+        :param cached_type_schema: Entity type schema returned by a previous request,
+                                   to only read the fields of changed entity types.
+        :param entity_types: Entity types to read the fields of even if they didn't
+                             change, when cached_type_schema is given.
+        :returns:           Dictionary containing the 'action' together with the schema
+                            fields and types
+        """
+        if project_id is not None:
+            project = {"type": "Project", "id": project_id}
+        else:
+            project = None
+
+        if cached_type_schema is None:
+            # read in details about all fields
+            sg_field_schema = self._call_shotgun("schema_read", project)
+
+            # and read in details about all entity types
+            sg_type_schema = self._call_shotgun("schema_entity_read", project)
+
+            # need to wrap it in a dict not to confuse pyqt's signals and type system
+            return {
+                "action": "schema",
+                "fields": sg_field_schema,
+                "types": sg_type_schema,
+                "partial": False,
+            }
+
+        # the entity type schema is small, use it to find out which entity types
+        # changed and only read their fields.
+        sg_type_schema = self._call_shotgun("schema_entity_read", project)
+        changed_entity_types = set(entity_types or [])
+        for entity_type, type_schema in sg_type_schema.items():
+            if cached_type_schema.get(entity_type) != type_schema:
+                changed_entity_types.add(entity_type)
+
+        sg_field_schema = {}
+        for entity_type in sorted(changed_entity_types):
+            if entity_type not in sg_type_schema:
+                continue
+            sg_field_schema[entity_type] = self._call_shotgun(
+                "schema_field_read", entity_type, project_entity=project
+            )
+        return {
+            "action": "schema",
+            "fields": sg_field_schema,
+            "types": sg_type_schema,
+            "partial": True,
+        }
+
+    def _task_execute_find(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        find query
+
+        :param ``*args``:       Unnamed arguments to be passed to the find() call
+        :param ``**kwargs``:    Named arguments to be passed to the find() call
+        :returns:           Dictionary containing the 'action' together with result
+                            returned by the find() call
+        """
+        sg_res = self._paged_find(*args, **kwargs)
+        return {"action": "find", "sg_result": sg_res}
+
+    def _task_execute_find_pages(self, *args, **kwargs):
+        """
+        Generator that gets executed in a background task/thread to perform a Shotgun
+        find query, one page at a time.
+
+        :param ``*args``:       Unnamed arguments to be passed to the find() call
+        :param ``**kwargs``:    Named arguments to be passed to the find() call
+        :yields:            Dictionary containing the 'action' together with the
+                            records of each page
+        :returns:           Dictionary containing the 'action' together with all the
+                            records returned by the find() call
+        """
+        sg_res = []
+        for records in self._find_pages(*args, **kwargs):
+            sg_res.extend(records)
+            yield {"action": "find", "sg_result": records}
+        return {"action": "find", "sg_result": sg_res}
+
+    def _paged_find(self, *args, **kwargs):
+        """
+        Perform a Shotgun find query from a background task.
+
+        If the task can be cancelled, and no limit or page was requested, the
+        records are retrieved one page at a time so cancelling the task stops the
+        query between two pages.
+
+        :param ``*args``:       Unnamed arguments to be passed to the find() call
+        :param ``**kwargs``:    Named arguments to be passed to the find() call
+        :returns:           The result of the find() call
+        """
+        if task_manager.CancellationToken.current() is None:
+            return self._call_shotgun("find", *args, **kwargs)
+
+        sg_res = []
+        for records in self._find_pages(*args, **kwargs):
+            sg_res.extend(records)
+        return sg_res
+
+    def _find_pages(self, *args, **kwargs):
+        """
+        Perform a Shotgun find query one page at a time, unless a limit or page was
+        requested, in which case the result is retrieved with a single call. The query
+        stops between two pages if the current task is cancelled.
+
+        :param ``*args``:       Unnamed arguments to be passed to the find() call
+        :param ``**kwargs``:    Named arguments to be passed to the find() call
+        :yields:            The records of each page
+        """
+        # limit and page are the 6th and 8th parameters of find().
+        if len(args) > 5:
+            yield self._call_shotgun("find", *args, **kwargs)
+            return
+
+        # a limit or page of 0, the defaults, mean all the records.
+        kwargs = dict(kwargs)
+        limit = kwargs.pop("limit", 0)
+        page = kwargs.pop("page", 0)
+        if limit or page:
+            yield self._call_shotgun("find", *args, limit=limit, page=page, **kwargs)
+            return
+
+        kwargs["limit"] = self._FIND_PAGE_SIZE
+        page = 1
+        while True:
+            records = self._call_shotgun("find", *args, page=page, **kwargs)
+            yield records
+            if len(records) < self._FIND_PAGE_SIZE:
+                return
+            self._raise_if_cancelled()
+            page += 1
+
+    def _task_execute_find_one(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        find_one query
+
+        :param ``*args``:       Unnamed arguments to be passed to the find_one() call
+        :param ``**kwargs``:    Named arguments to be passed to the find_one() call
+        :returns:           Dictionary containing the 'action' together with result
+                            returned by the find_one() call
+        """
+        sg_res = self._call_shotgun("find_one", *args, **kwargs)
+        return {"action": "find_one", "sg_result": sg_res}
+
+    def _task_execute_update(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        update call
+
+        :param ``*args``:       Unnamed arguments to be passed to the update() call
+        :param ``**kwargs``:    Named arguments to be passed to the update() call
+        :returns:           Dictionary containing the 'action' together with result
+                            returned by the update() call
+        """
+        sg_res = self._call_shotgun("update", *args, retry=False, **kwargs)
+        return {"action": "update", "sg_result": sg_res}
+
+    def _task_execute_create(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        create call
+
+        :param ``*args``:       Unnamed arguments to be passed to the create() call
+        :param ``**kwargs``:    Named arguments to be passed to the create() call
+        :returns:           Dictionary containing the 'action' together with result
+                            returned by the create() call
+        """
+        sg_res = self._call_shotgun("create", *args, retry=False, **kwargs)
+        return {"action": "create", "sg_result": sg_res}
+
+    def _task_execute_delete(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        delete call
+
+        :param ``*args``:       Unnamed arguments to be passed to the delete() call
+        :param ``**kwargs``:    Named arguments to be passed to the delete() call
+        :returns:           Dictionary containing the 'action' together with result
+                            returned by the delete() call
+        """
+        sg_res = self._call_shotgun("delete", *args, retry=False, **kwargs)
+        return {"action": "delete", "sg_result": sg_res}
+
+    def _task_execute_method(self, method, method_args, method_kwargs):
+        """
+        Method that gets executed in a background task/thread to execute a method
+        with a thread-specific shotgun connection.
+
+        :param method:          The method to be run asynchronously
+        :param method_args:     Arguments to be passed to the method
+        :param method_kwargs:   Named arguments to be passed to the method
+        :returns:               Dictionary containing the 'action' together with the result
+                                returned by the method
+        """
+        res = method(self._bundle.shotgun, *method_args, **method_kwargs)
+        return {"action": "method", "result": res}
+
+    def _task_execute_text_search(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        ``text_search`` query
+
+        :param ``*args``: Unnamed arguments to be passed to the ``text_search()`` call
+        :param ``**kwargs``: Named arguments to be passed to the ``text_search()`` call
+        :returns: Dictionary containing the 'action' together with result
+            returned by the find() call
+        """
+        sg_res = self._call_shotgun("text_search", *args, **kwargs)
+        return {"action": "text_search", "sg_result": sg_res}
+
+    def _task_execute_nav_expand(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        ``nav_expand`` query
+
+        :param ``*args``: Unnamed arguments to be passed to the ``nav_expand()`` call
+        :param ``**kwargs``: Named arguments to be passed to the ``nav_expand()`` call
+        :returns: Dictionary containing the 'action' together with result
+            returned by the find() call
+        """
+        sg_res = self._call_shotgun("nav_expand", *args, **kwargs)
+        return {"action": "nav_expand", "sg_result": sg_res}
+
+    def _task_execute_nav_search_string(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        ``nav_search_string`` query
+
+        :param ``*args``: Unnamed arguments to be passed to the ``nav_search_string()`` call
+        :param ``**kwargs``: Named arguments to be passed to the ``nav_search_string()`` call
+        :returns: Dictionary containing the 'action' together with result
+            returned by the find() call
+        """
+        try:
+            sg_res = self._bundle.shotgun.nav_search_string(*args, **kwargs)
+        except AttributeError:
+            # running an older core which doesn't come with a
+            # sg API which has a nav_search_string() method
+            sg_res = []
+
+        return {"action": "nav_search_string", "sg_result": sg_res}
+
+    def _task_execute_nav_search_entity(self, *args, **kwargs):
+        """
+        Method that gets executed in a background task/thread to perform a Shotgun
+        ``nav_search_entity`` query
+
+        :param ``*args``: Unnamed arguments to be passed to the ``nav_search_entity()`` call
+        :param ``**kwargs``: Named arguments to be passed to the ``nav_search_entity()`` call
+        :returns: Dictionary containing the 'action' together with result
+            returned by the find() call
+        """
+        # FIXME: Project can't be resolved with the API right now due to a bug on the Shotgun-side.
+        # Mock the call instead.
+        if args[1]["type"] == "Project":
+            project_id = args[1]["id"]
+            sg_data = self._call_shotgun(
+                "find_one", "Project", [["id", "is", project_id]], ["name"]
+            )
+            sg_res = [
+                {
+                    "incremental_path": ["/Project/%d" % project_id],
+                    "label": sg_data["name"],
+                    "path_label": "",
+                    "project_id": project_id,
+                    "ref": sg_data,
+                }
+            ]
+        else:
+            try:
+                sg_res = self._bundle.shotgun.nav_search_entity(*args, **kwargs)
+            except AttributeError:
+                # running an older core which doesn't come with a
+                # sg API which has a nav_search_string() method
+                sg_res = []
+
+        return {"action": "nav_search_entity", "sg_result": sg_res}
+
+    def _task_resolve_thumbnail_sources(self, entity_ids_by_type):
+        """
+        Method that gets executed in a background task/thread to find out which
+        entities have a thumbnail, with one Shotgun query per entity type.
+
+        :param dict entity_ids_by_type: Entity ids to check, keyed by entity type.
+        :returns: Dictionary containing the 'action' together with the set of
+                  ``(entity_type, entity_id)`` tuples for entities with a thumbnail.
+        """
+        has_thumbnail = set()
+        for entity_type, entity_ids in entity_ids_by_type.items():
+            sg_data = self._call_shotgun(
+                "find", entity_type, [["id", "in", entity_ids]], ["image"]
+            )
+            for sg_entity in sg_data:
+                if sg_entity.get("image"):
+                    has_thumbnail.add((entity_type, sg_entity["id"]))
+        return {"action": "resolve_thumbnail_sources", "has_thumbnail": has_thumbnail}
+
+    def _task_check_attachment(self, attachment_entity):
+        """
+        Check to see if an attachment file exists for the specified Attachment
+        entity.
+
+        :param dict attachment_entity: The Attachment entity definition.
+
+        :returns: A dictionary containing the cached path for the specified
+                  Attachment entity.
+        """
+        url = attachment_entity["this_file"]["url"]
+        file_name = attachment_entity["this_file"]["name"]
+
+        data = dict(action="check_attachment", file_path=None)
+
+        if not url or not file_name:
+            return data
+
+        file_path = self._get_attachment_path(attachment_entity, self._bundle)
+
+        if file_path and os.path.exists(file_path):
+            # Update access and modified time to "now" so the file will be kept
+            # around when culling old files in the cache.
+            _indicate_resource_accessed(file_path)
+            data["file_path"] = file_path
+
+        return data
+
+    def _task_check_thumbnail(self, url, load_image, size=None):
+        """
+        Check to see if a thumbnail exists for the specified url.  If it does then it is returned.
+
+        :param url:         The url to return the cached path for
+        :param load_image:  If True then if the thumbnail is found in the cache then the file will
+                            be loaded into a QImage
+        :param size:        Optional display size. If set, the best suited pre-scaled variant
+                            of the thumbnail is returned.
+        :returns:           A dictionary containing the cached path for the specified url and a QImage
+                            if load_image is True and the thumbnail exists in the cache.
+        """
+        # If there's no URL then we definitely won't be finding
+        # a thumbnail.
+        if not url:
+            return {"action": "check_thumbnail", "thumb_path": None, "image": None}
+
+        # first look up the path in the cache:
+        thumb_path, thumb_exists = BaseShotgunDataRetriever._get_thumbnail_path(
+            url, self._bundle
+        )
+        thumb_image = None
+        if thumb_exists:
+            # Update access and modified time to "now" so the file will be kept
+            # around when culling old files in the cache.
+            _indicate_resource_accessed(thumb_path)
+            if size:
+                thumb_path = self._get_thumbnail_variant(thumb_path, size)
+            if load_image:
+                # load the thumbnail into a QImage:
+                thumb_image = self._load_image(thumb_path)
+        else:
+            thumb_path = None
+
+        return {
+            "action": "check_thumbnail",
+            "thumb_path": thumb_path,
+            "image": thumb_image,
+        }
+
+    def _task_download_attachment(self, file_path, attachment_entity, **kwargs):
+        """
+        Download the specified attachment. This downloads the file associated with
+        the provided Attachment entity into the framework's cache directory structure
+        and returns the cached path.
+
+        :param str file_path: The target file path to download to.
+        :param dict attachment_entity: The Attachment entity definition.
+
+        :returns: A dictionary containing the cached path for the specified
+                  Attachment entity, as well as an action identifier that
+                  marks the data as having come from a "download_attachment"
+                  task.
+        """
+        if file_path:
+            return {}
+
+        file_path = self._get_attachment_path(attachment_entity, self._bundle)
+
+        if not file_path:
+            return {}
+
+        self._bundle.ensure_folder_exists(os.path.dirname(file_path))
+
+        # Even if `_task_check_attachment` didn't see the target file, we check
+        # again if it exists as the attachment might have been downloaded in the
+        # mean time. We don't update the modification time on the file to prevent
+        # it to be culled in cache cleanup, as it has been freshly downloaded.
+        if not os.path.exists(file_path):
+            self._raise_if_cancelled()
+            self._call_shotgun(
+                "download_attachment", attachment=attachment_entity, file_path=file_path
+            )
+
+        return dict(action="download_attachment", file_path=file_path)
+
+    def _task_download_attachments(self, attachment_entities):
+        """
+        Generator that gets executed in a background task/thread to download several
+        attachments, one after the other, unless they are already cached.
+
+        :param list attachment_entities: The Attachment entity definitions.
+
+        :yields: Dictionary containing the 'action' together with each Attachment
+                 entity and its cached path, as soon as it is available.
+        :returns: Dictionary containing the 'action' together with the cached paths
+                  for all the Attachment entities, keyed by Attachment id.
+        """
+        file_paths = {}
+        for attachment_entity in attachment_entities:
+            file_path = self._task_check_attachment(attachment_entity)["file_path"]
+            if not file_path:
+                file_path = self._task_download_attachment(None, attachment_entity).get(
+                    "file_path"
+                )
+            file_paths[attachment_entity["id"]] = file_path
+            yield {
+                "action": "download_attachment",
+                "attachment": attachment_entity,
+                "file_path": file_path,
+            }
+        return {"action": "download_attachments", "file_paths": file_paths}
+
+    def _task_download_thumbnail(
+        self,
+        thumb_path,
+        url,
+        entity_type,
+        entity_id,
+        field,
+        load_image,
+        size=None,
+        **kwargs
+    ):
+        """
+        Download the thumbnail for the specified entity type, id and field.  This downloads the
+        thumbnail into the thumbnail cache directory and returns the cached path.
+
+        If thumb_path already contains a path then this method does nothing and just returns the path
+        without further checking/work.
+
+        :param thumb_path:  Path to an existing thumbnail or None.
+        :param url:         The url for the thumbnail which may or may not still be valid!
+        :param entity_type: Type of the entity to retrieve the thumbnail for
+        :param entity_id:   Id of the entity to retrieve the thumbnail for
+        :param field:       The field on the entity that holds the url for the thumbnail to retrieve
+        :param load_image:  If True then if the thumbnail is downloaded from Shotgun then the file will
+                            be loaded into a QImage
+        :param size:        Optional display size. If set, the best suited pre-scaled variant
+                            of the thumbnail is returned.
+        :returns:           A dictionary containing the cached path for the specified url and a QImage
+                            if load_image is True and the thumbnail exists in the cache.
+        """
+        if thumb_path:
+            # no need to do anything as the thumbnail was previously
+            # found when we ran the check!
+            return {}
+
+        # download the actual thumbnail. Because of S3, the url
+        # may have expired - in that case fall back, get a fresh url
+        # from shotgun and try again
+        thumb_path, thumb_exists = self._get_thumbnail_path(url, self._bundle)
+
+        # If we have no path, then there's no thumbnail that exists.
+        if not thumb_path:
+            return {}
+
+        # There may be a case where another process has alrady downloaded the thumbnail for us, so
+        # make sure that we aren't doing any extra work :)
+        # If it is the case, we don't have to update the file modification time
+        # to prevent it to be culled in cache clean up: it has been freshly
+        # downloaded as our `_task_check_thumbnail` task didn't see it.
+        if not thumb_exists:
+            self._bundle.ensure_folder_exists(os.path.dirname(thumb_path))
+
+            # try to download based on the path we have
+            try:
+                thumb_path = self._download_url(
+                    thumb_path, url, entity_type, entity_id, field
+                )
+            except IOError:
+                thumb_path = None
+
+        # finally, see if we should also load in the image
+        thumb_image = None
+        if thumb_path:
+            if size:
+                thumb_path = self._get_thumbnail_variant(thumb_path, size)
+            if load_image:
+                # load the thumbnail into a QImage:
+                thumb_image = self._load_image(thumb_path)
+        else:
+            thumb_path = None
+
+        return dict(
+            action="download_thumbnail", thumb_path=thumb_path, image=thumb_image
+        )
+
+    def _on_task_completed(self, task_id, group, result):
+        """
+        Slot triggered when a task is completed.
+
+        :param task_id: The id of the task that has completed
+        :param group:   The group the task belongs to
+        :param result:  The task result
+        """
+        if group != self._bg_tasks_group:
+            # ignore - it isn't our task! - this slot will recieve signals for tasks started
+            # by other objects/instances so we need to make sure we filter them out here
+            return
+
+        action = result.get("action")
+
+        if task_id in self._query_cache_task_map:
+            cache_key, cache_ttl, silent = self._query_cache_task_map.pop(task_id)
+            if self._query_cache is not None:
+                self._query_cache.put(cache_key, result["sg_result"], cache_ttl)
+            if silent:
+                # background revalidation of a result already served from the cache.
+                return
+
+        if action in [
+            "find",
+            "find_one",
+            "create",
+            "delete",
+            "update",
+            "nav_expand",
+            "nav_search_string",
+            "text_search",
+        ]:
+            self.work_completed.emit(str(task_id), action, {"sg": result["sg_result"]})
+        elif action == "schema":
+            self.work_completed.emit(
+                str(task_id),
+                "schema",
+                {
+                    "fields": result["fields"],
+                    "types": result["types"],
+                    "partial": result["partial"],
+                },
+            )
+        elif action == "method":
+            self.work_completed.emit(
+                str(task_id), "method", {"return_value": result["result"]}
+            )
+        elif action == "check_thumbnail":
+            path = result.get("thumb_path", "")
+            if path:
+                # check found a thumbnail!
+                self.work_completed.emit(
+                    str(task_id),
+                    "check_thumbnail",
+                    {"thumb_path": path, "image": result["image"]},
+                )
+        elif action == "download_thumbnail":
+            # look up the primary thumbnail task id in the map:
+            thumb_task_id = self._thumb_task_id_map.get(task_id)
+            if thumb_task_id is not None:
+                del self._thumb_task_id_map[task_id]
+                self.work_completed.emit(
+                    str(thumb_task_id),
+                    "download_thumbnail",
+                    {"thumb_path": result["thumb_path"], "image": result["image"]},
+                )
+        elif action == "check_attachment":
+            path = result.get("file_path", "")
+            if path:
+                self.work_completed.emit(
+                    str(task_id), "check_attachment", {"file_path": path}
+                )
+        elif action == "download_attachments":
+            self.work_completed.emit(
+                str(task_id),
+                "download_attachments",
+                {"file_paths": result["file_paths"]},
+            )
+        elif action == "download_attachment":
+            attachment_task_id = self._attachment_task_id_map.get(task_id)
+            if attachment_task_id is not None:
+                del self._attachment_task_id_map[task_id]
+                self.work_completed.emit(
+                    str(attachment_task_id),
+                    "download_attachment",
+                    {"file_path": result["file_path"]},
+                )
+
+        # now the result was emitted, move on with the thumbnail batch the task
+        # is part of, if any.
+        if (
+            task_id in self._thumb_batch_task_map
+            or task_id in self._thumb_batch_resolve_map
+        ):
+            self._on_thumbnail_batch_task_done(task_id, result)
+
+    def _on_task_progress(self, task_id, group, partial):
+        """
+        Slot triggered when a task yields a partial result.
+
+        :param task_id: The id of the task reporting the partial result
+        :param group:   The group the task belongs to
+        :param partial: The partial result
+        """
+        if group != self._bg_tasks_group:
+            # ignore - it isn't our task!
+            return
+
+        cache_entry = self._query_cache_task_map.get(task_id)
+        if cache_entry is not None and cache_entry[2]:
+            # background revalidation of a result already served from the cache.
+            return
+
+        action = partial.get("action")
+        if action == "find":
+            self.work_progress.emit(str(task_id), "find", {"sg": partial["sg_result"]})
+        elif action == "download_attachment":
+            self.work_progress.emit(
+                str(task_id),
+                "download_attachments",
+                {
+                    "attachment": partial["attachment"],
+                    "file_path": partial["file_path"],
+                },
+            )
+
+    def _on_work_completed(self, uid, request_type, data):
+        """
+        Slot triggered when a request has completed, to resolve its future if any.
+
+        :param str uid:          The id of the request
+        :param str request_type: The type of request
+        :param dict data:        The payload of the request
+        """
+        self._futures.set_result(uid, data)
+
+    def _on_work_failure(self, uid, msg):
+        """
+        Slot triggered when a request has failed, to resolve its future if any.
+
+        :param str uid: The id of the request
+        :param str msg: The error message
+        """
+        self._futures.set_exception(uid, task_manager.TaskFailedError(msg))
+
+    def _on_task_failed(self, task_id, group, msg, tb):
+        """
+        Slot triggered when a task fails for some reason
+
+        :param task_id: The id of the task that failed
+        :param msg:     The error/exception message for the failed task
+        :param tb:      The stack trace of the exception raised by the failed task
+        """
+        if group != self._bg_tasks_group:
+            # ignore - it isn't our task - this slot will recieve signals for tasks started
+            # by other objects/instances so we need to make sure we filter them out here
+            return
+
+        if task_id in self._query_cache_task_map:
+            _, _, silent = self._query_cache_task_map.pop(task_id)
+            if silent:
+                # the caller already got a result from the query cache.
+                self._bundle.log_debug("Query cache revalidation failed: %s" % msg)
+                return
+
+        if task_id in self._thumb_batch_resolve_map:
+            # no one is waiting for this one, downloads are just attempted for all
+            # entities.
+            self._bundle.log_debug("Could not resolve thumbnail sources: %s" % msg)
+            self._on_thumbnail_batch_task_done(task_id, None)
+            return
+
+        orig_task_id = task_id
+
+        # remap task ids for thumbnails:
+        if task_id in self._thumb_task_id_map:
+            orig_task_id = task_id
+            task_id = self._thumb_task_id_map[task_id]
+            del self._thumb_task_id_map[orig_task_id]
+
+        # remap task ids for attachments:
+        if task_id in self._attachment_task_id_map:
+            orig_task_id = task_id
+            task_id = self._attachment_task_id_map[task_id]
+            del self._attachment_task_id_map[orig_task_id]
+
+        # emit failure signal:
+        self.work_failure.emit(str(task_id), msg)
+
+        if orig_task_id in self._thumb_batch_task_map:
+            self._on_thumbnail_batch_task_done(orig_task_id, None)
@@ -0,0 +1,136 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Data retriever which doesn't depend on Qt, for scripts and farm jobs.
+"""
+
+import time
+
+import sgtk
+
+from .base_data_retriever import BaseShotgunDataRetriever
+
+task_manager = sgtk.platform.current_bundle().import_module("task_manager")
+
+
+class HeadlessShotgunDataRetriever(BaseShotgunDataRetriever):
+    """
+    Data retriever with the same API as :class:`ShotgunDataRetriever`, for processes
+    which don't use Qt, e.g. farm jobs or scripts. It uses a
+    :class:`~task_manager.HeadlessTaskManager` to run requests in background threads.
+
+    Results are handed back to the thread the retriever is used from when
+    :meth:`process_events` or :meth:`wait_for_requests` is called. The
+    ``work_completed`` and ``work_failure`` signals are then emitted, and the futures
+    returned by :meth:`get_future` resolved, from that thread::
+
+        retriever = HeadlessShotgunDataRetriever()
+        retriever.start()
+        asset_request = retriever.execute_find("Asset", [])
+        shot_request = retriever.execute_find("Shot", [])
+        asset_future = retriever.get_future(asset_request)
+        shot_future = retriever.get_future(shot_request)
+        retriever.wait_for_requests([asset_request, shot_request])
+        assets = asset_future.result()["sg"]
+
+    Signals are plain callbacks, see :class:`~task_manager.headless.Signal`. Thumbnails
+    can be requested, but they are never loaded into images and no pre-scaled variants
+    are generated for them.
+    """
+
+    # syntax: work_completed(uid, request_type, data_dict), see ShotgunDataRetriever
+    work_completed = task_manager.headless.Signal()
+
+    # syntax: work_failure(uid, error_message), see ShotgunDataRetriever
+    work_failure = task_manager.headless.Signal()
+
+    # syntax: work_progress(uid, request_type, data_dict), see ShotgunDataRetriever
+    work_progress = task_manager.headless.Signal()
+
+    def __init__(self, parent=None, sg=None, bg_task_manager=None):
+        """
+        :param parent: Ignored, accepted for compatibility with :class:`ShotgunDataRetriever`.
+        :param sg: Optional Shotgun API Instance
+        :param bg_task_manager: Optional Task manager
+        :class bg_task_manager: :class:`~task_manager.HeadlessTaskManager`
+        """
+        BaseShotgunDataRetriever.__init__(self, sg, bg_task_manager)
+
+    def process_events(self, timeout=0):
+        """
+        Handle the results of the requests which were completed since the last call,
+        emitting signals and resolving futures for them.
+
+        :param timeout: Number of seconds to wait for a result if none is available,
+                        or None to wait until one is.
+        :returns: The number of events processed.
+        """
+        if not self._task_manager:
+            return 0
+        return self._task_manager.process_events(timeout)
+
+    def wait_for_requests(self, request_ids, timeout=None):
+        """
+        Process events until the given requests are done. Like :meth:`get_future`,
+        this must be called before events are processed after the requests were made.
+
+        :param request_ids: The unique identifiers returned by the request methods.
+        :param timeout:     Maximum number of seconds to wait, or None to wait until
+                            the requests are done.
+        :returns: True if the requests are done, False if the timeout expired.
+        """
+        futures = [self.get_future(request_id) for request_id in request_ids]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(future.done() for future in futures):
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+            if not self._task_manager:
+                return False
+            self.process_events(remaining)
+        return True
+
+    def _create_task_manager(self):
+        """
+        Create the task manager used when none is given to this retriever.
+
+        :returns: A :class:`~task_manager.HeadlessTaskManager` running a single thread.
+        """
+        return task_manager.HeadlessTaskManager(max_threads=1)
+
+    def _call_later(self, callback):
+        """
+        Call a function the next time events are processed.
+
+        :param callback: Callable to call.
+        """
+        self._task_manager.call_soon(callback)
+
+    def _on_future_cancelled(self, request_id):
+        """
+        Called when the future of a request is cancelled by its user, possibly from
+        another thread. The request is stopped the next time events are processed.
+
+        :param str request_id: The id of the request.
+        """
+        if self._task_manager:
+            self._task_manager.call_soon(self.stop_work, request_id)
+
+    def _load_image(self, path):
+        """
+        Images can't be loaded without Qt.
+
+        :param str path: Path to the image file.
+        :returns: None
+        """
+        return None
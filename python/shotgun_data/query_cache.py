@@ -0,0 +1,192 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Memoization of Shotgun query results for the data retriever.
+"""
+
+import os
+import copy
+import json
+import time
+import hashlib
+from collections import OrderedDict
+
+import sgtk
+
+
+class QueryResultCache(object):
+    """
+    Size bounded cache of Shotgun query results, with a time-to-live
+    per entry.
+
+    Entries are keyed by a canonical signature of the query (see :meth:`make_key`)
+    and are evicted in least recently used order once ``max_entries`` is
+    reached. Expired entries are dropped lazily when they are looked up.
+
+    The cache can optionally be persisted to disk with :meth:`save` and
+    reloaded with :meth:`load`. Expiry times are stored as wall clock
+    timestamps so entries persisted in a previous session keep their
+    original time-to-live.
+
+    This class is not thread-safe and is meant to be used from the thread
+    owning the :class:`ShotgunDataRetriever` it is associated with.
+    """
+
+    # Bump this if the structure of the persisted data changes.
+    FORMAT_VERSION = 1
+
+    def __init__(self, max_entries=256, cache_path=None):
+        """
+        :param int max_entries: Maximum number of results kept in memory.
+        :param str cache_path: Optional path to a file the cache is persisted to.
+        """
+        self._max_entries = max(1, max_entries)
+        self._cache_path = cache_path
+        # key -> (expiry timestamp, result)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """
+        :returns: The number of entries currently held by the cache, including
+                  entries which might have expired but were not looked up yet.
+        """
+        return len(self._entries)
+
+    @property
+    def cache_path(self):
+        """
+        The path to the file this cache is persisted to, or ``None``.
+        """
+        return self._cache_path
+
+    @staticmethod
+    def make_key(action, args, kwargs):
+        """
+        Build a canonical signature for a query.
+
+        Two calls which only differ by the order of their named parameters,
+        or by the order of keys in dictionaries passed as parameters, produce
+        the same key.
+
+        :param str action: The Shotgun method name, e.g. ``"find"``.
+        :param args: Unnamed arguments for the call.
+        :param dict kwargs: Named arguments for the call.
+        :returns: A hash string.
+        """
+        # default=str handles values like datetimes which can't be serialized
+        # to json but have a stable string representation.
+        signature = json.dumps(
+            [action, list(args), kwargs], sort_keys=True, default=str
+        )
+        return hashlib.md5(signature.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Retrieve a result from the cache.
+
+        :param str key: A key generated with :meth:`make_key`.
+        :returns: A tuple ``(found, result)``. ``result`` is a copy of the cached
+                  data so callers can safely modify it.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return (False, None)
+
+        expiry, result = entry
+        if expiry < time.time():
+            del self._entries[key]
+            return (False, None)
+
+        # mark the entry as most recently used
+        self._entries.move_to_end(key)
+        return (True, copy.deepcopy(result))
+
+    def put(self, key, result, ttl):
+        """
+        Add or replace a result in the cache.
+
+        :param str key: A key generated with :meth:`make_key`.
+        :param result: The query result to cache.
+        :param float ttl: Time to live for the entry, in seconds.
+        """
+        self._entries[key] = (time.time() + ttl, copy.deepcopy(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Remove an entry from the cache, or all entries if no key is given.
+
+        :param str key: A key generated with :meth:`make_key` or ``None``.
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def load(self):
+        """
+        Load previously persisted entries from disk, if any. Expired entries
+        are discarded.
+
+        :returns: True if a cache file was loaded, False otherwise.
+        """
+        if not self._cache_path or not os.path.exists(self._cache_path):
+            return False
+
+        bundle = sgtk.platform.current_bundle()
+        try:
+            with open(self._cache_path, "rb") as fh:
+                data = sgtk.util.pickle.load(fh)
+        except Exception as e:
+            bundle.log_warning(
+                "Could not load query cache file '%s': %s" % (self._cache_path, e)
+            )
+            return False
+
+        if data.get("version") != self.FORMAT_VERSION:
+            bundle.log_debug(
+                "Ignoring incompatible query cache '%s'" % self._cache_path
+            )
+            return False
+
+        now = time.time()
+        for key, (expiry, result) in data["entries"]:
+            if expiry >= now:
+                self._entries[key] = (expiry, result)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def save(self):
+        """
+        Persist non expired entries to disk, if a cache path was provided.
+        """
+        if not self._cache_path:
+            return
+
+        bundle = sgtk.platform.current_bundle()
+        now = time.time()
+        data = {
+            "version": self.FORMAT_VERSION,
+            "entries": [
+                (key, entry) for key, entry in self._entries.items() if entry[0] >= now
+            ],
+        }
+        try:
+            bundle.ensure_folder_exists(os.path.dirname(self._cache_path))
+            with open(self._cache_path, "wb") as fh:
+                sgtk.util.pickle.dump(data, fh)
+        except Exception as e:
+            bundle.log_warning(
+                "Could not write query cache file '%s': %s" % (self._cache_path, e)
+            )
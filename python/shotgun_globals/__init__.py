@@ -16,6 +16,8 @@ from .date_time import create_human_readable_timestamp, create_human_readable_da
 
 register_bg_task_manager = _cs.CachedShotgunSchema.register_bg_task_manager
 unregister_bg_task_manager = _cs.CachedShotgunSchema.unregister_bg_task_manager
+preload = _cs.CachedShotgunSchema.preload
+prefetch_statuses = _cs.CachedShotgunSchema.prefetch_statuses
 run_on_schema_loaded = _cs.CachedShotgunSchema.run_on_schema_loaded
 get_entity_fields = _cs.CachedShotgunSchema.get_entity_fields
 get_type_display_name = _cs.CachedShotgunSchema.get_type_display_name
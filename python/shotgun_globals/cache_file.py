@@ -0,0 +1,79 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Helpers to write cache files shared by concurrent processes.
+"""
+
+import os
+import uuid
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Hold an advisory lock on a file, waiting until it can be acquired. The lock
+    is held on a separate ``<path>.lock`` file, so the file itself can be
+    replaced while the lock is held, and only excludes other holders of the
+    lock, from this process or others::
+
+        with file_lock(path):
+            with atomic_write(path) as fh:
+                fh.write(data)
+
+    :param str path: Path to the file to lock.
+    """
+    with open("%s.lock" % path, "a+b") as fh:
+        if fcntl:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            # Locks the first byte of the file. Raises an OSError if it is
+            # still locked after retrying for 10 seconds.
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """
+    Open a temporary file for writing in binary mode, which replaces the file
+    at the given path once it is fully written. Readers of the file never see
+    a partially written file, and keep reading the previous file if they opened
+    it before it was replaced.
+
+    The temporary file is removed if an exception is raised while writing it.
+
+    :param str path: Path to the file to write.
+    """
+    tmp_path = "%s.%s.tmp" % (path, uuid.uuid4().hex)
+    try:
+        with open(tmp_path, "wb") as fh:
+            yield fh
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -11,9 +11,13 @@
 # make sure that py25 has access to with statement
 
 import os
+import time
 import sgtk
 from sgtk.platform.qt import QtCore
 
+from .schema_store import SchemaStore
+from .cache_file import file_lock, atomic_write
+
 
 class CachedShotgunSchema(QtCore.QObject):
     """
@@ -26,10 +30,31 @@ class CachedShotgunSchema(QtCore.QObject):
     - get_empty_phrase          - String to denote 'no value' for item
     - get_status_display_name   - Display name for status code
 
-    This caches the shotgun schema to disk *once* and doesn't check for
-    further updates. If the cache fails to find a value, the technical
-    name rather than the display name is returned, so there is graceful
-    fallback.
+    This caches the shotgun schema to disk *once*. Recent disk caches are used
+    as they are, without any Shotgun call. When the schema is loaded from a
+    disk cache which was not written or checked for more than
+    :attr:`SCHEMA_CHECK_INTERVAL` seconds, it is checked for updates once, the
+    first time an entity type is looked up: the entity type schema and the
+    fields of the looked up entity type are read, and the fields of the entity
+    types which changed are read again and merged into the cache. If the cache
+    fails to find a value, the technical name rather than the display name
+    is returned, so there is graceful fallback.
+
+    The schema cache is indexed by entity type, see :class:`SchemaStore`, so
+    only the fields of the entity types which are looked up are loaded.
+
+    Cached values are loaded from disk the first time they are looked up for a
+    project, unless :meth:`preload` was called for it, in which case they are
+    loaded in a background task and lookups return their fallback values until
+    it completes.
+
+    Statuses are defined for the whole site, so they are fetched with a single
+    query into a site-wide status table, cached in the site cache location, which
+    the statuses of each project are derived from.
+
+    Display names and status colors are memoized in per-project lookup tables
+    once the values they are looked up from are loaded, and the tables are reset
+    when the values are loaded again.
 
     :signal schema_loaded: Fires when the schema has been loaded
     :signal status_loaded: Fires when the status list has been loaded
@@ -37,6 +62,10 @@ class CachedShotgunSchema(QtCore.QObject):
 
     __instance = None
 
+    # Seconds after which a schema cache which was not written or checked is
+    # checked for updates when it is loaded.
+    SCHEMA_CHECK_INTERVAL = 24 * 60 * 60
+
     # Both will be sent along with the project id.
     schema_loaded = QtCore.Signal(int)
     status_loaded = QtCore.Signal(int)
@@ -62,13 +91,30 @@ class CachedShotgunSchema(QtCore.QObject):
         self.__sg_data_retrievers = []
 
         self._status_data = {}
+        # site-wide status table the statuses of each project are derived from.
+        self._site_status_data = None
 
         self._sg_schema_query_ids = {}
+        # request id -> ids of the projects waiting for the statuses.
         self._sg_status_query_ids = {}
-
-        # load cached values from disk
-        self._load_cached_schema()
-        self._load_cached_status()
+        self._sg_schema_check_ids = {}
+        # project id -> the store of an old schema loaded from disk, with the
+        # entity types looked up before it is checked for updates.
+        self._schema_checks = {}
+        # cached values are loaded from disk when first looked up for a project,
+        # or by preload tasks, keyed by their request id.
+        self._preload_query_ids = {}
+
+        # the project of a bundle never changes, resolve it once for lookups.
+        self._current_project_id = self._get_current_project_id()
+
+        # project id -> {lookup key: result}, reset when values are loaded.
+        self._type_display_names = {}
+        self._field_display_names = {}
+        self._status_display_names = {}
+        self._status_colors = {}
+        self.schema_loaded.connect(self._on_schema_loaded)
+        self.status_loaded.connect(self._on_status_loaded)
 
     def _is_schema_loaded(self, project_id=None):
         """
@@ -149,6 +195,20 @@ class CachedShotgunSchema(QtCore.QObject):
         """
         Gets the path to the schema cache file.
 
+        :param project_id:  The project Entity id. If None, the current
+                            context's project will be used, or the "site"
+                            cache location will be returned if the current
+                            context does not have an associated project.
+
+        :returns:           str
+        """
+        return os.path.join(self._get_cache_root_path(project_id), "sg_schema.store")
+
+    def _get_legacy_schema_cache_path(self, project_id=None):
+        """
+        Gets the path to the schema cache file written by previous versions, which
+        held the whole schema in a single pickle.
+
         :param project_id:  The project Entity id. If None, the current
                             context's project will be used, or the "site"
                             cache location will be returned if the current
@@ -158,9 +218,35 @@ class CachedShotgunSchema(QtCore.QObject):
         """
         return os.path.join(self._get_cache_root_path(project_id), "sg_schema.pickle")
 
+    def _get_site_cache_root_path(self):
+        """
+        Gets the parent bundle's site cache location, shared by all projects.
+
+        :returns:           str
+        """
+        # Backwards compatible with versions of tk-core which don't have a site
+        # cache location, in which case the bundle cache location is used.
+        try:
+            return self._bundle.site_cache_location
+        except AttributeError:
+            self._bundle.log_debug(
+                "Bundle.site_cache_location is not available. "
+                "Falling back on Bundle.cache_location instead."
+            )
+            return self._bundle.cache_location
+
+    def _get_site_status_cache_path(self):
+        """
+        Gets the path to the site-wide status cache file.
+
+        :returns:           str
+        """
+        return os.path.join(self._get_site_cache_root_path(), "sg_status.pickle")
+
     def _get_status_cache_path(self, project_id=None):
         """
-        Gets the path to the status cache file.
+        Gets the path to the status cache file of a project written by previous
+        versions, before statuses were cached for the whole site.
 
         :param project_id:  The project Entity id. If None, the current
                             context's project will be used, or the "site"
@@ -171,16 +257,14 @@ class CachedShotgunSchema(QtCore.QObject):
         """
         return os.path.join(self._get_cache_root_path(project_id), "sg_status.pickle")
 
-    def _load_cached_status(self, project_id=None):
+    def _read_cached_status(self):
         """
-        Load cached status from disk if it exists.
+        Read the cached site-wide status table from disk if it exists. Can be
+        called from any thread.
 
-        :param project_id:  The project Entity id. If None, the current
-                            context's project will be used.
-        :returns bool: True if loaded, False if not.
+        :returns: The status data, or None if it could not be read.
         """
-        project_id = project_id or self._get_current_project_id()
-        status_cache_path = self._get_status_cache_path(project_id)
+        status_cache_path = self._get_site_status_cache_path()
 
         if os.path.exists(status_cache_path):
             try:
@@ -189,32 +273,29 @@ class CachedShotgunSchema(QtCore.QObject):
                 )
                 with open(status_cache_path, "rb") as fh:
                     status_data = sgtk.util.pickle.load(fh)
-                    # Check to make sure the structure of the data
-                    # is what we expect. If it isn't then we don't
-                    # accept the data which will force it to be
-                    # recached.
-                    if "statuses" in status_data and "status_order" in status_data:
-                        self._status_data[project_id] = status_data
             except Exception as e:
                 self._bundle.log_warning(
                     "Could not open cached status "
                     "file '%s': %s" % (status_cache_path, e)
                 )
             else:
-                self.status_loaded.emit(project_id)
-                return True
+                # Check to make sure the structure of the data
+                # is what we expect. If it isn't then we don't
+                # accept the data which will force it to be
+                # recached.
+                if "statuses" in status_data and "status_order" in status_data:
+                    return status_data
 
-        return False
+        return None
 
-    def _load_cached_schema(self, project_id=None):
+    def _read_cached_schema(self, project_id):
         """
-        Load cached metaschema from disk if it exists.
+        Read the index of the cached metaschema from disk if it exists. Can be
+        called from any thread.
 
-        :param project_id:  The project Entity id. If None, the current
-                            context's project will be used.
-        :returns bool: True if loaded, False if not.
+        :param project_id:  The project Entity id.
+        :returns: A :class:`SchemaStore`, or None if the cache could not be read.
         """
-        project_id = project_id or self._get_current_project_id()
         schema_cache_path = self._get_schema_cache_path(project_id)
 
         if os.path.exists(schema_cache_path):
@@ -222,20 +303,97 @@ class CachedShotgunSchema(QtCore.QObject):
                 self._bundle.log_debug(
                     "Loading cached schema from '%s'" % schema_cache_path
                 )
-                with open(schema_cache_path, "rb") as fh:
-                    data = sgtk.util.pickle.load(fh)
-                    self._field_schema[project_id] = data["field_schema"]
-                    self._type_schema[project_id] = data["type_schema"]
+                return SchemaStore(schema_cache_path)
             except Exception as e:
                 self._bundle.log_warning(
                     "Could not open cached schema "
                     "file '%s': %s" % (schema_cache_path, e)
                 )
-            else:
-                self.schema_loaded.emit(project_id)
-                return True
 
-        return False
+        return None
+
+    def _load_cached_status(self, project_id=None):
+        """
+        Load the statuses of a project from the site-wide status table, which is
+        loaded from disk if it exists and was not loaded yet.
+
+        :param project_id:  The project Entity id. If None, the current
+                            context's project will be used.
+        :returns bool: True if loaded, False if not.
+        """
+        project_id = project_id or self._get_current_project_id()
+        if self._site_status_data is None:
+            self._site_status_data = self._read_cached_status()
+            if self._site_status_data is None:
+                return False
+
+        self._set_project_statuses(project_id)
+        return True
+
+    def _set_project_statuses(self, project_id):
+        """
+        Derive the statuses of a project from the site-wide status table.
+
+        :param project_id:  The project Entity id.
+        """
+        self._status_data[project_id] = self._site_status_data
+        self.status_loaded.emit(project_id)
+
+    def _load_cached_schema(self, project_id=None):
+        """
+        Load cached metaschema from disk if it exists. Only the index of the cache
+        is loaded, the fields of each entity type are loaded when first looked up.
+
+        :param project_id:  The project Entity id. If None, the current
+                            context's project will be used.
+        :returns bool: True if loaded, False if not.
+        """
+        project_id = project_id or self._get_current_project_id()
+        store = self._read_cached_schema(project_id)
+        if store is None:
+            return False
+
+        self._set_schema_store(project_id, store)
+        return True
+
+    def _set_schema_store(self, project_id, store):
+        """
+        Use a schema loaded from the disk cache for a project.
+
+        :param project_id: The project Entity id.
+        :param store: The :class:`SchemaStore` the schema was loaded from.
+        """
+        self._field_schema[project_id] = store.field_schema
+        self._type_schema[project_id] = store.type_schema
+        if time.time() - store.modified_time > self.SCHEMA_CHECK_INTERVAL:
+            self._schema_checks[project_id] = {"store": store, "pending": set()}
+        else:
+            # the cache is recent, don't check it for updates.
+            self._schema_checks.pop(project_id, None)
+        # the lookup tables are reset when the store loads a newer cache file.
+        store.add_reload_callback(lambda: self.schema_loaded.emit(project_id))
+        self.schema_loaded.emit(project_id)
+
+    def _task_read_caches(self, sg, project_id):
+        """
+        Read the cached metaschema and status of a project from disk, run by
+        :meth:`preload` in a background task.
+
+        :param sg: Shotgun API instance, unused.
+        :param project_id: The project Entity id.
+        :returns: A tuple with the :class:`SchemaStore` and the status data, each
+                  of them None if it could not be read.
+        """
+        return (self._read_cached_schema(project_id), self._read_cached_status())
+
+    def _is_preloading(self, project_id):
+        """
+        Whether cached values are being loaded for a project by :meth:`preload`.
+
+        :param project_id: The project Entity id.
+        :returns: bool
+        """
+        return project_id in self._preload_query_ids.values()
 
     def _check_schema_refresh(self, entity_type=None, field_name=None, project_id=None):
         """
@@ -246,26 +404,26 @@ class CachedShotgunSchema(QtCore.QObject):
         :param int project_id: The project Entity id. If None, the current
                                context's project will be used.
         """
-        current_project_id = self._get_current_project_id()
-        project_id = project_id or current_project_id
+        project_id = project_id or self._get_current_project_id()
+
+        if entity_type and project_id in self._schema_checks:
+            # an old schema was loaded from disk, check it is up to date.
+            self._check_cached_schema(entity_type, project_id)
 
-        # TODO: currently, this only checks if there is a full cache in memory
-        # or not. Later on, when we have the ability to check the current
-        # metaschema generation via the shotgun API, this can be handled in a
-        # more graceful fashion.
         if (
             not self._is_schema_loaded(project_id)
             and project_id not in self._sg_schema_query_ids.values()
+            and not self._is_preloading(project_id)
         ):
             # schema is not requested and not loaded.
-            # If a schema was requested for a project that isn't the current project,
-            # then let's check to see if we can get it from disk before we resort to
+            # Let's check to see if we can get it from disk before we resort to
             # going to Shotgun.
-            if project_id != current_project_id:
-                if self._load_cached_schema(project_id=project_id):
-                    # If we were able to load the cached schema from disk then we don't
-                    # have anything else to do.
-                    return
+            if self._load_cached_schema(project_id=project_id):
+                # If we were able to load the cached schema from disk then we
+                # only have to check it is up to date, if it is old.
+                if entity_type and project_id in self._schema_checks:
+                    self._check_cached_schema(entity_type, project_id)
+                return
 
             # so download it from shotgun!
             self._bundle.log_debug(
@@ -283,6 +441,88 @@ class CachedShotgunSchema(QtCore.QObject):
                     "Cannot load shotgun schema."
                 )
 
+    def _check_cached_schema(self, entity_type, project_id):
+        """
+        Check the schema loaded from the disk cache is up to date, the first
+        time an entity type is looked up. The schema is only checked once, entity
+        types looked up while the check is running are not checked.
+
+        :param str entity_type: Shotgun entity type
+        :param int project_id: The project Entity id.
+        """
+        if project_id in self._sg_schema_check_ids.values():
+            return
+        self._schema_checks[project_id]["pending"].add(entity_type)
+        self._request_schema_check(project_id)
+
+    def _request_schema_check(self, project_id):
+        """
+        Request the entity type schema of a project and the fields of the entity
+        types looked up before the check was requested, to merge what changed
+        into the disk cache.
+
+        :param int project_id: The project Entity id.
+        """
+        if not self.__sg_data_retrievers:
+            return
+
+        schema_check = self._schema_checks[project_id]
+        entity_types = sorted(schema_check["pending"])
+        schema_check["pending"].clear()
+        self._bundle.log_debug(
+            "Checking the cached schema of %s for updates..." % ", ".join(entity_types)
+        )
+        data_retriever = self.__sg_data_retrievers[0]["data_retriever"]
+        request_id = data_retriever.get_schema(
+            project_id,
+            cached_type_schema=dict(schema_check["store"].type_schema),
+            entity_types=entity_types,
+        )
+        self._sg_schema_check_ids[request_id] = project_id
+
+    def _update_cached_schema(self, project_id, field_schema, type_schema):
+        """
+        Merge the entity type schema and the fields of some entity types read
+        from Shotgun into the disk cache of a project, if they changed.
+
+        :param int project_id: The project Entity id.
+        :param dict field_schema: Fields of the entity types which were read.
+        :param dict type_schema: The entity type schema.
+        """
+        store = self._schema_checks[project_id]["store"]
+        changed_fields = {}
+        for entity_type, fields in field_schema.items():
+            if (
+                entity_type not in store.field_schema
+                or store.field_schema[entity_type] != fields
+            ):
+                changed_fields[entity_type] = fields
+
+        if not changed_fields and type_schema == store.type_schema:
+            self._bundle.log_debug("Cached schema is up to date.")
+            # the cache is not checked again until it gets old.
+            try:
+                store.touch()
+            except OSError as e:
+                self._bundle.log_warning(
+                    "Could not update schema "
+                    "file '%s': %s" % (self._get_schema_cache_path(project_id), e)
+                )
+            return
+
+        self._bundle.log_debug(
+            "Updating the cached schema of %s..." % ", ".join(sorted(changed_fields))
+        )
+        try:
+            store.update(changed_fields, type_schema)
+        except Exception as e:
+            self._bundle.log_warning(
+                "Could not update schema "
+                "file '%s': %s" % (self._get_schema_cache_path(project_id), e)
+            )
+        else:
+            self.schema_loaded.emit(project_id)
+
     def _check_status_refresh(self, project_id=None):
         """
         Request status data from Shotgun.
@@ -290,38 +530,83 @@ class CachedShotgunSchema(QtCore.QObject):
         :param int project_id: The project Entity id. If None, the current
                                context's project will be used.
         """
-        current_project_id = self._get_current_project_id()
-        project_id = project_id or current_project_id
+        project_id = project_id or self._get_current_project_id()
 
         if (
             not self._is_status_loaded(project_id)
-            and project_id not in self._sg_status_query_ids.values()
+            and not self._is_status_requested(project_id)
+            and not self._is_preloading(project_id)
         ):
-            # If statuses were requested for a project that isn't the current project,
-            # then  let's check to see if we can get it from disk before we resort
+            # Let's check to see if we can get statuses from disk before we resort
             # to going to Shotgun.
-            if project_id != current_project_id:
-                if self._load_cached_status(project_id=project_id):
-                    # If we were able to load the cached schema from disk then we don't
-                    # have anything else to do.
-                    return
+            if self._load_cached_status(project_id=project_id):
+                # If we were able to load the cached statuses from disk then we don't
+                # have anything else to do.
+                return
 
-            fields = ["bg_color", "code", "name"]
-            self._bundle.log_debug(
-                "Starting to download status list from Flow Production Tracking..."
+            self._request_statuses([project_id])
+
+    def _is_status_requested(self, project_id):
+        """
+        Whether the statuses of a project are being downloaded.
+
+        :param project_id: The project Entity id.
+        :returns: bool
+        """
+        return any(
+            project_id in project_ids
+            for project_ids in self._sg_status_query_ids.values()
+        )
+
+    def _request_statuses(self, project_ids):
+        """
+        Download the site-wide status table for the given projects, with a
+        single query for all of them.
+
+        :param list project_ids: The project Entity ids.
+        """
+        if self._sg_status_query_ids:
+            # the status table is already being downloaded.
+            project_ids_waiting = next(iter(self._sg_status_query_ids.values()))
+            project_ids_waiting.update(project_ids)
+            return
+
+        fields = ["bg_color", "code", "name"]
+        self._bundle.log_debug(
+            "Starting to download status list from Flow Production Tracking..."
+        )
+
+        if self.__sg_data_retrievers:
+            # pick the first one
+            data_retriever = self.__sg_data_retrievers[0]["data_retriever"]
+            self._sg_status_query_ids[
+                data_retriever.execute_find("Status", [], fields)
+            ] = set(project_ids)
+        else:
+            self._bundle.log_warning(
+                "No data retrievers registered with this schema manager. "
+                "Cannot load Flow Production Tracking statuses."
             )
 
-            if self.__sg_data_retrievers:
-                # pick the first one
-                data_retriever = self.__sg_data_retrievers[0]["data_retriever"]
-                self._sg_status_query_ids[
-                    data_retriever.execute_find("Status", [], fields)
-                ] = project_id
-            else:
-                self._bundle.log_warning(
-                    "No data retrievers registered with this schema manager. "
-                    "Cannot load Flow Production Tracking statuses."
-                )
+    def _on_schema_loaded(self, project_id):
+        """
+        Reset the lookup tables of a project when its schema is loaded.
+
+        :param project_id: The project Entity id.
+        """
+        project_id = project_id or self._current_project_id
+        self._type_display_names.pop(project_id, None)
+        self._field_display_names.pop(project_id, None)
+
+    def _on_status_loaded(self, project_id):
+        """
+        Reset the status lookup tables of a project when its statuses are loaded.
+
+        :param project_id: The project Entity id.
+        """
+        project_id = project_id or self._current_project_id
+        self._status_display_names.pop(project_id, None)
+        self._status_colors.pop(project_id, None)
 
     def _on_worker_failure(self, uid, msg):
         """
@@ -338,6 +623,17 @@ class CachedShotgunSchema(QtCore.QObject):
             msg = shotgun_model.sanitize_qt(msg)  # qstring on pyqt, str on pyside
             self._bundle.log_warning("Could not load sg status: %s" % msg)
             del self._sg_status_query_ids[uid]
+        elif uid in self._sg_schema_check_ids:
+            msg = shotgun_model.sanitize_qt(msg)  # qstring on pyqt, str on pyside
+            self._bundle.log_warning("Could not check sg schema for updates: %s" % msg)
+            del self._sg_schema_check_ids[uid]
+        elif uid in self._preload_query_ids:
+            msg = shotgun_model.sanitize_qt(msg)  # qstring on pyqt, str on pyside
+            self._bundle.log_warning("Could not preload cached values: %s" % msg)
+            project_id = self._preload_query_ids.pop(uid)
+            # fall back on loading them when they are looked up.
+            self._check_schema_refresh(project_id=project_id)
+            self._check_status_refresh(project_id=project_id)
 
     def _on_worker_signal(self, uid, request_type, data):
         """
@@ -360,6 +656,7 @@ class CachedShotgunSchema(QtCore.QObject):
             # store the schema in memory
             self._field_schema[project_id] = data["fields"]
             self._type_schema[project_id] = data["types"]
+            self._schema_checks.pop(project_id, None)
 
             # job done!
             del self._sg_schema_query_ids[uid]
@@ -370,13 +667,16 @@ class CachedShotgunSchema(QtCore.QObject):
                 "Saving schema to '%s'..." % self._get_schema_cache_path(project_id)
             )
             try:
-                with open(self._get_schema_cache_path(project_id), "wb") as fh:
-                    data = dict(
-                        field_schema=self._field_schema[project_id],
-                        type_schema=self._type_schema[project_id],
-                    )
-                    sgtk.util.pickle.dump(data, fh)
-                    self._bundle.log_debug("...done")
+                SchemaStore.write(
+                    self._get_schema_cache_path(project_id),
+                    self._field_schema[project_id],
+                    self._type_schema[project_id],
+                )
+                self._bundle.log_debug("...done")
+                # the cache from previous versions is not needed anymore.
+                legacy_cache_path = self._get_legacy_schema_cache_path(project_id)
+                if os.path.isfile(legacy_cache_path):
+                    os.remove(legacy_cache_path)
             except Exception as e:
                 self._bundle.log_warning(
                     "Could not write schema "
@@ -387,33 +687,61 @@ class CachedShotgunSchema(QtCore.QObject):
             self._bundle.log_debug(
                 "Status list arrived from Flow Production Tracking..."
             )
-            project_id = self._sg_status_query_ids[uid]
+            project_ids = self._sg_status_query_ids.pop(uid)
 
             # store status in memory
-            self._status_data[project_id] = dict(status_order=[], statuses={})
+            self._site_status_data = dict(status_order=[], statuses={})
             for x in data["sg"]:
-                self._status_data[project_id]["statuses"][x["code"]] = x
-                self._status_data[project_id]["status_order"].append(x["code"])
+                self._site_status_data["statuses"][x["code"]] = x
+                self._site_status_data["status_order"].append(x["code"])
 
-            # job done!
-            del self._sg_status_query_ids[uid]
-            self.status_loaded.emit(project_id)
+            # job done! Projects which were using a previous table are updated too.
+            for project_id in project_ids.union(self._status_data):
+                self._set_project_statuses(project_id)
 
             # and write out the data to disk
-            self._bundle.log_debug(
-                "Saving status to '%s'..." % self._get_status_cache_path(project_id)
-            )
+            status_cache_path = self._get_site_status_cache_path()
+            self._bundle.log_debug("Saving status to '%s'..." % status_cache_path)
             try:
-                with open(self._get_status_cache_path(project_id), "wb") as fh:
-                    sgtk.util.pickle.dump(self._status_data[project_id], fh)
-                    self._bundle.log_debug("...done")
+                # other processes may be writing or reading the same file.
+                with file_lock(status_cache_path):
+                    with atomic_write(status_cache_path) as fh:
+                        sgtk.util.pickle.dump(self._site_status_data, fh)
+                self._bundle.log_debug("...done")
             except Exception as e:
                 raise
                 self._bundle.log_warning(
-                    "Could not write status "
-                    "file '%s': %s" % (self._get_status_cache_path(project_id), e)
+                    "Could not write status " "file '%s': %s" % (status_cache_path, e)
                 )
 
+        elif uid in self._sg_schema_check_ids:
+            project_id = self._sg_schema_check_ids.pop(uid)
+            if project_id not in self._schema_checks:
+                # the schema was downloaded again in the meantime.
+                return
+            self._update_cached_schema(project_id, data["fields"], data["types"])
+            # the cache was just written or checked, it's not checked again.
+            del self._schema_checks[project_id]
+
+        elif uid in self._preload_query_ids:
+            project_id = self._preload_query_ids.pop(uid)
+            store, status_data = data["return_value"]
+            self._bundle.log_debug(
+                "Cached values preloaded for project %s" % project_id
+            )
+
+            # values may have been fetched from Shotgun in the meantime, keep them.
+            if store is not None and not self._is_schema_loaded(project_id):
+                self._set_schema_store(project_id, store)
+            if status_data is not None and not self._is_status_loaded(project_id):
+                if self._site_status_data is None:
+                    self._site_status_data = status_data
+                self._set_project_statuses(project_id)
+
+            # download what could not be loaded from disk.
+            self._check_schema_refresh(project_id=project_id)
+            self._check_status_refresh(project_id=project_id)
+
     ##########################################################################################
     # public methods
 
@@ -484,6 +812,88 @@ class CachedShotgunSchema(QtCore.QObject):
 
         self.__sg_data_retrievers = culled_retrievers
 
+    @classmethod
+    def preload(cls, project_ids=None):
+        """
+        Load the cached schema and statuses of projects in a background task,
+        downloading them from Shotgun if they are not cached, so they are ready
+        when first looked up. Lookups made for a project before its values are
+        loaded don't wait for them and return fallback values, e.g. the system
+        name of an entity type rather than its display name.
+
+        The ``schema_loaded`` and ``status_loaded`` signals are emitted for each
+        project once its values are loaded, :meth:`run_on_schema_loaded` can be
+        used to wait for them.
+
+        A background task manager must have been registered first, see
+        :meth:`register_bg_task_manager`.
+
+        :param project_ids: List of ids of the project entities to load values for.
+                            If None, the current context's project will be used.
+        """
+        self = cls.__get_instance()
+
+        if not self.__sg_data_retrievers:
+            self._bundle.log_warning(
+                "No data retrievers registered with this schema manager. "
+                "Cannot preload the schema and statuses."
+            )
+            return
+
+        if project_ids is None:
+            project_ids = [self._get_current_project_id()]
+
+        data_retriever = self.__sg_data_retrievers[0]["data_retriever"]
+        for project_id in project_ids:
+            project_id = project_id or self._get_current_project_id()
+            schema_pending = (
+                self._is_schema_loaded(project_id)
+                or project_id in self._sg_schema_query_ids.values()
+            )
+            status_pending = self._is_status_loaded(
+                project_id
+            ) or self._is_status_requested(project_id)
+            if (schema_pending and status_pending) or self._is_preloading(project_id):
+                continue
+            self._bundle.log_debug(
+                "Preloading cached values for project %s" % project_id
+            )
+            request_id = data_retriever.execute_method(
+                self._task_read_caches, project_id
+            )
+            self._preload_query_ids[request_id] = project_id
+
+    @classmethod
+    def prefetch_statuses(cls, project_ids):
+        """
+        Load the statuses of several projects at once, e.g. for tools which
+        display entities from several projects. Statuses are defined for the
+        whole site, so they are downloaded with a single query for all the
+        projects if they are not cached.
+
+        The ``status_loaded`` signal is emitted for each project once its
+        statuses are loaded.
+
+        :param project_ids: List of ids of the project entities to load statuses
+                            for. None can be used for the current context's project.
+        """
+        self = cls.__get_instance()
+
+        missing_project_ids = []
+        for project_id in project_ids:
+            project_id = project_id or self._get_current_project_id()
+            if (
+                self._is_status_loaded(project_id)
+                or self._is_status_requested(project_id)
+                or project_id in missing_project_ids
+            ):
+                continue
+            if not self._load_cached_status(project_id):
+                missing_project_ids.append(project_id)
+
+        if missing_project_ids:
+            self._request_statuses(missing_project_ids)
+
     @classmethod
     def run_on_schema_loaded(cls, callback, project_id=None):
         """
@@ -567,7 +977,28 @@ class CachedShotgunSchema(QtCore.QObject):
         :returns: Entity type display name
         """
         self = cls.__get_instance()
-        project_id = project_id or self._get_current_project_id()
+        project_id = project_id or self._current_project_id
+        try:
+            return self._type_display_names[project_id][sg_entity_type]
+        except KeyError:
+            pass
+
+        display_name = self._lookup_type_display_name(sg_entity_type, project_id)
+        if self._is_schema_loaded(project_id):
+            self._type_display_names.setdefault(project_id, {})[
+                sg_entity_type
+            ] = display_name
+        return display_name
+
+    def _lookup_type_display_name(self, sg_entity_type, project_id):
+        """
+        Look up the display name for a Shotgun entity type in the schema,
+        see :meth:`get_type_display_name`.
+
+        :param sg_entity_type:  Shotgun entity type
+        :param project_id:      The id of the project entity to get a name from.
+        :returns: Entity type display name
+        """
         self._check_schema_refresh(sg_entity_type, project_id=project_id)
 
         if (
@@ -600,10 +1031,32 @@ class CachedShotgunSchema(QtCore.QObject):
 
         :returns: Field display name
         """
-
         self = cls.__get_instance()
-        project_id = project_id or self._get_current_project_id()
+        project_id = project_id or self._current_project_id
+        try:
+            return self._field_display_names[project_id][(sg_entity_type, field_name)]
+        except KeyError:
+            pass
+
+        display_name = self._lookup_field_display_name(
+            sg_entity_type, field_name, project_id
+        )
+        if self._is_schema_loaded(project_id):
+            self._field_display_names.setdefault(project_id, {})[
+                (sg_entity_type, field_name)
+            ] = display_name
+        return display_name
 
+    def _lookup_field_display_name(self, sg_entity_type, field_name, project_id):
+        """
+        Look up the display name for a Shotgun field in the schema, see
+        :meth:`get_field_display_name`.
+
+        :param sg_entity_type:  Shotgun entity type
+        :param field_name:      Shotgun field name
+        :param project_id:      The id of the project entity to get a name from.
+        :returns: Field display name
+        """
         sg_entity_type, field_name = _account_for_bubble_fields(
             sg_entity_type, field_name
         )
@@ -805,7 +1258,28 @@ class CachedShotgunSchema(QtCore.QObject):
         :returns: string with descriptive status name
         """
         self = cls.__get_instance()
-        project_id = project_id or self._get_current_project_id()
+        project_id = project_id or self._current_project_id
+        try:
+            return self._status_display_names[project_id][status_code]
+        except KeyError:
+            pass
+
+        display_name = self._lookup_status_display_name(status_code, project_id)
+        if self._is_status_loaded(project_id):
+            self._status_display_names.setdefault(project_id, {})[
+                status_code
+            ] = display_name
+        return display_name
+
+    def _lookup_status_display_name(self, status_code, project_id):
+        """
+        Look up the display name for a status code, see
+        :meth:`get_status_display_name`.
+
+        :param status_code: Status short code (e.g 'ip')
+        :param project_id:  The id of the project entity to get a name from.
+        :returns: string with descriptive status name
+        """
         self._check_status_refresh(project_id=project_id)
 
         display_name = status_code
@@ -837,7 +1311,25 @@ class CachedShotgunSchema(QtCore.QObject):
         :returns: string with r,g,b values, e.g. ``"123,255,10"``
         """
         self = cls.__get_instance()
-        project_id = project_id or self._get_current_project_id()
+        project_id = project_id or self._current_project_id
+        try:
+            return self._status_colors[project_id][status_code]
+        except KeyError:
+            pass
+
+        status_color = self._lookup_status_color(status_code, project_id)
+        if self._is_status_loaded(project_id):
+            self._status_colors.setdefault(project_id, {})[status_code] = status_color
+        return status_color
+
+    def _lookup_status_color(self, status_code, project_id):
+        """
+        Look up the color for a status code, see :meth:`get_status_color`.
+
+        :param status_code: Status short code (e.g 'ip')
+        :param project_id:  The id of the project entity to get a color from.
+        :returns: string with r,g,b values, e.g. ``"123,255,10"``
+        """
         self._check_status_refresh(project_id=project_id)
 
         status_color = None
@@ -996,7 +1488,8 @@ class CachedShotgunSchema(QtCore.QObject):
         """
         Remove both the schema and status cache files from disk for
         the specified project_id. If no project_id is specified, then
-        use the current context project.
+        use the current context project. Statuses are cached for the
+        whole site, so the status cache of all projects is removed.
 
         :param project_id: The id of the project entity to remove
                            schema and status cache files for. If
@@ -1006,29 +1499,35 @@ class CachedShotgunSchema(QtCore.QObject):
         self = cls.__get_instance()
         project_id = project_id or self._get_current_project_id()
 
-        schema_cache = self._get_schema_cache_path(project_id)
-        if os.path.isfile(schema_cache):
-            self._bundle.log_debug("Removing schema cache file : %s" % schema_cache)
-            try:
-                os.remove(schema_cache)
-            except Exception as e:
-                self._bundle.log_error(
-                    "Caught error attempting to remove schema cache file [%s] :\n%s"
-                    % (schema_cache, e)
-                )
-                raise
-
-        status_cache = self._get_status_cache_path(project_id)
-        if os.path.isfile(status_cache):
-            self._bundle.log_debug("Removing status cache file : %s" % status_cache)
-            try:
-                os.remove(status_cache)
-            except Exception as e:
-                self._bundle.log_error(
-                    "Caught error attempting to remove status cache file [%s] :\n%s"
-                    % (status_cache, e)
-                )
-                raise
+        for schema_cache in [
+            self._get_schema_cache_path(project_id),
+            self._get_legacy_schema_cache_path(project_id),
+        ]:
+            if os.path.isfile(schema_cache):
+                self._bundle.log_debug("Removing schema cache file : %s" % schema_cache)
+                try:
+                    os.remove(schema_cache)
+                except Exception as e:
+                    self._bundle.log_error(
+                        "Caught error attempting to remove schema cache file [%s] :\n%s"
+                        % (schema_cache, e)
+                    )
+                    raise
+
+        for status_cache in [
+            self._get_site_status_cache_path(),
+            self._get_status_cache_path(project_id),
+        ]:
+            if os.path.isfile(status_cache):
+                self._bundle.log_debug("Removing status cache file : %s" % status_cache)
+                try:
+                    os.remove(status_cache)
+                except Exception as e:
+                    self._bundle.log_error(
+                        "Caught error attempting to remove status cache file [%s] :\n%s"
+                        % (status_cache, e)
+                    )
+                    raise
 
 
 def _account_for_bubble_fields(sg_entity_type, field_name):
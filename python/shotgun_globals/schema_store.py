@@ -0,0 +1,369 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+On-disk schema cache indexed by entity type.
+"""
+
+import os
+import sys
+import mmap
+import uuid
+import struct
+from collections.abc import Mapping
+
+import sgtk
+
+from .cache_file import file_lock, atomic_write
+
+# Windows doesn't allow replacing or removing a file while it is mapped, so the
+# file is read in memory instead.
+_SHARED_MAPPING = sys.platform != "win32"
+
+
+class SchemaStore(object):
+    """
+    Schema cache file from which the fields of each entity type are decoded on
+    demand, so the cost of loading the schema is proportional to the entity types
+    which are actually looked up rather than to the size of the site schema.
+
+    The file starts with a small index holding the entity type schema and the
+    location of the fields of each entity type, which are pickled separately::
+
+        SchemaStore.write(path, field_schema, type_schema)
+        store = SchemaStore(path)
+        shot_fields = store.field_schema["Shot"]
+
+    The cache file is mapped in memory, so the processes using the same cache
+    share a single copy of it. It is written atomically, so it can be replaced
+    while it is in use, in which case the new file is loaded the next time fields
+    are decoded, and the callbacks added with :meth:`add_reload_callback` are
+    called.
+    """
+
+    # magic, token identifying a write of the file, index size
+    _HEADER = struct.Struct(">8s16sQ")
+    _MAGIC = b"SGSCHEMA"
+
+    def __init__(self, path):
+        """
+        Load the index of a schema cache file.
+
+        :param str path: Path to the cache file, written with :meth:`write`.
+        :raises: ``ValueError`` if the file is not a schema cache file.
+        """
+        self._bundle = sgtk.platform.current_bundle()
+        self._path = path
+        self._type_schema = {}
+        # entity type -> decoded fields
+        self._decoded_fields = {}
+        self._buffer = None
+        self._token = None
+        self._reload_callbacks = []
+        self._load()
+        self._field_schema = _LazyFieldSchema(self)
+
+    @classmethod
+    def write(cls, path, field_schema, type_schema):
+        """
+        Write a schema cache file, atomically and under a lock so it can be
+        written by concurrent processes.
+
+        :param str path: Path to the cache file.
+        :param dict field_schema: Fields for each entity type, as returned by
+                                  ``schema_read``.
+        :param dict type_schema: Entity type schema, as returned by
+                                 ``schema_entity_read``.
+        """
+        blobs = [
+            (entity_type, _dumps(fields))
+            for entity_type, fields in field_schema.items()
+        ]
+        with file_lock(path):
+            cls._write_blobs(path, blobs, type_schema)
+
+    def update(self, field_schema, type_schema):
+        """
+        Write the cache file again with a new entity type schema, replacing the
+        fields of the given entity types. The fields of the other entity types
+        in the new entity type schema are copied as they are, without decoding
+        them, and entity types which are not in it are removed.
+
+        :param dict field_schema: Fields of the entity types to replace.
+        :param dict type_schema: The new entity type schema.
+        """
+        with file_lock(self._path):
+            # merge with the latest version of the file. Users are told about the
+            # update by the caller, so reload callbacks are not called.
+            self._reload_if_changed(notify=False)
+            blobs = []
+            for entity_type in type_schema:
+                if entity_type in field_schema:
+                    blob = _dumps(field_schema[entity_type])
+                elif entity_type in self._offsets:
+                    blob = self._read_blob(entity_type)
+                else:
+                    continue
+                blobs.append((entity_type, blob))
+            self._write_blobs(self._path, blobs, type_schema)
+            self._load()
+
+        for entity_type in list(self._decoded_fields):
+            if entity_type in field_schema or entity_type not in self._offsets:
+                del self._decoded_fields[entity_type]
+
+    def touch(self):
+        """
+        Update the modification time of the cache file, e.g. to record it was
+        found to be up to date, without writing it again.
+
+        :raises: ``OSError`` if the file could not be updated.
+        """
+        with file_lock(self._path):
+            os.utime(self._path)
+
+    def add_reload_callback(self, callback):
+        """
+        Add a callback called without arguments when the store loads a new
+        version of the cache file written by someone else, e.g. another process.
+        It can be called from any thread decoding fields.
+
+        :param callback: The callable to call.
+        """
+        self._reload_callbacks.append(callback)
+
+    @classmethod
+    def _write_blobs(cls, path, blobs, type_schema):
+        """
+        Atomically write a schema cache file from the pickled fields of each
+        entity type. The lock of the file must be held.
+
+        :param str path: Path to the cache file.
+        :param list blobs: List of (entity type, pickled fields) tuples.
+        :param dict type_schema: Entity type schema.
+        """
+        offsets = {}
+        offset = 0
+        for entity_type, blob in blobs:
+            offsets[entity_type] = (offset, len(blob))
+            offset += len(blob)
+        index = _dumps({"types": type_schema, "fields": offsets})
+
+        with atomic_write(path) as fh:
+            fh.write(cls._HEADER.pack(cls._MAGIC, uuid.uuid4().bytes, len(index)))
+            fh.write(index)
+            for _, blob in blobs:
+                fh.write(blob)
+
+    @property
+    def type_schema(self):
+        """
+        The entity type schema, as returned by ``schema_entity_read``.
+        """
+        return self._type_schema
+
+    @property
+    def field_schema(self):
+        """
+        A read-only mapping of entity types to their fields, as returned by
+        ``schema_read``, which decodes the fields of an entity type the first
+        time they are accessed.
+        """
+        return self._field_schema
+
+    @property
+    def modified_time(self):
+        """
+        The modification time of the cache file when it was loaded, in seconds
+        since the epoch.
+        """
+        return self._modified_time
+
+    @property
+    def entity_types(self):
+        """
+        The entity types with fields in the store.
+        """
+        return self._offsets.keys()
+
+    def get_fields(self, entity_type):
+        """
+        Return the fields of an entity type, decoding them if needed.
+
+        :param str entity_type: The entity type.
+        :returns: A dictionary with the schema of each field.
+        :raises: ``KeyError`` if the entity type is not in the store.
+        """
+        fields = self._decoded_fields.get(entity_type)
+        if fields is not None:
+            return fields
+        if entity_type not in self._offsets:
+            raise KeyError(entity_type)
+
+        try:
+            fields = self._read_fields(entity_type)
+        except Exception as e:
+            self._bundle.log_warning(
+                "Could not read the %s schema from '%s': %s"
+                % (entity_type, self._path, e)
+            )
+            fields = {}
+        self._decoded_fields[entity_type] = fields
+        return fields
+
+    def _load(self):
+        """
+        Map the cache file in memory and read its index.
+
+        :raises: ``ValueError`` if the file is not a schema cache file.
+        """
+        with open(self._path, "rb") as fh:
+            stat_result = os.fstat(fh.fileno())
+            file_id = _get_file_id(stat_result)
+            if _SHARED_MAPPING:
+                # the pages of the file are shared by all the processes mapping it.
+                buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = fh.read()
+
+        magic, token, index_size = self._read_header(buffer)
+        index = sgtk.util.pickle.loads(
+            buffer[self._HEADER.size : self._HEADER.size + index_size]
+        )
+        self._close_buffer()
+        self._buffer = buffer
+        self._file_id = file_id
+        self._modified_time = stat_result.st_mtime
+        self._token = token
+        self._offsets = index["fields"]
+        self._data_start = self._HEADER.size + index_size
+        # update in place, the entity type schema is shared with users of the store.
+        self._type_schema.clear()
+        self._type_schema.update(index["types"])
+
+    def _close_buffer(self):
+        """
+        Release the memory mapping of the cache file, if any.
+        """
+        if self._buffer is not None and _SHARED_MAPPING:
+            self._buffer.close()
+        self._buffer = None
+
+    def _read_header(self, buffer):
+        """
+        Read the header of the cache file.
+
+        :param buffer: The content of the cache file.
+        :returns: A tuple with the magic, token and index size.
+        :raises: ``ValueError`` if the file is not a schema cache file.
+        """
+        header = buffer[: self._HEADER.size]
+        if len(header) != self._HEADER.size:
+            raise ValueError("Truncated schema cache file.")
+        magic, token, index_size = self._HEADER.unpack(header)
+        if magic != self._MAGIC:
+            raise ValueError("Not a schema cache file.")
+        return magic, token, index_size
+
+    def _reload_if_changed(self, notify=True):
+        """
+        Load the cache file again if it was replaced since it was loaded.
+
+        :param bool notify: Whether to call the reload callbacks if the file
+                            which was loaded was written again.
+        """
+        if _get_file_id(os.stat(self._path)) == self._file_id:
+            return
+
+        self._bundle.log_debug(
+            "Schema cache file '%s' was updated, reloading its index." % self._path
+        )
+        token = self._token
+        self._load()
+        # the decoded fields may be out of date, and so are the values derived from
+        # the index by the users of the store.
+        if self._token != token:
+            self._decoded_fields.clear()
+            if notify:
+                for callback in self._reload_callbacks:
+                    callback()
+
+    def _read_blob(self, entity_type):
+        """
+        Return the pickled fields of an entity type.
+
+        :param str entity_type: The entity type.
+        :returns: The pickled fields.
+        """
+        offset, size = self._offsets[entity_type]
+        start = self._data_start + offset
+        return self._buffer[start : start + size]
+
+    def _read_fields(self, entity_type):
+        """
+        Decode the fields of an entity type from the cache file.
+
+        :param str entity_type: The entity type.
+        :returns: A dictionary with the schema of each field.
+        """
+        self._reload_if_changed()
+        if entity_type not in self._offsets:
+            return {}
+        return sgtk.util.pickle.loads(self._read_blob(entity_type))
+
+
+def _get_file_id(stat_result):
+    """
+    Identify a version of a file, which changes when it is replaced.
+
+    :param stat_result: The ``os.stat_result`` of the file.
+    :returns: A tuple.
+    """
+    return (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+
+class _LazyFieldSchema(Mapping):
+    """
+    Read-only mapping of entity types to their fields, decoded on demand from a
+    :class:`SchemaStore`.
+    """
+
+    def __init__(self, store):
+        """
+        :param store: The :class:`SchemaStore` to decode fields from.
+        """
+        self._store = store
+
+    def __getitem__(self, entity_type):
+        return self._store.get_fields(entity_type)
+
+    def __contains__(self, entity_type):
+        return entity_type in self._store.entity_types
+
+    def __iter__(self):
+        return iter(list(self._store.entity_types))
+
+    def __len__(self):
+        return len(self._store.entity_types)
+
+
+def _dumps(data):
+    """
+    Pickle data to bytes.
+
+    :param data: The data to pickle.
+    :returns: The pickled data, as bytes.
+    """
+    blob = sgtk.util.pickle.dumps(data)
+    if isinstance(blob, str):
+        # sgtk.util.pickle.dumps returns a str, which sgtk.util.pickle.loads
+        # encodes back to utf-8.
+        blob = blob.encode("utf-8")
+    return blob
@@ -82,6 +82,13 @@ class ShotgunDataHandler(object):
                 self._cache.size,
             )
 
+    @property
+    def cache_path(self):
+        """
+        Path to the cache file on disk.
+        """
+        return self._cache_path
+
     def is_cache_available(self):
         """
         Returns true if the cache exists on disk, false if not.
@@ -473,9 +473,10 @@ class ShotgunHierarchyModel(ShotgunQueryModel):
 
         # construct the top level nodes
         logger.debug("Creating model nodes for top level of data tree...")
-        nodes_generated = self._data_handler.generate_child_nodes(
-            None, root, self._create_item
-        )
+        with self._deferred_thumbnail_requests():
+            nodes_generated = self._data_handler.generate_child_nodes(
+                None, root, self._create_item
+            )
 
         # if we got some data, emit cache load signal
         if nodes_generated > 0:
@@ -11,6 +11,7 @@
 import sgtk
 import weakref
 import datetime
+import contextlib
 
 # NOTE: This is a dummy call to work around a known bug in datetime
 # whereby there is code imported at call time that is done so in a
@@ -106,6 +107,9 @@ class ShotgunQueryModel(QtGui.QStandardItemModel):
     _SG_ITEM_HAS_CHILDREN = QtCore.Qt.UserRole + 4
     _SG_ITEM_UNIQUE_ID = QtCore.Qt.UserRole + 5
 
+    # Size, in pixels, thumbnails are displayed at, see set_thumbnail_size().
+    _thumbnail_size = None
+
     def __init__(self, parent, bg_load_thumbs, bg_task_manager=None):
         """
         Initializes the model and provides some default convenience members.
@@ -305,6 +309,34 @@ class ShotgunQueryModel(QtGui.QStandardItemModel):
 
         return self._data_handler.is_cache_available()
 
+    @property
+    def thumbnail_size(self):
+        """
+        The size, in pixels, thumbnails are displayed at, or ``None`` if full
+        size thumbnails are loaded. See :meth:`set_thumbnail_size`.
+        """
+        return self._thumbnail_size
+
+    def set_thumbnail_size(self, size):
+        """
+        Set the size, in pixels, thumbnails are displayed at.
+
+        By default, full size thumbnails are loaded and views have to scale
+        them each time they are painted. Models whose thumbnails are displayed
+        at a small size should set it, e.g. to the icon size of their view, so
+        pre-scaled variants of the thumbnails are generated in the background and
+        loaded instead. See
+        :meth:`~shotgun_data.ShotgunDataRetriever.request_thumbnail`.
+
+        Only the thumbnails requested afterwards are affected, so it should be
+        set before the data is loaded.
+
+        :param int size: The size, in pixels, of the largest side of the
+                         displayed thumbnails, or ``None`` to load full size
+                         thumbnails.
+        """
+        self._thumbnail_size = size
+
     ############################################################################
     # methods overridden from Qt base class
 
@@ -373,7 +405,8 @@ class ShotgunQueryModel(QtGui.QStandardItemModel):
         self._log_debug("Fetching more for item: %s" % item.text())
 
         unique_id = item.data(self._SG_ITEM_UNIQUE_ID)
-        self._data_handler.generate_child_nodes(unique_id, item, self._create_item)
+        with self._deferred_thumbnail_requests():
+            self._data_handler.generate_child_nodes(unique_id, item, self._create_item)
 
     def canFetchMore(self, index):
         """
@@ -697,6 +730,18 @@ class ShotgunQueryModel(QtGui.QStandardItemModel):
             # no async request was needed. process callback directly
             self.__on_sg_data_arrived([])
 
+    @contextlib.contextmanager
+    def _deferred_thumbnail_requests(self):
+        """
+        Context manager scheduling the thumbnails requested by the items created in
+        the block all at once when it is exited, rather than one request at a time.
+        """
+        if not self._sg_data_retriever:
+            yield
+            return
+        with self._sg_data_retriever.deferred_scheduling():
+            yield
+
     def _request_thumbnail_download(self, item, field, url, entity_type, entity_id):
         """
         Request that a thumbnail is downloaded for an item. If a thumbnail is successfully
@@ -728,7 +773,12 @@ class ShotgunQueryModel(QtGui.QStandardItemModel):
             raise sgtk.ShotgunModelError("Data retriever is not available!")
 
         uid = self._sg_data_retriever.request_thumbnail(
-            url, entity_type, entity_id, field, self.__bg_load_thumbs
+            url,
+            entity_type,
+            entity_id,
+            field,
+            self.__bg_load_thumbs,
+            size=self._thumbnail_size,
         )
 
         # keep tabs of this and call out later - note that we use a weakref to allow
@@ -1018,7 +1068,8 @@ class ShotgunQueryModel(QtGui.QStandardItemModel):
             # it's a deep nested tree structure with an empty cache and lots
             # of items.
             self._log_debug("Model was empty - loading root level items...")
-            self._data_handler.generate_child_nodes(None, root, self._create_item)
+            with self._deferred_thumbnail_requests():
+                self._data_handler.generate_child_nodes(None, root, self._create_item)
             self._log_debug("...done")
 
         else:
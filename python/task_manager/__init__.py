@@ -8,4 +8,16 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
-from .background_task_manager import BackgroundTaskManager
+from sgtk.platform.qt import QtCore
+
+from .concurrency_limiter import AdaptiveConcurrencyLimiter
+from .cancellation import CancellationToken, TaskCancelledError
+from .task_metrics import TaskMetrics
+from .task_futures import TaskFutures, TaskFailedError
+from .headless import HeadlessTaskManager
+
+# The Qt based classes are only available when Qt is, the headless task manager
+# can be used otherwise.
+if QtCore is not None:
+    from .background_task_manager import BackgroundTaskManager
+    from .shared_pool import SharedWorkerPool
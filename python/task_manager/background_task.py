@@ -10,12 +10,17 @@
 
 """ """
 
+import time
+import inspect
+import threading
 import traceback
 
 import sgtk
 from sgtk.platform.qt import QtCore
 from sgtk import TankError
 
+from .cancellation import CancellationToken
+
 
 class BackgroundTask(object):
     """
@@ -62,9 +67,33 @@ class BackgroundTask(object):
     Upstream tasks can be fed into multiple down-stream tasks and the task priority can also be different so for
     example all status fetches could be set to happen before all do-somethings by setting the priority accordingly.
     Down-stream tasks will also not start before it's upstream tasks have completed.
+
+    Tasks run in a thread can also stream partial results, by being generators.  Each yielded value is
+    delivered with the task_progress signal of the task manager while the task is still running, and the
+    value returned by the generator is the result of the task.  The task can be stopped between two yields.
+
+    For example:
+
+        def task_scan(root):
+            paths = []
+            for dir_path, _, file_names in os.walk(root):
+                new_paths = [os.path.join(dir_path, name) for name in file_names]
+                paths.extend(new_paths)
+                yield new_paths
+            return paths
     """
 
-    def __init__(self, task_id, cbl, group, priority, args, kwargs):
+    def __init__(
+        self,
+        task_id,
+        cbl,
+        group,
+        priority,
+        args,
+        kwargs,
+        executor="thread",
+        timeout=None,
+    ):
         """
         Construction.
 
@@ -74,6 +103,8 @@ class BackgroundTask(object):
         :param priority:    The priority this task should be run with
         :param args:        Additional arguments that should be passed to func
         :param kwargs:      Additional named arguments that should be passed to func
+        :param executor:    Where the task is run, either "thread" or "process"
+        :param timeout:     Optional number of seconds the task is allowed to run for
         """
         self._uid = task_id
 
@@ -83,6 +114,11 @@ class BackgroundTask(object):
 
         self._group = group
         self._priority = priority
+        self._executor = executor
+        self._timeout = timeout
+        self._cancellation_token = CancellationToken()
+        # timestamps for the different stages of the task, see TaskMetrics
+        self._timings = {"added": time.perf_counter()}
 
     def __repr__(self):
         """
@@ -93,7 +129,7 @@ class BackgroundTask(object):
             self._uid,
             self._group,
             self._priority,
-            self._cbl.__name__,
+            self.name,
         )
 
     @property
@@ -103,6 +139,23 @@ class BackgroundTask(object):
         """
         return self._uid
 
+    @property
+    def name(self):
+        """
+        :returns:   The name of the callable run by this task
+        """
+        return getattr(self._cbl, "__name__", None) or repr(self._cbl)
+
+    @property
+    def timings(self):
+        """
+        :returns:   A dictionary of timestamps, from :func:`time.perf_counter`, for the
+                    different stages of the task: ``added``, ``started``, ``run_started``,
+                    ``run_finished`` and ``dispatched``, and the ``thread_id`` of the
+                    thread which ran it. Stages the task didn't reach are missing.
+        """
+        return self._timings
+
     @property
     def group(self):
         """
@@ -117,6 +170,36 @@ class BackgroundTask(object):
         """
         return self._priority
 
+    @property
+    def executor(self):
+        """
+        :returns:   Where this task is run, either "thread" or "process"
+        """
+        return self._executor
+
+    @property
+    def timeout(self):
+        """
+        :returns:   The number of seconds this task is allowed to run for, or None
+        """
+        return self._timeout
+
+    @property
+    def cancellation_token(self):
+        """
+        :returns:   The :class:`CancellationToken` for this task
+        """
+        return self._cancellation_token
+
+    def submit_to(self, process_pool):
+        """
+        Submit this task to a process pool, for tasks with the "process" executor.
+
+        :param process_pool: A :class:`concurrent.futures.ProcessPoolExecutor`.
+        :returns: A :class:`concurrent.futures.Future` for the task result.
+        """
+        return process_pool.submit(self._cbl, *self._args, **self._kwargs)
+
     def append_upstream_result(self, result):
         """
         Append the result from an upstream task to this tasks kwargs.  In order for the result to be appended
@@ -130,10 +213,49 @@ class BackgroundTask(object):
         if result and isinstance(result, dict):
             self._kwargs = dict(list(self._kwargs.items()) + list(result.items()))
 
-    def run(self):
+    def run(self, progress_callback=None):
         """
         Perform this task
 
+        :param progress_callback: Optional callable called with each value yielded by the
+                                  task, if it is a generator.
         :returns:   The result of performing the task
+        :raises:    :class:`TaskCancelledError` if the task was cancelled before it started,
+                    or between two values yielded by a generator task
+        """
+        if self._timeout is not None:
+            self._cancellation_token.set_timeout(self._timeout)
+        self._cancellation_token.raise_if_cancelled()
+        CancellationToken._set_current(self._cancellation_token)
+        self._timings["thread_id"] = threading.get_ident()
+        self._timings["run_started"] = time.perf_counter()
+        try:
+            result = self._cbl(*self._args, **self._kwargs)
+            if inspect.isgenerator(result):
+                result = self._run_generator(result, progress_callback)
+            return result
+        finally:
+            self._timings["run_finished"] = time.perf_counter()
+            CancellationToken._set_current(None)
+
+    def _run_generator(self, generator, progress_callback):
+        """
+        Run a generator task until it returns, reporting each yielded value.
+
+        :param generator:         The generator returned by the task callable.
+        :param progress_callback: Callable called with each yielded value, or None.
+        :returns:   The value returned by the generator
+        :raises:    :class:`TaskCancelledError` if the task was cancelled between two
+                    yielded values
         """
-        return self._cbl(*self._args, **self._kwargs)
+        try:
+            while True:
+                try:
+                    partial = next(generator)
+                except StopIteration as e:
+                    return e.value
+                if progress_callback is not None:
+                    progress_callback(partial)
+                self._cancellation_token.raise_if_cancelled()
+        finally:
+            generator.close()
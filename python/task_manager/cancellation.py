@@ -0,0 +1,155 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Cooperative cancellation of background tasks.
+"""
+
+import time
+import threading
+
+from sgtk import TankError
+
+
+class TaskCancelledError(TankError):
+    """
+    Raised by a task which stopped early because it was cancelled or timed out.
+    """
+
+
+class CancellationToken(object):
+    """
+    Token used to ask a running task to stop what it is doing.
+
+    Each task run by a :class:`BackgroundTaskManager` worker thread is associated
+    with a token, which can be retrieved from the task with :meth:`current`. The
+    token is cancelled when the task is stopped, or when its timeout expires. Long
+    operations should check it regularly, e.g. between pages of a query, and
+    return or raise :class:`TaskCancelledError` as soon as possible so the worker
+    thread can be used for other tasks::
+
+        def my_task(items):
+            token = CancellationToken.current()
+            for item in items:
+                token.raise_if_cancelled()
+                process(item)
+
+    Tokens are thread-safe.
+    """
+
+    _thread_local = threading.local()
+
+    def __init__(self, timeout=None):
+        """
+        :param float timeout: Optional number of seconds after which the token is
+                              automatically cancelled.
+        """
+        self._event = threading.Event()
+        self._deadline = None
+        self._timed_out = False
+        if timeout is not None:
+            self.set_timeout(timeout)
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the token for the task running in the current thread.
+
+        :returns: A :class:`CancellationToken` or ``None`` if the current thread is
+                  not running a task.
+        """
+        return getattr(cls._thread_local, "token", None)
+
+    @classmethod
+    def _set_current(cls, token):
+        """
+        Set the token for the task running in the current thread.
+
+        :param token: A :class:`CancellationToken` or ``None``.
+        """
+        cls._thread_local.token = token
+
+    def set_timeout(self, timeout):
+        """
+        Cancel the token automatically after the given number of seconds.
+
+        :param float timeout: Number of seconds, counted from now.
+        """
+        self._deadline = time.monotonic() + timeout
+
+    @property
+    def remaining(self):
+        """
+        Number of seconds left before the token times out, or ``None`` if it has
+        no timeout.
+        """
+        if self._deadline is None:
+            return None
+        return max(self._deadline - time.monotonic(), 0)
+
+    @property
+    def timed_out(self):
+        """
+        Whether the token was cancelled because its timeout expired.
+        """
+        self._check_deadline()
+        return self._timed_out
+
+    @property
+    def is_cancelled(self):
+        """
+        Whether the token was cancelled.
+        """
+        self._check_deadline()
+        return self._event.is_set()
+
+    def cancel(self):
+        """
+        Cancel the token.
+        """
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the token is cancelled, or until the given time has elapsed.
+        This can be used instead of :func:`time.sleep` in tasks.
+
+        :param float timeout: Maximum number of seconds to wait, or ``None`` to
+                              wait until the token is cancelled.
+        :returns: True if the token was cancelled, False otherwise.
+        """
+        remaining = self.remaining
+        if remaining is not None and (timeout is None or remaining < timeout):
+            timeout = remaining
+        self._event.wait(timeout)
+        return self.is_cancelled
+
+    def raise_if_cancelled(self):
+        """
+        Raise a :class:`TaskCancelledError` if the token was cancelled.
+
+        :raises: :class:`TaskCancelledError`
+        """
+        if self.is_cancelled:
+            if self._timed_out:
+                raise TaskCancelledError("Task timed out.")
+            raise TaskCancelledError("Task was cancelled.")
+
+    def _check_deadline(self):
+        """
+        Cancel the token if its timeout has expired.
+        """
+        if (
+            self._deadline is not None
+            and not self._event.is_set()
+            and time.monotonic() >= self._deadline
+        ):
+            self._timed_out = True
+            self._event.set()
@@ -0,0 +1,131 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Adaptive concurrency limit for the background task manager.
+"""
+
+import time
+from threading import Lock
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """
+    Computes how many tasks can run concurrently based on the observed latency
+    and error rate of the work they do, using an additive increase,
+    multiplicative decrease (AIMD) scheme:
+
+    - Each time ``limit`` operations succeed under the latency threshold, the
+      limit is increased by one.
+    - Each time an operation fails with a transient error, or is slower than
+      the latency threshold, the limit is multiplied by the backoff factor.
+      Decreases are spaced by at least ``decrease_interval`` seconds so a burst
+      of failures from tasks started together only counts once.
+
+    Results are typically reported from worker threads, so this class is
+    thread-safe. When set on a :class:`BackgroundTaskManager`, the manager won't
+    run more tasks concurrently than the current limit.
+    """
+
+    def __init__(
+        self,
+        initial_limit=4,
+        min_limit=1,
+        max_limit=8,
+        latency_threshold=5.0,
+        backoff_factor=0.5,
+        decrease_interval=1.0,
+    ):
+        """
+        :param int initial_limit:       The starting concurrency limit.
+        :param int min_limit:           The limit will never go below this value.
+        :param int max_limit:           The limit will never go above this value.
+        :param float latency_threshold: Operations slower than this number of seconds
+                                        are treated as a sign of congestion.
+        :param float backoff_factor:    Factor applied to the limit on congestion.
+        :param float decrease_interval: Minimum number of seconds between two
+                                        decreases of the limit.
+        """
+        self._min_limit = max(1, min_limit)
+        self._max_limit = max(self._min_limit, max_limit)
+        self._limit = min(max(initial_limit, self._min_limit), self._max_limit)
+        self._latency_threshold = latency_threshold
+        self._backoff_factor = backoff_factor
+        self._decrease_interval = decrease_interval
+
+        self._lock = Lock()
+        self._successes_since_increase = 0
+        self._last_decrease = None
+        self._num_successes = 0
+        self._num_failures = 0
+        self._num_decreases = 0
+
+    @property
+    def limit(self):
+        """
+        The current concurrency limit.
+        """
+        return self._limit
+
+    def record_success(self, latency):
+        """
+        Report an operation which completed.
+
+        :param float latency: How long the operation took, in seconds.
+        """
+        with self._lock:
+            self._num_successes += 1
+            if latency > self._latency_threshold:
+                self._decrease()
+                return
+
+            self._successes_since_increase += 1
+            if self._successes_since_increase >= self._limit:
+                self._successes_since_increase = 0
+                self._limit = min(self._limit + 1, self._max_limit)
+
+    def record_failure(self):
+        """
+        Report an operation which failed with a transient error, e.g. because
+        the server is throttling requests.
+        """
+        with self._lock:
+            self._num_failures += 1
+            self._decrease()
+
+    def get_stats(self):
+        """
+        Returns monitoring information.
+
+        :returns: A dictionary with the current ``limit`` and the number of
+                  ``successes``, ``failures`` and limit ``decreases`` recorded.
+        """
+        with self._lock:
+            return {
+                "limit": self._limit,
+                "successes": self._num_successes,
+                "failures": self._num_failures,
+                "decreases": self._num_decreases,
+            }
+
+    def _decrease(self):
+        """
+        Multiplicatively decrease the limit. Must be called with the lock held.
+        """
+        self._successes_since_increase = 0
+        now = time.monotonic()
+        if (
+            self._last_decrease is not None
+            and now - self._last_decrease < self._decrease_interval
+        ):
+            return
+        self._last_decrease = now
+        self._num_decreases += 1
+        self._limit = max(int(self._limit * self._backoff_factor), self._min_limit)
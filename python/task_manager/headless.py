@@ -0,0 +1,313 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Background task manager which doesn't depend on Qt, for scripts and farm jobs.
+"""
+
+import time
+import queue
+import threading
+
+from .task_scheduler import TaskScheduler
+
+
+class Signal(object):
+    """
+    Minimal stand-in for Qt signals, for classes which can't depend on Qt.
+
+    Declared as a class attribute, like a Qt signal, it gives each instance its own
+    list of connected callables, which are called in order by ``emit``. Unlike Qt
+    signals, callables are always called directly from the emitting thread.
+    """
+
+    def __set_name__(self, owner, name):
+        """
+        :param owner: The class the signal is declared in.
+        :param str name: The name of the signal attribute.
+        """
+        self._attr_name = "_signal_%s" % name
+
+    def __get__(self, instance, owner):
+        """
+        :returns: The :class:`_BoundSignal` for the given instance.
+        """
+        if instance is None:
+            return self
+        bound_signal = instance.__dict__.get(self._attr_name)
+        if bound_signal is None:
+            bound_signal = _BoundSignal()
+            instance.__dict__[self._attr_name] = bound_signal
+        return bound_signal
+
+
+class _BoundSignal(object):
+    """
+    The callables connected to a :class:`Signal` for an instance.
+    """
+
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        """
+        :param slot: Callable to call when the signal is emitted.
+        """
+        self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        """
+        :param slot: Callable to disconnect, all callables are if None.
+        :raises: RuntimeError if the callable was not connected.
+        """
+        if slot is None:
+            self._slots = []
+        elif slot in self._slots:
+            self._slots.remove(slot)
+        else:
+            raise RuntimeError("Failed to disconnect signal from %r" % slot)
+
+    def emit(self, *args):
+        """
+        Call all the connected callables with the given arguments.
+        """
+        for slot in list(self._slots):
+            slot(*args)
+
+
+class HeadlessResultsDispatcher(object):
+    """
+    Queues the results of tasks run by worker threads, and the calls scheduled
+    with :meth:`post`, until they are processed with :meth:`process_events` in
+    the thread which owns the task manager.
+
+    :signal task_completed(worker_thread, task, result): Emitted when a completed
+        task is processed.
+    :signal task_failed(worker_thread, task, message, traceback): Emitted when a
+        failed task is processed.
+    :signal task_progress(worker_thread, task, partial): Emitted when a partial
+        result of a task is processed.
+    """
+
+    task_completed = Signal()
+    task_failed = Signal()
+    task_progress = Signal()
+
+    def __init__(self):
+        self._events = queue.Queue()
+
+    def start(self):
+        """
+        Nothing to start, events are processed by :meth:`process_events`. Provided
+        for compatibility with :class:`ResultsDispatcher`.
+        """
+
+    def shut_down(self):
+        """
+        Discard all the events which were not processed.
+        """
+        self._events = queue.Queue()
+
+    def emit_completed(self, worker_thread, task, result):
+        """
+        Queue the result of a completed task. Can be called from any thread.
+
+        :param worker_thread: Thread that completed the task, or None.
+        :param task: The task that completed.
+        :param result: The task result.
+        """
+        self._events.put((self.task_completed.emit, (worker_thread, task, result)))
+
+    def emit_failure(self, worker_thread, task, msg, tb):
+        """
+        Queue the failure of a task. Can be called from any thread.
+
+        :param worker_thread: Thread that ran the task, or None.
+        :param task: The task that failed.
+        :param msg: The error message for the failed task.
+        :param tb: The stack-trace for the failed task.
+        """
+        self._events.put((self.task_failed.emit, (worker_thread, task, msg, tb)))
+
+    def emit_progress(self, worker_thread, task, partial):
+        """
+        Queue a partial result of a task. Can be called from any thread.
+
+        :param worker_thread: Thread running the task.
+        :param task: The task reporting the partial result.
+        :param partial: The partial result yielded by the task.
+        """
+        self._events.put((self.task_progress.emit, (worker_thread, task, partial)))
+
+    def post(self, callback, *args):
+        """
+        Queue a call, made the next time events are processed. Can be called
+        from any thread.
+
+        :param callback: Callable to call.
+        :param args: Arguments to pass to the callable.
+        """
+        self._events.put((callback, args))
+
+    def process_events(self, timeout=0):
+        """
+        Process all the queued events, from the calling thread.
+
+        :param timeout: Number of seconds to wait for an event if none is queued,
+                        or None to wait until one is.
+        :returns: The number of events processed.
+        """
+        num_events = 0
+        events = self._events
+        try:
+            callback, args = events.get(block=timeout != 0, timeout=timeout)
+            while True:
+                callback(*args)
+                num_events += 1
+                callback, args = events.get_nowait()
+        except queue.Empty:
+            pass
+        return num_events
+
+
+class HeadlessTaskManager(TaskScheduler):
+    """
+    Task manager with the same API as :class:`BackgroundTaskManager`, for processes
+    which don't use Qt, e.g. farm jobs or scripts. Tasks are run by a pool of worker
+    threads, or worker processes, and are scheduled in the same way.
+
+    Without a Qt event loop, results are handed back to the thread the task manager
+    is used from when :meth:`process_events` or :meth:`wait_for_tasks` is called.
+    Signals are then emitted, and the futures returned by :meth:`get_future`
+    resolved, from that thread::
+
+        manager = HeadlessTaskManager(start_processing=True)
+        task_ids = [manager.add_task(work, task_args=[i]) for i in range(10)]
+        futures = [manager.get_future(task_id) for task_id in task_ids]
+        manager.wait_for_tasks()
+        results = [future.result() for future in futures]
+
+    Signals are plain callbacks, see :class:`Signal`, with the same names and
+    arguments as the :class:`BackgroundTaskManager` signals. Shared worker pools
+    are not supported.
+    """
+
+    # signal emitted when a task has been completed
+    task_completed = Signal()  # uid, group, result
+    # signal emitted when a task fails for some reason
+    task_failed = Signal()  # uid, group, msg, traceback
+    # signal emitted when a generator task yields a partial result
+    task_progress = Signal()  # uid, group, partial
+    # signal emitted when all tasks in a group have finished
+    task_group_finished = Signal()  # group
+    # signal emitted with the metrics of a task once it is done, if enabled
+    task_metrics_recorded = Signal()  # uid, group, metrics
+
+    def __init__(
+        self,
+        parent=None,
+        start_processing=False,
+        max_threads=8,
+        concurrency_limiter=None,
+        max_processes=None,
+    ):
+        """
+        :param parent:              Ignored, accepted for compatibility with
+                                    :class:`BackgroundTaskManager`.
+        :param start_processing:    If True then processing of tasks will start immediately
+        :param max_threads:         The maximum number of threads the task manager will use at any
+                                    time.
+        :param concurrency_limiter: Optional :class:`AdaptiveConcurrencyLimiter` used to
+                                    dynamically cap the number of tasks running at any
+                                    time, below max_threads.
+        :param max_processes:       The maximum number of worker processes used to run
+                                    tasks added with the "process" executor. Defaults
+                                    to the number of processors on the machine.
+        """
+        TaskScheduler.__init__(
+            self, start_processing, max_threads, concurrency_limiter, max_processes
+        )
+        self._results_dispatcher = HeadlessResultsDispatcher()
+        self._results_dispatcher.task_completed.connect(
+            self._on_worker_thread_task_completed
+        )
+        self._results_dispatcher.task_failed.connect(self._on_worker_thread_task_failed)
+        self._results_dispatcher.task_progress.connect(
+            self._on_worker_thread_task_progress
+        )
+
+    def call_soon(self, callback, *args):
+        """
+        Call a function from the thread this task manager is used from, the next
+        time events are processed. Can be called from any thread.
+
+        :param callback: Callable to call.
+        :param args: Arguments to pass to the callable.
+        """
+        self._results_dispatcher.post(callback, *args)
+
+    def process_events(self, timeout=0):
+        """
+        Handle the results of the tasks which were completed since the last call,
+        emitting signals and resolving futures for them.
+
+        :param timeout: Number of seconds to wait for a result if none is available,
+                        or None to wait until one is.
+        :returns: The number of events processed.
+        """
+        return self._results_dispatcher.process_events(timeout)
+
+    def wait_for_tasks(self, task_ids=None, timeout=None):
+        """
+        Process events until the given tasks are done.
+
+        :param task_ids: The ids of the tasks to wait for, or None to wait for all
+                         the tasks, including tasks added while waiting.
+        :param timeout:  Maximum number of seconds to wait, or None to wait until
+                         the tasks are done.
+        :returns: True if the tasks are done, False if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if task_ids is None:
+                done = not self._tasks_by_id
+            else:
+                done = not any(task_id in self._tasks_by_id for task_id in task_ids)
+            if done:
+                return True
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+            self.process_events(remaining)
+
+    def _start_timeout_timer(self, task):
+        """
+        Fail the given task if it is still running once its timeout expires.
+
+        :param task: The task which was just started.
+        """
+        if task.timeout is None:
+            return
+        timer = threading.Timer(
+            task.timeout, self.call_soon, (self._on_task_timeout, task)
+        )
+        timer.daemon = True
+        timer.start()
+
+    def _on_future_cancelled(self, task_id):
+        """
+        Called when the future of a task is cancelled by its user, possibly from
+        another thread. The task is stopped the next time events are processed.
+
+        :param task_id: The id of the task.
+        """
+        self.call_soon(self.stop_task, task_id)
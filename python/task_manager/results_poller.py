@@ -12,7 +12,10 @@
 Results dispatcher for the background task manager.
 """
 
+import time
 import queue
+import collections
+from threading import Lock
 
 import sgtk
 from sgtk.platform.qt import QtCore
@@ -36,6 +39,24 @@ class _TaskCompletedEvent(object):
         self.result = result
 
 
+class _TaskProgressEvent(object):
+    """
+    Event sent when a task reports a partial result.
+    """
+
+    def __init__(self, worker_thread, task, partial):
+        """
+        Constructor.
+
+        :param worker_thread: Worker thread running the task.
+        :param task: Task reporting the partial result.
+        :param partial: Partial result yielded by the task.
+        """
+        self.worker_thread = worker_thread
+        self.task = task
+        self.partial = partial
+
+
 class _TaskFailedEvent(object):
     """
     Event sent when a task is succesfully completed.
@@ -70,6 +91,14 @@ class ResultsDispatcher(QtCore.QThread):
     Therefore, we instead use Qt's QMetaObject invokeMethod to carry information
     to the background task manager thread in a thread-safe manner, since it
     doesn't exhibit the problematic behaviour that Qt's signals can have.
+
+    By default, each event is dispatched with a blocking invocation, so the
+    dispatcher waits for the event to be processed before handling the next one.
+    In batched mode, the dispatcher instead drains all the pending events and
+    hands them to the owning thread with a single non-blocking invocation. Events
+    are then processed within a time budget, and events left when the budget
+    is exhausted are processed on the next event loop iteration, so a large burst
+    of results doesn't freeze the UI.
     """
 
     class _ShutdownHint(object):
@@ -81,12 +110,18 @@ class ResultsDispatcher(QtCore.QThread):
     task_completed = QtCore.Signal(object, object, object)
     # Emitted when a task has failed.
     task_failed = QtCore.Signal(object, object, object, object)
+    # Emitted when a task reports a partial result.
+    task_progress = QtCore.Signal(object, object, object)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, batched=False, time_budget=0.02):
         """
         Constructor.
 
         :param parent:  The parent QObject for this thread
+        :param bool batched: If True, events are dispatched in batches with non-blocking
+                             invocations.
+        :param float time_budget: In batched mode, maximum time, in seconds, spent
+                                  processing events in a single event loop iteration.
         """
         QtCore.QThread.__init__(self, parent)
         # Results that will need to be dispatched to the background task
@@ -94,6 +129,22 @@ class ResultsDispatcher(QtCore.QThread):
         self._results = queue.Queue()
         self._bundle = sgtk.platform.current_bundle()
 
+        self._batched = batched
+        self._time_budget = time_budget
+        # Events handed to the owning thread in batched mode, and whether an
+        # invocation to process them is already scheduled, both protected by
+        # the lock.
+        self._batch_lock = Lock()
+        self._batch = collections.deque()
+        self._batch_invoke_scheduled = False
+
+    @property
+    def batched(self):
+        """
+        Whether events are dispatched in batches.
+        """
+        return self._batched
+
     def _log(self, msg):
         """
         Logs a message at the debug level.
@@ -125,6 +176,12 @@ class ResultsDispatcher(QtCore.QThread):
                 self._log("Consumer thread received ShutdownHint.")
                 break
 
+            if self._batched:
+                if not self._queue_batch(self._event):
+                    self._log("Consumer thread received ShutdownHint.")
+                    break
+                continue
+
             # In order to keep this loop simple, we will assume that the background
             # task manager is always opened for business. The manager already ignores
             # out of bounds events so no need to complicate the code here as well.
@@ -152,20 +209,92 @@ class ResultsDispatcher(QtCore.QThread):
                 self, "_do_invoke", QtCore.Qt.BlockingQueuedConnection
             )
 
+    def _queue_batch(self, event):
+        """
+        Hand the given event and all the events currently pending to the owning
+        thread, scheduling an invocation to process them if needed.
+
+        :param event: The event which was just retrieved from the queue.
+        :returns: False if a shutdown hint was found in the pending events, True
+                  otherwise.
+        """
+        events = [event]
+        keep_running = True
+        while True:
+            try:
+                event = self._results.get(block=False)
+            except queue.Empty:
+                break
+            if isinstance(event, self._ShutdownHint):
+                keep_running = False
+                break
+            events.append(event)
+
+        with self._batch_lock:
+            self._batch.extend(events)
+            if self._batch_invoke_scheduled:
+                # the pending invocation will pick up these events.
+                return keep_running
+            self._batch_invoke_scheduled = True
+
+        QtCore.QMetaObject.invokeMethod(
+            self, "_do_invoke_batch", QtCore.Qt.QueuedConnection
+        )
+        return keep_running
+
+    @QtCore.Slot()
+    def _do_invoke_batch(self):
+        """
+        Executes the batched events to dispatch, within the time budget.
+        """
+        start = time.monotonic()
+        while True:
+            with self._batch_lock:
+                if not self._batch:
+                    self._batch_invoke_scheduled = False
+                    return
+                event = self._batch.popleft()
+
+            self._dispatch(event)
+
+            if time.monotonic() - start >= self._time_budget:
+                break
+
+        # budget exhausted, process remaining events on the next event loop
+        # iteration so other events, e.g. for the UI, can be processed.
+        with self._batch_lock:
+            if not self._batch:
+                self._batch_invoke_scheduled = False
+                return
+        QtCore.QMetaObject.invokeMethod(
+            self, "_do_invoke_batch", QtCore.Qt.QueuedConnection
+        )
+
     @QtCore.Slot()
     def _do_invoke(self):
         """
         Executes the event to dispatch.
         """
+        event = self._event
+        self._event = None
+        self._dispatch(event)
+
+    def _dispatch(self, event):
+        """
+        Emit the signal for the given event.
+
+        :param event: A :class:`_TaskCompletedEvent`, :class:`_TaskFailedEvent` or
+                      :class:`_TaskProgressEvent`.
+        """
         try:
-            event = self._event
-            self._event = None
             if isinstance(event, _TaskCompletedEvent):
                 self.task_completed.emit(event.worker_thread, event.task, event.result)
             elif isinstance(event, _TaskFailedEvent):
                 self.task_failed.emit(
                     event.worker_thread, event.task, event.message, event.traceback
                 )
+            elif isinstance(event, _TaskProgressEvent):
+                self.task_progress.emit(event.worker_thread, event.task, event.partial)
             else:
                 raise Exception("Unknown event type: %s" % type(event).__name__)
         except Exception:
@@ -191,3 +320,13 @@ class ResultsDispatcher(QtCore.QThread):
         :param traceback: Traceback from  the worker thread error.
         """
         self._results.put(_TaskFailedEvent(worker_thread, task, msg, traceback))
+
+    def emit_progress(self, worker_thread, task, partial):
+        """
+        Called by background threads to notify that a task reported a partial result.
+
+        :param worker_thread: Worker thread running the task.
+        :param task: Task reporting the partial result.
+        :param partial: Partial result yielded by the task.
+        """
+        self._results.put(_TaskProgressEvent(worker_thread, task, partial))
@@ -0,0 +1,317 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Pool of worker threads shared by background task managers.
+"""
+
+import time
+import threading
+
+import sgtk
+from sgtk.platform.qt import QtCore
+
+from .worker_thread import WorkerThread
+from .results_poller import ResultsDispatcher
+
+
+class SharedWorkerPool(QtCore.QObject):
+    """
+    Pool of worker threads shared by several :class:`BackgroundTaskManager` instances
+    living in the same thread, so the total number of threads is bounded.
+
+    Each task manager keeps its own queue of tasks and borrows threads from the pool
+    to run them. When threads are scarce they are shared fairly: a manager can't hold
+    more than its share of the threads while other managers are waiting for one, and
+    waiting managers are served in turn as threads are released. Results are sent back
+    to the managers through a single :class:`ResultsDispatcher`, and threads which have
+    been idle for a while are shut down.
+
+    Task managers use a pool if one is passed to them. The pool for the current thread
+    can also be enabled globally with :meth:`enable_global_pool`, in which case all
+    task managers created afterwards in that thread use it unless told otherwise.
+    """
+
+    # pools used by default by task managers, by thread identifier
+    _global_pools = {}
+
+    def __init__(
+        self, parent=None, max_threads=8, idle_timeout=60.0, batched_dispatch=False
+    ):
+        """
+        :param parent:                The parent QObject for this instance
+        :param int max_threads:       The maximum number of threads in the pool.
+        :param float idle_timeout:    Number of seconds after which idle threads
+                                      are shut down.
+        :param bool batched_dispatch: Whether results are dispatched in batches,
+                                      see :class:`ResultsDispatcher`.
+        """
+        QtCore.QObject.__init__(self, parent)
+        self._bundle = sgtk.platform.current_bundle()
+
+        self._max_threads = max_threads or 8
+        self._idle_timeout = idle_timeout
+        self._all_threads = []
+        # list of (thread, time it was released), most recently released last
+        self._idle_threads = []
+        self._thread_owners = {}
+        self._num_threads_by_manager = {}
+        # managers which are waiting for a thread, in the order they will be served
+        self._waiting_managers = []
+        # task -> manager running it, to route results
+        self._task_owners = {}
+
+        self._results_dispatcher = ResultsDispatcher(self, batched=batched_dispatch)
+        self._results_dispatcher.task_completed.connect(self._on_task_completed)
+        self._results_dispatcher.task_failed.connect(self._on_task_failed)
+        self._results_dispatcher.task_progress.connect(self._on_task_progress)
+        self._results_dispatcher.start()
+
+        self._reap_timer = QtCore.QTimer(self)
+        self._reap_timer.timeout.connect(self._reap_idle_threads)
+        self._reap_timer.start(int(max(self._idle_timeout / 2.0, 1.0) * 1000))
+
+    @classmethod
+    def enable_global_pool(cls, max_threads=8, idle_timeout=60.0):
+        """
+        Create a pool used by default by all task managers created afterwards in
+        the current thread. Does nothing if such a pool already exists.
+
+        :param int max_threads:    The maximum number of threads in the pool.
+        :param float idle_timeout: Number of seconds after which idle threads
+                                   are shut down.
+        :returns: The :class:`SharedWorkerPool` for the current thread.
+        """
+        pool = cls._global_pools.get(threading.get_ident())
+        if pool is None:
+            pool = cls(max_threads=max_threads, idle_timeout=idle_timeout)
+            cls._global_pools[threading.get_ident()] = pool
+        return pool
+
+    @classmethod
+    def disable_global_pool(cls):
+        """
+        Stop using a pool by default for task managers created in the current thread,
+        and shut the pool down. Task managers still using it must be shut down first.
+        """
+        pool = cls._global_pools.pop(threading.get_ident(), None)
+        if pool:
+            pool.shut_down()
+
+    @classmethod
+    def global_pool(cls):
+        """
+        :returns: The :class:`SharedWorkerPool` used by default by task managers
+                  created in the current thread, or ``None``.
+        """
+        return cls._global_pools.get(threading.get_ident())
+
+    @property
+    def results_dispatcher(self):
+        """
+        The :class:`ResultsDispatcher` used by the threads of this pool.
+        """
+        return self._results_dispatcher
+
+    @property
+    def max_threads(self):
+        """
+        The maximum number of threads in the pool.
+        """
+        return self._max_threads
+
+    @property
+    def num_threads(self):
+        """
+        The current number of threads in the pool.
+        """
+        return len(self._all_threads)
+
+    def shut_down(self):
+        """
+        Shut down all the threads of the pool and its results dispatcher.
+        """
+        self._reap_timer.stop()
+        for thread in self._all_threads:
+            thread.shut_down()
+        self._all_threads = []
+        self._idle_threads = []
+        self._thread_owners = {}
+        self._num_threads_by_manager = {}
+        self._waiting_managers = []
+        self._task_owners = {}
+        self._results_dispatcher.shut_down()
+
+    def acquire_thread(self, manager):
+        """
+        Get a thread to run a task for the given manager.
+
+        If no thread is available, or if the manager already holds its share of the
+        threads while other managers are waiting, the manager is added to the list of
+        waiting managers. Its ``_start_tasks`` method will be called once a thread can
+        be given to it.
+
+        :param manager: The :class:`BackgroundTaskManager` requesting a thread.
+        :returns: A :class:`WorkerThread` or ``None``.
+        """
+        thread = None
+        if self._has_fair_share_left(manager):
+            thread = self._get_thread()
+
+        if thread is None:
+            if manager not in self._waiting_managers:
+                self._waiting_managers.append(manager)
+            return None
+
+        if manager in self._waiting_managers:
+            self._waiting_managers.remove(manager)
+        self._thread_owners[thread] = manager
+        self._num_threads_by_manager[manager] = (
+            self._num_threads_by_manager.get(manager, 0) + 1
+        )
+        return thread
+
+    def release_thread(self, thread):
+        """
+        Give back a thread to the pool, and let waiting managers use it.
+
+        :param thread: A :class:`WorkerThread` returned by :meth:`acquire_thread`.
+        """
+        manager = self._thread_owners.pop(thread, None)
+        if manager is None:
+            # not one of ours, or the pool was shut down.
+            return
+        self._num_threads_by_manager[manager] -= 1
+        if not self._num_threads_by_manager[manager]:
+            del self._num_threads_by_manager[manager]
+        self._idle_threads.append((thread, time.monotonic()))
+
+        # serve waiting managers in turn. They add themselves back to the list
+        # if they can't get a thread.
+        waiting_managers = self._waiting_managers
+        self._waiting_managers = []
+        for waiting_manager in waiting_managers:
+            waiting_manager._start_tasks()
+
+    def register_task(self, task, manager):
+        """
+        Associate a task run with the pool dispatcher with the manager it belongs to.
+
+        :param task: The :class:`BackgroundTask` about to be run.
+        :param manager: The :class:`BackgroundTaskManager` running it.
+        """
+        self._task_owners[task] = manager
+
+    def unregister_manager(self, manager):
+        """
+        Stop serving a manager which is shutting down.
+
+        :param manager: A :class:`BackgroundTaskManager`.
+        """
+        if manager in self._waiting_managers:
+            self._waiting_managers.remove(manager)
+
+    def _has_fair_share_left(self, manager):
+        """
+        Check if a manager can get another thread without taking more than its share
+        while other managers are waiting.
+
+        :param manager: A :class:`BackgroundTaskManager`.
+        :returns: True if the manager can get a thread, False otherwise.
+        """
+        other_waiting_managers = [m for m in self._waiting_managers if m is not manager]
+        if not other_waiting_managers:
+            return True
+        active_managers = set(self._num_threads_by_manager)
+        active_managers.update(other_waiting_managers)
+        active_managers.add(manager)
+        fair_share = max(1, self._max_threads // len(active_managers))
+        return self._num_threads_by_manager.get(manager, 0) < fair_share
+
+    def _get_thread(self):
+        """
+        Get an idle thread, or a new thread if the thread limit wasn't reached.
+
+        :returns: A :class:`WorkerThread` or ``None``.
+        """
+        if self._idle_threads:
+            thread, _ = self._idle_threads.pop()
+            return thread
+
+        if len(self._all_threads) >= self._max_threads:
+            return None
+
+        thread = WorkerThread(self._results_dispatcher)
+        self._all_threads.append(thread)
+        thread.start()
+        self._bundle.log_debug(
+            "Shared worker pool: started new background worker thread (num threads=%d)"
+            % len(self._all_threads)
+        )
+        return thread
+
+    def _reap_idle_threads(self):
+        """
+        Shut down threads which have been idle for longer than the idle timeout.
+        """
+        now = time.monotonic()
+        idle_threads = []
+        for thread, released in self._idle_threads:
+            if now - released < self._idle_timeout:
+                idle_threads.append((thread, released))
+                continue
+            thread.shut_down()
+            self._all_threads.remove(thread)
+            self._bundle.log_debug(
+                "Shared worker pool: reaped idle thread (num threads=%d)"
+                % len(self._all_threads)
+            )
+        self._idle_threads = idle_threads
+
+    def _on_task_completed(self, worker_thread, task, result):
+        """
+        Route a task completion to the manager the task belongs to.
+
+        :param worker_thread: Thread that completed the task, or None.
+        :param task:          The task that completed
+        :param result:        The task result
+        """
+        manager = self._task_owners.pop(task, None)
+        if manager is not None:
+            manager._on_worker_thread_task_completed(worker_thread, task, result)
+        elif worker_thread is not None:
+            self.release_thread(worker_thread)
+
+    def _on_task_failed(self, worker_thread, task, msg, tb):
+        """
+        Route a task failure to the manager the task belongs to.
+
+        :param worker_thread: Thread that ran the task, or None.
+        :param task:          The task that failed
+        :param msg:           The error message for the failed task
+        :param tb:            The stack-trace for the failed task
+        """
+        manager = self._task_owners.pop(task, None)
+        if manager is not None:
+            manager._on_worker_thread_task_failed(worker_thread, task, msg, tb)
+        elif worker_thread is not None:
+            self.release_thread(worker_thread)
+
+    def _on_task_progress(self, worker_thread, task, partial):
+        """
+        Route a partial result of a task to the manager the task belongs to.
+
+        :param worker_thread: Thread running the task.
+        :param task:          The task reporting the partial result
+        :param partial:       The partial result yielded by the task
+        """
+        manager = self._task_owners.get(task)
+        if manager is not None:
+            manager._on_worker_thread_task_progress(worker_thread, task, partial)
@@ -0,0 +1,131 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Futures for the results of background tasks.
+"""
+
+import asyncio
+from concurrent.futures import Future
+
+from sgtk import TankError
+
+
+class TaskFailedError(TankError):
+    """
+    Set on the future of a task which failed.
+    """
+
+    def __init__(self, msg, tb=""):
+        """
+        :param str msg: The error message for the failed task.
+        :param str tb:  The stack-trace for the failed task.
+        """
+        TankError.__init__(self, msg)
+        self.traceback = tb
+
+
+class TaskFutures(object):
+    """
+    Keeps track of the :class:`~concurrent.futures.Future` instances handed out for
+    requests identified by a key, e.g. a task id, so they can be resolved when the
+    results of the requests are delivered.
+
+    Futures can be cancelled by their users from any thread, the owner of this object
+    is then notified with a callback, called from that thread, so it can stop the
+    request.
+    """
+
+    def __init__(self, cancel_callback):
+        """
+        :param cancel_callback: Callable called with the key of a request whose
+                                future was cancelled by its user.
+        """
+        self._futures = {}
+        self._cancel_callback = cancel_callback
+
+    def get_future(self, key):
+        """
+        Return the future for the given request, creating it if needed.
+
+        :param key: The request key.
+        :returns: A :class:`~concurrent.futures.Future`.
+        """
+        future = self._futures.get(key)
+        if future is None:
+            future = Future()
+            self._futures[key] = future
+            future.add_done_callback(lambda f: self._on_future_done(key, f))
+        return future
+
+    @staticmethod
+    def wrap(future, loop=None):
+        """
+        Wrap a future so it can be awaited in an asyncio event loop.
+
+        :param future: A :class:`~concurrent.futures.Future`.
+        :param loop:   The asyncio event loop to use, the current one if None.
+        :returns: An :class:`asyncio.Future`.
+        """
+        return asyncio.wrap_future(future, loop=loop)
+
+    def set_result(self, key, result):
+        """
+        Resolve the future for the given request, if any, with a result.
+
+        :param key:    The request key.
+        :param result: The result of the request.
+        """
+        future = self._futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def set_exception(self, key, exception):
+        """
+        Resolve the future for the given request, if any, with an exception.
+
+        :param key:       The request key.
+        :param exception: The exception to set on the future.
+        """
+        future = self._futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_exception(exception)
+
+    def cancel(self, key):
+        """
+        Cancel the future for a request which was stopped, if any.
+
+        :param key: The request key.
+        """
+        future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def cancel_all(self):
+        """
+        Cancel the futures of all the requests.
+        """
+        futures = self._futures
+        self._futures = {}
+        for future in futures.values():
+            future.cancel()
+
+    def _on_future_done(self, key, future):
+        """
+        Called when a future is done, from the thread which resolved or cancelled it.
+
+        :param key:    The request key.
+        :param future: The :class:`~concurrent.futures.Future` which is done.
+        """
+        if not future.cancelled() or self._futures.get(key) is not future:
+            # resolved or cancelled by us.
+            return
+        self._futures.pop(key, None)
+        self._cancel_callback(key)
@@ -0,0 +1,261 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Lifecycle metrics for background tasks.
+"""
+
+import os
+import json
+import time
+import threading
+import collections
+
+# what is kept of a task for the timeline, which must not reference the task
+# and its potentially large arguments and result.
+_TracedTask = collections.namedtuple(
+    "_TracedTask",
+    [
+        "uid",
+        "name",
+        "group",
+        "priority",
+        "added",
+        "run_started",
+        "run_finished",
+        "dispatched",
+        "thread_id",
+        "failed",
+        "dispatch_thread_id",
+    ],
+)
+
+
+class TaskMetrics(object):
+    """
+    Collects timings for the tasks run by a :class:`BackgroundTaskManager`:
+
+    - ``queue_wait``: time between the moment a task is added and the moment it
+      starts running.
+    - ``run_time``: time spent running the task.
+    - ``dispatch_delay``: time between the moment a task returns and the moment its
+      result is handled by the task manager, in the thread it belongs to.
+
+    Aggregated statistics are available globally and per task group with
+    :meth:`get_stats`. Individual task timings can also be kept to build a timeline
+    of all tasks, which can be exported with :meth:`export_chrome_trace` and
+    loaded in ``chrome://tracing`` or https://ui.perfetto.dev.
+
+    All times are in seconds.
+    """
+
+    METRICS = ("queue_wait", "run_time", "dispatch_delay")
+
+    def __init__(self, max_trace_tasks=10000):
+        """
+        :param int max_trace_tasks: Maximum number of tasks kept for the timeline,
+                                    the oldest tasks are dropped first. 0 disables
+                                    the timeline.
+        """
+        self._max_trace_tasks = max_trace_tasks
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all collected metrics.
+        """
+        self._totals = self._new_stats()
+        self._group_stats = {}
+        self._traced_tasks = collections.deque(maxlen=self._max_trace_tasks or 0)
+
+    @staticmethod
+    def _new_stats():
+        """
+        :returns: A new dictionary used to aggregate metrics.
+        """
+        stats = {"count": 0, "failed": 0}
+        for metric in TaskMetrics.METRICS:
+            stats[metric] = {"total": 0.0, "max": 0.0}
+        return stats
+
+    def record(self, task, failed=False):
+        """
+        Record the timings of a task whose result was just handled.
+
+        :param task: The :class:`BackgroundTask`.
+        :param bool failed: Whether the task failed.
+        :returns: A dictionary with the ``queue_wait``, ``run_time`` and
+                  ``dispatch_delay`` of the task.
+        """
+        timings = task.timings
+        timings["dispatched"] = time.perf_counter()
+        run_started = timings.get("run_started", timings.get("started"))
+        run_finished = timings.get("run_finished", timings["dispatched"])
+        task_metrics = {
+            "queue_wait": max(run_started - timings["added"], 0.0),
+            "run_time": max(run_finished - run_started, 0.0),
+            "dispatch_delay": max(timings["dispatched"] - run_finished, 0.0),
+        }
+
+        for stats in (
+            self._totals,
+            self._group_stats.setdefault(task.group, self._new_stats()),
+        ):
+            stats["count"] += 1
+            if failed:
+                stats["failed"] += 1
+            for metric, value in task_metrics.items():
+                stats[metric]["total"] += value
+                stats[metric]["max"] = max(stats[metric]["max"], value)
+
+        if self._max_trace_tasks:
+            self._traced_tasks.append(
+                _TracedTask(
+                    uid=task.uid,
+                    name=task.name,
+                    group=str(task.group),
+                    priority=task.priority,
+                    added=timings["added"],
+                    run_started=run_started,
+                    run_finished=run_finished,
+                    dispatched=timings["dispatched"],
+                    thread_id=timings.get("thread_id", 0),
+                    failed=failed,
+                    dispatch_thread_id=threading.get_ident(),
+                )
+            )
+        return task_metrics
+
+    def get_stats(self):
+        """
+        Returns aggregated metrics.
+
+        :returns: A dictionary with the metrics for all tasks under the ``"all"`` key
+                  and the metrics for each group under the ``"groups"`` key. Metrics
+                  are dictionaries with the number of tasks (``count``), the number of
+                  failed tasks (``failed``), and for each of ``queue_wait``,
+                  ``run_time`` and ``dispatch_delay`` a dictionary with the ``total``,
+                  ``mean`` and ``max`` values.
+        """
+        return {
+            "all": self._summarize(self._totals),
+            "groups": dict(
+                (group, self._summarize(stats))
+                for group, stats in self._group_stats.items()
+            ),
+        }
+
+    def _summarize(self, stats):
+        """
+        :param dict stats: Aggregated metrics.
+        :returns: A copy of the metrics, with mean values.
+        """
+        summary = {"count": stats["count"], "failed": stats["failed"]}
+        for metric in self.METRICS:
+            total = stats[metric]["total"]
+            summary[metric] = {
+                "total": total,
+                "mean": total / stats["count"] if stats["count"] else 0.0,
+                "max": stats[metric]["max"],
+            }
+        return summary
+
+    def get_trace_events(self):
+        """
+        Build a timeline of the recorded tasks, in the Chrome trace event format.
+
+        Each task run is a complete event on the thread which ran it, tasks run in
+        worker processes are shown on a separate track. Queue waits are shown as
+        asynchronous events.
+
+        :returns: A list of trace events.
+        """
+        pid = os.getpid()
+        events = []
+        thread_names = {}
+
+        def _us(seconds):
+            return int(round(seconds * 1000000))
+
+        for task in self._traced_tasks:
+            name = task.name
+            thread_id = task.thread_id
+            dispatch_thread_id = task.dispatch_thread_id
+            thread_names.setdefault(
+                thread_id, "Worker thread" if thread_id else "Worker processes"
+            )
+            thread_names[dispatch_thread_id] = "Task manager thread"
+            run_started = task.run_started
+            run_finished = task.run_finished
+            args = {
+                "uid": task.uid,
+                "group": task.group,
+                "priority": task.priority,
+                "failed": task.failed,
+                "dispatch_delay_ms": (task.dispatched - run_finished) * 1000,
+            }
+            events.append(
+                {
+                    "name": "queued %s" % name,
+                    "cat": "queue",
+                    "ph": "b",
+                    "id": task.uid,
+                    "ts": _us(task.added),
+                    "pid": pid,
+                    "tid": dispatch_thread_id,
+                }
+            )
+            events.append(
+                {
+                    "name": "queued %s" % name,
+                    "cat": "queue",
+                    "ph": "e",
+                    "id": task.uid,
+                    "ts": _us(run_started),
+                    "pid": pid,
+                    "tid": dispatch_thread_id,
+                }
+            )
+            events.append(
+                {
+                    "name": name,
+                    "cat": task.group,
+                    "ph": "X",
+                    "ts": _us(run_started),
+                    "dur": _us(run_finished - run_started),
+                    "pid": pid,
+                    "tid": thread_id,
+                    "args": args,
+                }
+            )
+
+        for thread_id, thread_name in thread_names.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": thread_id,
+                    "args": {"name": thread_name},
+                }
+            )
+        return events
+
+    def export_chrome_trace(self, path):
+        """
+        Write the timeline of the recorded tasks to a JSON file which can be loaded
+        in ``chrome://tracing`` or https://ui.perfetto.dev.
+
+        :param str path: Path to the file to write.
+        """
+        with open(path, "w") as fh:
+            json.dump(
+                {"traceEvents": self.get_trace_events(), "displayTimeUnit": "ms"}, fh
+            )
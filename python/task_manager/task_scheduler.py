@@ -0,0 +1,1179 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Task scheduling logic shared by the background task managers.
+"""
+
+import time
+import heapq
+import inspect
+import contextlib
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import sgtk
+from sgtk import TankError
+
+from .background_task import BackgroundTask
+from .worker_thread import WorkerThread
+from .task_metrics import TaskMetrics
+from .task_futures import TaskFutures, TaskFailedError
+
+# Set to True to enable extensive debug logging.
+# Useful for debugging concurrency issues.
+# Do not release with this setting set to True!
+ENABLE_DETAILED_DEBUG = False
+
+
+class TaskScheduler(object):
+    """
+    Manages a queue of tasks and runs them asynchronously through a pool of worker
+    threads, or worker processes. This class holds the scheduling logic and doesn't
+    depend on Qt, see :class:`BackgroundTaskManager` and :class:`HeadlessTaskManager`
+    for how results are handed back to the thread the task manager lives in.
+
+    Subclasses must define the ``task_completed``, ``task_failed``, ``task_progress``,
+    ``task_group_finished`` and ``task_metrics_recorded`` signals, set the results
+    dispatcher used by worker threads and implement :meth:`_start_timeout_timer` and
+    :meth:`_on_future_cancelled`.
+    """
+
+    # Task executors:
+    THREAD_EXECUTOR = "thread"
+    PROCESS_EXECUTOR = "process"
+
+    def __init__(
+        self,
+        start_processing=False,
+        max_threads=8,
+        concurrency_limiter=None,
+        max_processes=None,
+    ):
+        """
+        :param start_processing:    If True then processing of tasks will start immediately
+        :param max_threads:         The maximum number of threads the task manager will use at any
+                                    time.
+        :param concurrency_limiter: Optional :class:`AdaptiveConcurrencyLimiter` used to
+                                    dynamically cap the number of tasks running at any
+                                    time, below max_threads.
+        :param max_processes:       The maximum number of worker processes used to run
+                                    tasks added with the "process" executor. Defaults
+                                    to the number of processors on the machine.
+        """
+        self._bundle = sgtk.platform.current_bundle()
+
+        self._next_task_id = 0
+        self._next_group_id = 0
+
+        self._can_process_tasks = start_processing
+        # number of nested deferred_scheduling() blocks being run:
+        self._scheduling_deferral_depth = 0
+
+        # the pending tasks, by id:
+        self._pending_tasks = {}
+        # number of upstream tasks each pending task is still waiting on:
+        self._pending_upstream_counts = {}
+        # heaps of (-priority, virtual time, task id, task) for the pending tasks
+        # which are ready to run, for each executor. Removed tasks are discarded
+        # lazily when they reach the top of a heap, the number of such stale
+        # entries is tracked so the heaps can be compacted if they accumulate.
+        self._ready_heap = []
+        self._ready_process_heap = []
+        self._num_stale_ready_entries = 0
+
+        # per group settings, see configure_group(), and number of running tasks:
+        self._group_settings = {}
+        self._num_running_tasks_by_group = {}
+        # heaps of ready entries held back because their group is at its limit,
+        # by group:
+        self._parked_ready_entries = {}
+        self._num_parked_ready_entries = 0
+        # Virtual times used to share turns between groups of the same priority:
+        # each task is given a virtual finish time, 1 / group weight after the
+        # previous task queued for its group, and tasks are started in virtual
+        # time order. Groups which had nothing queued start from the virtual time
+        # of the last task started for the priority.
+        self._group_virtual_times = {}
+        self._priority_virtual_times = {}
+
+        # available threads and running tasks:
+        self._max_threads = max_threads or 8
+        self._all_threads = []
+        self._available_threads = []
+        self._running_tasks = {}
+        self._concurrency_limiter = concurrency_limiter
+
+        # worker processes, created on demand, and running process tasks:
+        self._max_processes = max_processes or multiprocessing.cpu_count()
+        self._process_pool = None
+        self._running_process_task_ids = set()
+
+        # task metrics, if enabled:
+        self._metrics = None
+
+        # futures handed out for tasks, see get_future():
+        self._futures = TaskFutures(self._on_future_cancelled)
+
+        # various task look-up maps:
+        self._tasks_by_id = {}
+        self._group_task_map = {}
+
+        # track downstream dependencies for tasks:
+        self._upstream_task_map = {}
+        self._downstream_task_map = {}
+
+        # set by subclasses:
+        self._shared_pool = None
+        self._results_dispatcher = None
+
+    def next_group_id(self):
+        """
+        Return the next available group id
+
+        :returns:    A unique group id to be used for tasks that belong to the same group.
+        """
+        group_id = self._next_group_id
+        self._next_group_id += 1
+        return group_id
+
+    def configure_group(self, group, max_concurrent_tasks=None, weight=1):
+        """
+        Configure how tasks of a group are scheduled.
+
+        :param group:                The group to configure.
+        :param int max_concurrent_tasks: Maximum number of tasks of the group which
+                                     can run at the same time, or None for no limit.
+        :param float weight:         How many turns the group gets, relative to other
+                                     groups, when tasks with the same priority from
+                                     several groups are ready to run.
+        :raises: :class:`TankError` if the weight is not positive.
+        """
+        if weight <= 0:
+            raise TankError("Task group weight must be positive, got %s" % weight)
+        self._group_settings[group] = (max_concurrent_tasks, weight)
+        # tasks held back by a previous limit may be able to run now:
+        self._unpark_ready_entries(group, all_entries=True)
+        self._start_tasks()
+
+    def enable_metrics(self, max_trace_tasks=10000):
+        """
+        Start collecting metrics for the tasks run by this task manager, see
+        :class:`TaskMetrics`. Does nothing if metrics are already enabled.
+
+        :param int max_trace_tasks: Maximum number of tasks kept for the timeline
+                                    exported by :meth:`export_chrome_trace`.
+        :returns: The :class:`TaskMetrics` instance collecting the metrics.
+        """
+        if self._metrics is None:
+            self._metrics = TaskMetrics(max_trace_tasks)
+        return self._metrics
+
+    def disable_metrics(self):
+        """
+        Stop collecting metrics and discard the metrics collected so far.
+        """
+        self._metrics = None
+
+    @property
+    def metrics(self):
+        """
+        The :class:`TaskMetrics` collecting metrics for this task manager, or ``None``
+        if metrics are not enabled.
+        """
+        return self._metrics
+
+    def get_task_stats(self):
+        """
+        Returns statistics about the tasks run since metrics were enabled, see
+        :meth:`TaskMetrics.get_stats`.
+
+        :returns: A dictionary with the statistics.
+        :raises: :class:`TankError` if metrics are not enabled.
+        """
+        if self._metrics is None:
+            raise TankError("Task metrics are not enabled for %s" % self)
+        return self._metrics.get_stats()
+
+    def export_chrome_trace(self, path):
+        """
+        Write a timeline of the tasks run since metrics were enabled to a JSON file,
+        in the Chrome trace event format, see :meth:`TaskMetrics.export_chrome_trace`.
+
+        :param str path: Path to the file to write.
+        :raises: :class:`TankError` if metrics are not enabled.
+        """
+        if self._metrics is None:
+            raise TankError("Task metrics are not enabled for %s" % self)
+        self._metrics.export_chrome_trace(path)
+
+    @property
+    def concurrency_limiter(self):
+        """
+        The :class:`AdaptiveConcurrencyLimiter` associated with this task manager,
+        or ``None``. Tasks can report the latency and transient failures of the
+        work they do to it, e.g. Shotgun calls.
+        """
+        return self._concurrency_limiter
+
+    @property
+    def concurrency_limit(self):
+        """
+        The maximum number of tasks which can currently run at the same time.
+        """
+        if self._concurrency_limiter is None:
+            return self._max_threads
+        return min(self._concurrency_limiter.limit, self._max_threads)
+
+    def _low_level_debug_log(self, msg):
+        """
+        Wrapper method for logging *detailed* info
+        to debug. This is disabled by default but can
+        be useful to enable for example when debugging
+        issues around concurrency. In order to enable it,
+        set the ENABLE_DETAILED_DEBUG constant at the top
+        of this file to True.
+
+        :param msg: The message to be logged.
+        """
+        if ENABLE_DETAILED_DEBUG:
+            self._debug_log(msg)
+
+    def _debug_log(self, msg):
+        """
+        Wrapper method for logging useful information to debug.
+
+        :param msg: The message to be logged.
+        """
+        self._bundle.log_debug("Task Manager: %s" % msg)
+
+    def start_processing(self):
+        """
+        Start processing of tasks
+        """
+        self._can_process_tasks = True
+        self._start_tasks()
+
+    def pause_processing(self):
+        """
+        Pause processing of tasks - any currently running tasks will
+        complete as normal.
+        """
+        self._can_process_tasks = False
+        # and just let the current threads complete...
+
+    def shut_down(self):
+        """
+        Shut down the task manager.  This clears the task queue and gracefully stops all running
+        threads.  Completion/failure of any currently running tasks will be ignored.
+        """
+        self._debug_log("Shutting down...")
+        self._can_process_tasks = False
+
+        # stop all tasks:
+        self.stop_all_tasks()
+
+        # shut down worker processes, without waiting for running tasks:
+        if self._process_pool:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+        if self._shared_pool:
+            # threads and dispatcher are owned by the pool, threads still running
+            # our tasks are given back to it once they are done.
+            self._shared_pool.unregister_manager(self)
+            self._debug_log("Shut down successfully!")
+            return
+
+        # shut down all worker threads:
+        self._debug_log(
+            "Waiting for %d background threads to stop..." % len(self._all_threads)
+        )
+        for thread in self._all_threads:
+            thread.shut_down()
+        self._available_threads = []
+        self._all_threads = []
+
+        # Shut down the dispatcher thread
+        self._results_dispatcher.shut_down()
+        self._debug_log("Shut down successfully!")
+
+    def add_task(
+        self,
+        cbl,
+        priority=None,
+        group=None,
+        upstream_task_ids=None,
+        task_args=None,
+        task_kwargs=None,
+        executor=THREAD_EXECUTOR,
+        timeout=None,
+    ):
+        """
+        Add a new task to the queue.  A task is a callable method/class together with any arguments that
+        should be passed to the callable when it is called.
+
+        Tasks added with the "process" executor are run in a worker process. The callable, its
+        arguments, the results of upstream tasks and its own result are sent between processes so
+        they must be picklable, e.g. the callable must be a function defined at the top level of a
+        module which can be imported in a fresh Python interpreter. Note that modules loaded with
+        ``import_framework`` or ``import_module`` can't be imported this way.
+
+        If the callable returns a generator, e.g. it is a generator function, each value it yields
+        is emitted with the task_progress signal and the value it returns is the result of the task.
+        Generator tasks can only be run by a worker thread.
+
+        :param cbl:                 The callable function/class to call when executing the task
+        :param priority:            The priority this task should be run with.  Tasks with higher priority
+                                    are run first.
+        :param group:               The group this task belongs to.  Task groups can be used to simplify task
+                                    management (e.g. stop a whole group, be notified when a group is complete)
+        :param upstream_task_ids:   A list of any upstream tasks that should be completed before this task
+                                    is run.  The results from any upstream tasks are appended to the kwargs
+                                    for this task.
+        :param task_args:           A list of unnamed parameters to be passed to the callable when running the
+                                    task
+        :param task_kwargs:         A dictionary of named parameters to be passed to the callable when running
+                                    the task
+        :param executor:            Where the task is run: "thread" to run it in a worker thread,
+                                    or "process" to run it in a worker process.
+        :param timeout:             Optional number of seconds the task is allowed to run for once
+                                    started. When it expires the task fails, and its cancellation
+                                    token is cancelled.
+        :returns:                   A unique id representing the task.
+        """
+        if not callable(cbl):
+            raise TankError(
+                "The task function, method or object '%s' must be callable!" % cbl
+            )
+        if executor not in (self.THREAD_EXECUTOR, self.PROCESS_EXECUTOR):
+            raise TankError("Unsupported task executor '%s'!" % executor)
+        if executor == self.PROCESS_EXECUTOR and inspect.isgeneratorfunction(cbl):
+            raise TankError(
+                "Generator task '%s' can't be run by a worker process!" % cbl
+            )
+
+        upstream_task_ids = set(upstream_task_ids or [])
+
+        # create a new task instance:
+        task_id = self._next_task_id
+        self._next_task_id += 1
+        new_task = BackgroundTask(
+            task_id, cbl, group, priority, task_args, task_kwargs, executor, timeout
+        )
+
+        # keep track of the task dependencies, only upstream tasks which are still
+        # queued or running need to be waited on:
+        self._upstream_task_map[new_task.uid] = upstream_task_ids
+        num_upstream_tasks = 0
+        for us_task_id in upstream_task_ids:
+            self._downstream_task_map.setdefault(us_task_id, set()).add(new_task.uid)
+            if us_task_id in self._tasks_by_id:
+                num_upstream_tasks += 1
+
+        # add the task to the pending queue:
+        self._pending_tasks[new_task.uid] = new_task
+        self._pending_upstream_counts[new_task.uid] = num_upstream_tasks
+        if not num_upstream_tasks:
+            self._push_ready_task(new_task)
+
+        # add tasks to various look-ups:
+        self._tasks_by_id[new_task.uid] = new_task
+        self._group_task_map.setdefault(group, set()).add(new_task.uid)
+
+        self._low_level_debug_log("Added Task %s to the queue" % new_task)
+
+        # and start the next task:
+        self._start_tasks()
+
+        return new_task.uid
+
+    def add_tasks(self, tasks):
+        """
+        Add several tasks to the queue at once. This is cheaper than calling
+        :meth:`add_task` for each of them as tasks are only scheduled once all of
+        them were added.
+
+        :param tasks: A list of dictionaries with the arguments to pass to
+                      :meth:`add_task` for each task, e.g.
+                      ``{"cbl": check_thumbnail, "priority": 20, "task_kwargs": {...}}``.
+        :returns:     A list with the unique ids of the tasks, in the same order.
+        """
+        with self.deferred_scheduling():
+            return [self.add_task(**task) for task in tasks]
+
+    @contextlib.contextmanager
+    def deferred_scheduling(self):
+        """
+        Context manager deferring the scheduling of tasks until the block is exited,
+        so tasks added in the block, and their dependencies, are all registered before
+        tasks are started, with a single scheduling pass::
+
+            with manager.deferred_scheduling():
+                for item in items:
+                    check_id = manager.add_task(check, task_args=[item])
+                    manager.add_task(download, upstream_task_ids=[check_id])
+
+        Blocks can be nested, tasks are scheduled when the outermost one is exited.
+        """
+        self._scheduling_deferral_depth += 1
+        try:
+            yield
+        finally:
+            self._scheduling_deferral_depth -= 1
+            if not self._scheduling_deferral_depth:
+                self._start_tasks()
+
+    def get_future(self, task_id):
+        """
+        Return a :class:`~concurrent.futures.Future` for the result of a task, as an
+        alternative to the task_completed and task_failed signals, which are still
+        emitted.
+
+        The future is resolved in the thread this task manager lives in, with the
+        result of the task, or a :class:`TaskFailedError` if the task failed. It is
+        cancelled if the task is stopped, and cancelling it stops the task.
+
+        :param task_id: The id of a task which is queued or running.
+        :returns: A :class:`~concurrent.futures.Future`.
+        :raises: :class:`TankError` if the task is unknown or already done.
+        """
+        if task_id not in self._tasks_by_id:
+            raise TankError("Task %s is unknown or already done!" % task_id)
+        return self._futures.get_future(task_id)
+
+    def get_async_future(self, task_id, loop=None):
+        """
+        Return an :class:`asyncio.Future` for the result of a task which can be
+        awaited, see :meth:`get_future`. The Qt event loop of the thread this task
+        manager lives in must be running for the future to be resolved.
+
+        :param task_id: The id of a task which is queued or running.
+        :param loop:    The asyncio event loop to use, the current one if None.
+        :returns: An :class:`asyncio.Future`.
+        :raises: :class:`TankError` if the task is unknown or already done.
+        """
+        return TaskFutures.wrap(self.get_future(task_id), loop)
+
+    def add_pass_through_task(
+        self, priority=None, group=None, upstream_task_ids=None, task_kwargs=None
+    ):
+        """
+        Add a pass-through task to the queue.  A pass-through task doesn't perform any work but can be useful
+        when synchronising other tasks (e.g. pulling the results from multiple upstream tasks into a single task)
+
+        :param priority:            The priority this task should be run with.  Tasks with higher priority
+                                    are run first.
+        :param group:               The group this task belongs to.  Task groups can be used to simplify task
+                                    management (e.g. stop a whole group, be notified when a group is complete).
+                                    A group is expressed as a string, for example 'thumbnails', 'IO' or 'shotgun'.
+        :param upstream_task_ids:   A list of any upstream tasks that should be completed before this task
+                                    is run.  The results from any upstream tasks are appended to the kwargs
+                                    for this task.
+        :param task_kwargs:         A dictionary of named parameters that will be appended to the result of
+                                    the pass-through task.
+        :returns:                   A unique id representing the task.
+
+        """
+        return self.add_task(
+            self._task_pass_through,
+            priority,
+            group,
+            upstream_task_ids,
+            task_kwargs=task_kwargs,
+        )
+
+    def stop_task(self, task_id, stop_upstream=True, stop_downstream=True):
+        """
+        Stop the specified task from running.  If the task is already running then its cancellation
+        token is cancelled, and its completion/failure signal will be ignored.
+
+        :param task_id:         The id of the task to stop
+        :param stop_upstream:   If true then all upstream tasks will also be stopped
+        :param stop_downstream: If true then all downstream tasks will also be stopped
+        """
+        task = self._tasks_by_id.get(task_id)
+        if task is None:
+            return
+
+        self._low_level_debug_log("Stopping Task %s..." % task)
+        self._stop_tasks([task], stop_upstream, stop_downstream)
+        self._low_level_debug_log(" > Task %s stopped!" % task)
+
+    def stop_task_group(self, group, stop_upstream=True, stop_downstream=True):
+        """
+        Stop all tasks in the specified group from running.  If any tasks are already running then their
+        cancellation tokens are cancelled, and their completion/failure signals will be ignored.
+
+        :param group:           The task group to stop
+        :param stop_upstream:   If true then all upstream tasks will also be stopped
+        :param stop_downstream: If true then all downstream tasks will also be stopped
+        """
+        task_ids = self._group_task_map.get(group)
+        if task_ids is None:
+            return
+
+        self._low_level_debug_log("Stopping Task group %s..." % group)
+
+        tasks_to_stop = []
+        for task_id in task_ids:
+            task = self._tasks_by_id.get(task_id)
+            if task:
+                tasks_to_stop.append(task)
+        del self._group_task_map[group]
+        self._stop_tasks(tasks_to_stop, stop_upstream, stop_downstream)
+        self._group_virtual_times.pop(group, None)
+
+        self._low_level_debug_log(" > Task group %s stopped!" % group)
+
+    def stop_all_tasks(self):
+        """
+        Stop all currently queued or running tasks.  If any tasks are already running then their
+        cancellation tokens are cancelled, and their completion/failure signals will be ignored.
+        """
+        self._debug_log("Stopping all tasks...")
+
+        self._futures.cancel_all()
+
+        for task, _ in self._running_tasks.values():
+            task.cancellation_token.cancel()
+
+        # we just need to clear all the lookups:
+        self._running_tasks = {}
+        self._pending_tasks = {}
+        self._pending_upstream_counts = {}
+        self._ready_heap = []
+        self._ready_process_heap = []
+        self._num_stale_ready_entries = 0
+        self._num_running_tasks_by_group = {}
+        self._parked_ready_entries = {}
+        self._num_parked_ready_entries = 0
+        self._group_virtual_times = {}
+        self._priority_virtual_times = {}
+        self._running_process_task_ids = set()
+        self._tasks_by_id = {}
+        self._group_task_map = {}
+        self._upstream_task_map = {}
+        self._downstream_task_map = {}
+
+        self._debug_log(" > All tasks stopped!")
+
+    def _stop_tasks(self, tasks_to_stop, stop_upstream, stop_downstream):
+        """
+        Stop the specified list of tasks
+
+        :param tasks_to_stop:   A list of tasks to stop
+        :param stop_upstream:   If true then all upstream tasks will also be stopped
+        :param stop_downstream: If true then all downstream tasks will also be stopped
+        """
+        if not tasks_to_stop:
+            return
+
+        # copy the task list as we'll be modifying it:
+        tasks_to_stop = list(tasks_to_stop)
+        # and make sure we only stop each task once!!
+        stopped_task_ids = set([task.uid for task in tasks_to_stop])
+
+        while tasks_to_stop:
+            task_to_stop = tasks_to_stop.pop(0)
+
+            # get the up & downstream tasks to also stop depending on the flags:
+            if stop_upstream and task_to_stop.uid in self._upstream_task_map:
+                for us_task_id in self._upstream_task_map[task_to_stop.uid]:
+                    us_task = self._tasks_by_id.get(us_task_id)
+                    if not us_task or us_task.uid in stopped_task_ids:
+                        # no task or already found
+                        continue
+
+                    tasks_to_stop.append(us_task)
+                    stopped_task_ids.add(us_task_id)
+
+            if stop_downstream and task_to_stop.uid in self._downstream_task_map:
+                for ds_task_id in self._downstream_task_map[task_to_stop.uid]:
+                    ds_task = self._tasks_by_id.get(ds_task_id)
+                    if not ds_task or ds_task.uid in stopped_task_ids:
+                        # no task or already found
+                        continue
+
+                    tasks_to_stop.append(ds_task)
+                    stopped_task_ids.add(ds_task_id)
+
+            # remove the task, letting it know it should stop if it is running:
+            task_to_stop.cancellation_token.cancel()
+            self._remove_task(task_to_stop)
+            self._futures.cancel(task_to_stop.uid)
+
+    def _get_worker_thread(self):
+        """
+        Get a worker thread to use.
+
+        :returns:   An available worker thread if there is one, a new thread if needed or None if the thread
+                    limit has been reached.
+        """
+        if self._shared_pool:
+            return self._shared_pool.acquire_thread(self)
+
+        if self._available_threads:
+            # we can just use one of the available threads:
+            return self._available_threads.pop()
+
+        # no available threads so lets check our thread count:
+        thread_count = len(self._all_threads)
+        if thread_count >= self._max_threads:
+            # no available threads left!
+            return None
+
+        # create a new worker thread - note, there are two different implementations of the WorkerThread class
+        # that use two different recipes.  Although WorkerThreadB is arguably more correct it has some issues
+        # in PyQt so WorkerThread is currently preferred - see the notes in the class above for further details
+        thread = WorkerThread(self._results_dispatcher)
+        if not isinstance(thread, WorkerThread):
+            # for some reason (probably memory corruption somewhere else) I've occasionally seen the above
+            # creation of a worker thread return another arbitrary object!  Added this in here so the code
+            # will at least continue correctly and not do unexpected things!
+            self._bundle.log_error(
+                "Failed to create background worker thread for task Manager!"
+            )
+            return None
+        self._all_threads.append(thread)
+
+        # start the thread - this will just put it into wait mode:
+        thread.start()
+
+        # log some debug:
+        self._debug_log(
+            "Started new background worker thread (num threads=%d)"
+            % len(self._all_threads)
+        )
+
+        return thread
+
+    def _release_worker_thread(self, worker_thread):
+        """
+        Make a worker thread available again once it is done with a task.
+
+        :param worker_thread: The :class:`WorkerThread` to release.
+        """
+        if self._shared_pool:
+            self._shared_pool.release_thread(worker_thread)
+        else:
+            self._available_threads.append(worker_thread)
+
+    def _start_tasks(self):
+        """
+        Start any queued tasks that are startable if there are available threads to run them.
+        """
+        if self._scheduling_deferral_depth:
+            # tasks are started once the deferred_scheduling() block is exited.
+            return
+
+        # start tasks until we fail to start one for whatever reason:
+        started = True
+        while started:
+            started = self._start_next_task()
+
+    def _start_next_task(self):
+        """
+        Start the next task in the queue if there is a task that is startable and there is an
+        available thread or process to run it.
+
+        :returns:    True if a task was started, otherwise False
+        """
+        if not self._can_process_tasks:
+            return False
+
+        return self._start_next_thread_task() or self._start_next_process_task()
+
+    def _peek_ready_task(self, ready_heap):
+        """
+        Get the next task which can be started from the given ready queue.
+
+        Tasks which were removed since they were queued are dropped from the top
+        of the queue, and tasks from groups which are at their limit of running
+        tasks are held back until one of their tasks completes.
+
+        :param list ready_heap: One of the ready queues.
+        :returns: The :class:`BackgroundTask` at the top of the queue, or None.
+        """
+        while ready_heap:
+            task = ready_heap[0][-1]
+            if task.uid not in self._pending_tasks:
+                heapq.heappop(ready_heap)
+                self._num_stale_ready_entries -= 1
+            elif self._group_is_full(task.group):
+                heapq.heappush(
+                    self._parked_ready_entries.setdefault(task.group, []),
+                    heapq.heappop(ready_heap),
+                )
+                self._num_parked_ready_entries += 1
+            else:
+                return task
+        return None
+
+    def _pop_ready_task(self, ready_heap):
+        """
+        Remove the task at the top of the given ready queue, as returned by
+        :meth:`_peek_ready_task`, and mark it as started.
+
+        :param list ready_heap: One of the ready queues.
+        :returns: The :class:`BackgroundTask` to run.
+        """
+        priority, virtual_time, _, task = heapq.heappop(ready_heap)
+        if virtual_time > self._priority_virtual_times.get(priority, 0):
+            self._priority_virtual_times[priority] = virtual_time
+        del self._pending_tasks[task.uid]
+        del self._pending_upstream_counts[task.uid]
+        task.timings["started"] = time.perf_counter()
+        self._num_running_tasks_by_group[task.group] = (
+            self._num_running_tasks_by_group.get(task.group, 0) + 1
+        )
+        return task
+
+    def _group_is_full(self, group):
+        """
+        Check if a group is at its limit of running tasks.
+
+        :param group: A task group.
+        :returns: True if no more tasks of the group can be started, False otherwise.
+        """
+        max_concurrent_tasks = self._group_settings.get(group, (None, 1))[0]
+        return (
+            max_concurrent_tasks is not None
+            and self._num_running_tasks_by_group.get(group, 0) >= max_concurrent_tasks
+        )
+
+    def _unpark_ready_entries(self, group, all_entries=False):
+        """
+        Put tasks held back because their group was at its limit back in the
+        ready queues.
+
+        :param group: The task group.
+        :param bool all_entries: If False, only the next task which wasn't removed
+                                 is put back, otherwise all the tasks are.
+        """
+        parked_entries = self._parked_ready_entries.get(group)
+        while parked_entries:
+            entry = heapq.heappop(parked_entries)
+            self._num_parked_ready_entries -= 1
+            task = entry[-1]
+            if task.uid not in self._pending_tasks:
+                # removed since it was parked
+                self._num_stale_ready_entries -= 1
+                continue
+            if task.executor == self.PROCESS_EXECUTOR:
+                heapq.heappush(self._ready_process_heap, entry)
+            else:
+                heapq.heappush(self._ready_heap, entry)
+            if not all_entries:
+                break
+        if not parked_entries:
+            self._parked_ready_entries.pop(group, None)
+
+    def _start_next_thread_task(self):
+        """
+        Start the next task to run in a worker thread, if any.
+
+        :returns:    True if a task was started, otherwise False
+        """
+        # figure out next task to start from the ready queue:
+        if self._peek_ready_task(self._ready_heap) is None:
+            # nothing to do!
+            return False
+
+        num_running_threads = len(self._running_tasks) - len(
+            self._running_process_task_ids
+        )
+        if num_running_threads >= self.concurrency_limit:
+            # throttled, wait for a running task to complete.
+            return False
+
+        # we need a thread to do the work with:
+        thread = self._get_worker_thread()
+        if not thread:
+            # looks like we can't do anything!
+            return False
+
+        # ok, we have a thread so lets move the task from the ready queue to the running list:
+        task_to_process = self._pop_ready_task(self._ready_heap)
+        self._low_level_debug_log("Starting task %r" % task_to_process)
+        self._running_tasks[task_to_process.uid] = (task_to_process, thread)
+
+        self._low_level_debug_log(
+            " > Currently running tasks: '%s' - %d left in queue"
+            % (list(self._running_tasks.keys()), len(self._pending_tasks))
+        )
+
+        # and run the task
+        self._start_timeout_timer(task_to_process)
+        if self._shared_pool:
+            self._shared_pool.register_task(task_to_process, self)
+        thread.run_task(task_to_process)
+
+        return True
+
+    def _start_next_process_task(self):
+        """
+        Start the next task to run in a worker process, if any.
+
+        :returns:    True if a task was started, otherwise False
+        """
+        if self._peek_ready_task(self._ready_process_heap) is None:
+            return False
+
+        if len(self._running_process_task_ids) >= self._max_processes:
+            return False
+
+        task_to_process = self._pop_ready_task(self._ready_process_heap)
+        self._low_level_debug_log("Starting task %r in a process" % task_to_process)
+        # there is no worker thread associated with process tasks:
+        self._running_tasks[task_to_process.uid] = (task_to_process, None)
+        self._running_process_task_ids.add(task_to_process.uid)
+        self._start_timeout_timer(task_to_process)
+        if self._shared_pool:
+            self._shared_pool.register_task(task_to_process, self)
+
+        try:
+            future = self._submit_to_process_pool(task_to_process)
+        except Exception as e:
+            # report the failure like any other task failure, e.g. if the task
+            # can't be pickled.
+            self._results_dispatcher.emit_failure(
+                None, task_to_process, str(e), traceback.format_exc()
+            )
+            return True
+
+        results_dispatcher = self._results_dispatcher
+
+        def _on_done(future):
+            # called from a thread of the process pool, the dispatcher hands the
+            # result over to the thread of this task manager.
+            task_to_process.timings["run_finished"] = time.perf_counter()
+            try:
+                result = future.result()
+            except Exception as e:
+                results_dispatcher.emit_failure(
+                    None,
+                    task_to_process,
+                    str(e),
+                    "".join(traceback.format_exception(type(e), e, e.__traceback__)),
+                )
+            else:
+                results_dispatcher.emit_completed(None, task_to_process, result)
+
+        future.add_done_callback(_on_done)
+        return True
+
+    def _submit_to_process_pool(self, task):
+        """
+        Submit a task to the process pool, creating or re-creating the pool if needed.
+
+        :param task: The :class:`BackgroundTask` to run.
+        :returns: A :class:`concurrent.futures.Future` for the task result.
+        """
+        if self._process_pool is not None:
+            try:
+                return task.submit_to(self._process_pool)
+            except BrokenProcessPool:
+                # a worker process died abruptly, start a new pool.
+                self._debug_log("Process pool is broken, starting a new one.")
+                self._process_pool.shutdown(wait=False)
+
+        # Worker processes are spawned rather than forked, forking a process
+        # running Qt threads is not safe.
+        self._process_pool = ProcessPoolExecutor(
+            max_workers=self._max_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._debug_log(
+            "Started new process pool (max processes=%d)" % self._max_processes
+        )
+        return task.submit_to(self._process_pool)
+
+    def _on_worker_thread_task_completed(self, worker_thread, task, result):
+        """
+        Slot triggered when a task is completed by a worker thread.  This processes the result and emits the
+        task_completed signal if needed.
+
+        :param worker_thread: Thread that completed the task.
+        :param task:          The task that completed
+        :param result:        The task result
+        """
+        try:
+            # check that we should process this result:
+            if task.uid in self._running_tasks:
+
+                self._low_level_debug_log("Task %r - completed" % (task))
+                self._record_metrics(task)
+
+                # if we have dependent tasks then update them:
+                for ds_task_id in self._downstream_task_map.get(task.uid, []):
+                    ds_task = self._tasks_by_id.get(ds_task_id)
+                    if not ds_task:
+                        continue
+
+                    # update downstream task with result
+                    ds_task.append_upstream_result(result)
+
+                # remove the task:
+                group_finished = self._remove_task(task)
+
+                # emit signal that this task is completed:
+                self.task_completed.emit(task.uid, task.group, result)
+                self._futures.set_result(task.uid, result)
+
+                if group_finished:
+                    # also emit signal that the entire group is completed:
+                    self.task_group_finished.emit(task.group)
+        finally:
+            # move this task thread to the available threads list:
+            if worker_thread is not None:
+                self._release_worker_thread(worker_thread)
+
+        # start processing of the next task:
+        self._start_tasks()
+
+    def _on_worker_thread_task_failed(self, worker_thread, task, msg, tb):
+        """
+        Slot triggered when a task being executed in by a worker thread has failed for some reason.  This processes
+        the task and emits the task_failed signal if needed.
+
+        :param worker_thread: Thread that completed the task.
+        :param task:          The task that failed
+        :param msg:           The error message for the failed task
+        :param tb:            The stack-trace for the failed task
+        """
+        try:
+            # check that we should process this task:
+            if task.uid in self._running_tasks:
+                self._debug_log("Task %r - failed: %s\n%s" % (task, msg, tb))
+                self._record_metrics(task, failed=True)
+                self._fail_task(task, msg, tb)
+        finally:
+            # move this task thread to the available threads list:
+            if worker_thread is not None:
+                self._release_worker_thread(worker_thread)
+
+        # start processing of the next task:
+        self._start_tasks()
+
+    def _on_worker_thread_task_progress(self, worker_thread, task, partial):
+        """
+        Slot triggered when a generator task being executed by a worker thread yields a
+        partial result.  This emits the task_progress signal if the task is still running.
+
+        :param worker_thread: Thread running the task.
+        :param task:          The task reporting the partial result
+        :param partial:       The partial result yielded by the task
+        """
+        entry = self._running_tasks.get(task.uid)
+        if entry is None or entry[0] is not task:
+            # the task was stopped or timed out.
+            return
+        self.task_progress.emit(task.uid, task.group, partial)
+
+    def _start_timeout_timer(self, task):
+        """
+        Fail the given task if it is still running once its timeout expires, by
+        calling :meth:`_on_task_timeout` from the thread this task manager lives in.
+        Must be implemented by subclasses.
+
+        :param task: The task which was just started.
+        """
+        raise NotImplementedError
+
+    def _on_future_cancelled(self, task_id):
+        """
+        Called when the future of a task is cancelled by its user, possibly from
+        another thread. Must be implemented by subclasses to stop the task from the
+        thread this task manager lives in.
+
+        :param task_id: The id of the task.
+        """
+        raise NotImplementedError
+
+    def _on_task_timeout(self, task):
+        """
+        Called when the timeout of a task expires.
+
+        :param task: The task which timed out.
+        """
+        entry = self._running_tasks.get(task.uid)
+        if entry is None or entry[0] is not task:
+            # the task is done or was stopped.
+            return
+
+        self._debug_log("Task %r - timed out after %ss" % (task, task.timeout))
+        task.cancellation_token.cancel()
+        self._record_metrics(task, failed=True)
+        # the worker thread is only made available again once the task
+        # actually returns.
+        self._fail_task(task, "Task timed out.", "")
+        self._start_tasks()
+
+    def _record_metrics(self, task, failed=False):
+        """
+        Record the metrics of a task which is done, if metrics are enabled.
+
+        :param task: The task which completed or failed.
+        :param bool failed: Whether the task failed.
+        """
+        if self._metrics is None:
+            return
+        task_metrics = self._metrics.record(task, failed)
+        self.task_metrics_recorded.emit(task.uid, task.group, task_metrics)
+
+    def _fail_task(self, task, msg, tb):
+        """
+        Remove a failed task and emit the task_failed signal for it, as well as
+        for any task with an upstream dependency on it.
+
+        :param task:    The task that failed
+        :param msg:     The error message for the failed task
+        :param tb:      The stack-trace for the failed task
+        """
+        # we need to emit the failed message for this task as well as any that have
+        # upstream dependencies on this task!
+        failed_tasks = [task]
+        failed_task_ids = set([task.uid])
+        finished_groups = set()
+        while failed_tasks:
+            failed_task = failed_tasks.pop(0)
+
+            # find any downstream tasks:
+            for ds_task_id in self._downstream_task_map.get(failed_task.uid) or []:
+                ds_task = self._tasks_by_id.get(ds_task_id)
+                if not ds_task or ds_task.uid in failed_task_ids:
+                    # no task or already found
+                    continue
+                failed_tasks.append(ds_task)
+                failed_task_ids.add(ds_task.uid)
+
+            # remove the task:
+            group_finished = self._remove_task(failed_task)
+
+            # emit failed signal for the failed task:
+            self.task_failed.emit(failed_task.uid, failed_task.group, msg, tb)
+            self._futures.set_exception(failed_task.uid, TaskFailedError(msg, tb))
+
+            if group_finished and failed_task.group not in finished_groups:
+                self.task_group_finished.emit(failed_task.group)
+                finished_groups.add(failed_task.group)
+
+    def _remove_task(self, task):
+        """
+        Remove the specified task from the queue.
+
+        :param task:    The task to remove from the queue
+        """
+        group_completed = False
+
+        # fist remove from the running tasks - this will stop any signals being handled for this task
+        if task.uid in self._running_tasks:
+            del self._running_tasks[task.uid]
+            self._num_running_tasks_by_group[task.group] -= 1
+            if not self._num_running_tasks_by_group[task.group]:
+                del self._num_running_tasks_by_group[task.group]
+            # the group may have room for another task:
+            self._unpark_ready_entries(task.group)
+        self._running_process_task_ids.discard(task.uid)
+
+        # remove the task from the pending queue. If it was ready to run, its
+        # entry in the ready queue is discarded when it reaches the top:
+        if self._pending_tasks.pop(task.uid, None) is not None:
+            if self._pending_upstream_counts.pop(task.uid) == 0:
+                self._num_stale_ready_entries += 1
+                num_ready_entries = (
+                    len(self._ready_heap)
+                    + len(self._ready_process_heap)
+                    + self._num_parked_ready_entries
+                )
+                if self._num_stale_ready_entries > num_ready_entries // 2:
+                    self._compact_ready_heaps()
+
+        # downstream tasks don't need to wait for this task anymore:
+        if task.uid in self._tasks_by_id:
+            for ds_task_id in self._downstream_task_map.get(task.uid, []):
+                if ds_task_id not in self._pending_upstream_counts:
+                    continue
+                self._pending_upstream_counts[ds_task_id] -= 1
+                if self._pending_upstream_counts[ds_task_id] == 0:
+                    self._push_ready_task(self._pending_tasks[ds_task_id])
+
+        # remove this task from all other maps:
+        if (
+            task.group in self._group_task_map
+            and task.uid in self._group_task_map[task.group]
+        ):
+            self._group_task_map[task.group].remove(task.uid)
+            if not self._group_task_map[task.group]:
+                group_completed = True
+                del self._group_task_map[task.group]
+                self._group_virtual_times.pop(task.group, None)
+        if task.uid in self._tasks_by_id:
+            del self._tasks_by_id[task.uid]
+        if task.uid in self._upstream_task_map:
+            del self._upstream_task_map[task.uid]
+        if task.uid in self._downstream_task_map:
+            del self._downstream_task_map[task.uid]
+
+        return group_completed
+
+    def _push_ready_task(self, task):
+        """
+        Add a pending task, with no upstream tasks left to wait on, to its ready queue.
+
+        :param task: The :class:`BackgroundTask` to add.
+        """
+        # Tasks with a higher priority are run first, and tasks with the same
+        # priority in virtual time order, see __init__. If priority is None,
+        # then use 0 so we're only comparing numbers.
+        priority = -(task.priority or 0)
+        weight = self._group_settings.get(task.group, (None, 1))[1]
+        group_virtual_times = self._group_virtual_times.setdefault(task.group, {})
+        virtual_time = max(
+            group_virtual_times.get(priority, 0),
+            self._priority_virtual_times.get(priority, 0),
+        )
+        virtual_time += 1.0 / weight
+        group_virtual_times[priority] = virtual_time
+
+        if task.executor == self.PROCESS_EXECUTOR:
+            ready_heap = self._ready_process_heap
+        else:
+            ready_heap = self._ready_heap
+        heapq.heappush(ready_heap, (priority, virtual_time, task.uid, task))
+
+    def _compact_ready_heaps(self):
+        """
+        Rebuild the ready queues, including tasks held back by their group limit,
+        without the entries for tasks which were removed.
+        """
+        ready_heaps = [self._ready_heap, self._ready_process_heap]
+        ready_heaps.extend(self._parked_ready_entries.values())
+        for ready_heap in ready_heaps:
+            ready_heap[:] = [
+                entry for entry in ready_heap if entry[-1].uid in self._pending_tasks
+            ]
+            heapq.heapify(ready_heap)
+        self._num_parked_ready_entries = sum(
+            len(entries) for entries in self._parked_ready_entries.values()
+        )
+        self._num_stale_ready_entries = 0
+
+    def _task_pass_through(self, **kwargs):
+        """
+        Pass-through task callable.  Simply returns the input kwargs as the result
+
+        :param **kwargs:    The named arguments for the task
+        :returns:           A dictionary containing the named input arguments.
+        """
+        return kwargs
@@ -57,6 +57,18 @@ class WorkerThread(Thread):
             self._wait_condition.notify_all()
         self.join()
 
+    def _emit_progress(self, task, partial):
+        """
+        Report a partial result of the task being run.
+
+        :param task:    The task being run
+        :param partial: A value yielded by the task
+        """
+        with self._mutex:
+            if self._process_tasks:
+                # emit the partial result (non-blocking):
+                self._results_dispatcher.emit_progress(self, task, partial)
+
     def run(self):
         """
         The main thread run function.  Loops over tasks until asked to exit.
@@ -79,7 +91,9 @@ class WorkerThread(Thread):
 
                 # run the task:
                 try:
-                    result = task_to_process.run()
+                    result = task_to_process.run(
+                        lambda partial: self._emit_progress(task_to_process, partial)
+                    )
 
                     with self._mutex:
                         if not self._process_tasks:
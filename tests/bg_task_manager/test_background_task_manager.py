@@ -8,12 +8,28 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+import gc
+import os
+import json
+import asyncio
+import time
+import threading
+import unittest
+import weakref
+from unittest.mock import patch
+
 import sgtk
 
 from tank_test.tank_test_base import setUpModule  # noqa
 from base_test import TestShotgunUtilsFramework
 
 
+class _Payload(object):
+    """
+    Task argument which can be weakly referenced.
+    """
+
+
 class TestBackgroundTaskManager(TestShotgunUtilsFramework):
     """
     Test the background task manager.
@@ -63,6 +79,626 @@ class TestBackgroundTaskManager(TestShotgunUtilsFramework):
         # the list in order and we should have an empty one.
         assert self._expected_priorities == []
 
+    def test_adaptive_concurrency_limiter(self):
+        """
+        Ensure the concurrency limit increases additively on success and
+        decreases multiplicatively on congestion.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        limiter = task_manager.AdaptiveConcurrencyLimiter(
+            initial_limit=2,
+            max_limit=4,
+            latency_threshold=1.0,
+            decrease_interval=0,
+        )
+        assert limiter.limit == 2
+        # The limit grows by one after "limit" fast successes.
+        limiter.record_success(0.1)
+        assert limiter.limit == 2
+        limiter.record_success(0.1)
+        assert limiter.limit == 3
+        for _ in range(10):
+            limiter.record_success(0.1)
+        assert limiter.limit == 4
+        # Failures and slow calls halve it, without going under the minimum.
+        limiter.record_failure()
+        assert limiter.limit == 2
+        limiter.record_success(2.0)
+        assert limiter.limit == 1
+        limiter.record_failure()
+        assert limiter.limit == 1
+        assert limiter.get_stats() == {
+            "limit": 1,
+            "successes": 13,
+            "failures": 2,
+            "decreases": 3,
+        }
+
+        # Decreases are only counted once for a burst of failures.
+        limiter = task_manager.AdaptiveConcurrencyLimiter(
+            initial_limit=8, decrease_interval=60
+        )
+        limiter.record_failure()
+        limiter.record_failure()
+        assert limiter.limit == 4
+
+        # The task manager limit is capped by its number of threads.
+        manager = self.BackgroundTaskManager(
+            self._qapp, max_threads=2, concurrency_limiter=limiter
+        )
+        self.addCleanup(manager.shut_down)
+        assert manager.concurrency_limit == 2
+        manager = self.BackgroundTaskManager(self._qapp)
+        self.addCleanup(manager.shut_down)
+        assert manager.concurrency_limit == 8
+
+    def _create_manager_with_fake_thread(self):
+        """
+        Create a task manager which hands tasks to a fake worker thread so
+        scheduling can be tested without running them.
+
+        :returns: A tuple with the task manager and the list of started tasks.
+        """
+        started_tasks = []
+
+        class FakeWorkerThread(object):
+            def run_task(self, task):
+                started_tasks.append(task)
+
+        manager = self.BackgroundTaskManager(self._qapp, max_threads=1)
+        self.addCleanup(manager.shut_down)
+        thread = FakeWorkerThread()
+        patcher = patch.object(manager, "_get_worker_thread", return_value=thread)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return manager, thread, started_tasks
+
+    def test_upstream_dependencies(self):
+        """
+        Ensure tasks only become ready when their last upstream task is done.
+        """
+        manager, thread, started_tasks = self._create_manager_with_fake_thread()
+        failed = []
+        manager.task_failed.connect(lambda uid, *args: failed.append(uid))
+
+        first = manager.add_task(lambda: {}, priority=1)
+        second = manager.add_task(lambda: {}, priority=1)
+        downstream = manager.add_task(
+            lambda: {}, priority=10, upstream_task_ids=[first, second]
+        )
+        # Unknown or finished upstream tasks are not waited on.
+        other = manager.add_task(lambda: {}, upstream_task_ids=[1000])
+        cancelled = manager.add_task(lambda: {}, priority=5)
+        manager.stop_task(cancelled)
+        failing = manager.add_task(lambda: {}, priority=-1)
+        failing_downstream = manager.add_task(
+            lambda: {}, priority=20, upstream_task_ids=[failing]
+        )
+
+        manager.start_processing()
+        for expected in [first, second, downstream, other, failing]:
+            task = started_tasks[-1]
+            assert task.uid == expected
+            if task.uid == failing:
+                manager._on_worker_thread_task_failed(thread, task, "Failed", "")
+            else:
+                manager._on_worker_thread_task_completed(thread, task, {})
+        assert failed == [failing, failing_downstream]
+        assert len(started_tasks) == 5
+        assert manager._pending_tasks == {}
+        assert manager._tasks_by_id == {}
+
+    def test_deferred_scheduling(self):
+        """
+        Ensure tasks added in bulk, or while scheduling is deferred, are only
+        scheduled once all of them were added.
+        """
+        manager, thread, started_tasks = self._create_manager_with_fake_thread()
+        manager.start_processing()
+
+        with patch.object(
+            manager, "_start_next_task", wraps=manager._start_next_task
+        ) as patched:
+            task_ids = manager.add_tasks(
+                [{"cbl": lambda: {}, "priority": i} for i in range(100)]
+            )
+        assert task_ids == list(range(100))
+        # one call to start the task with the highest priority, and one which
+        # fails to start the next one.
+        assert patched.call_count == 2
+        assert [task.uid for task in started_tasks] == [99]
+
+        with manager.deferred_scheduling():
+            with manager.deferred_scheduling():
+                check = manager.add_task(lambda: {}, priority=200)
+            manager.add_task(lambda: {}, priority=300, upstream_task_ids=[check])
+            manager._on_worker_thread_task_completed(thread, started_tasks[-1], {})
+            # nothing is started until the outermost block is exited.
+            assert len(started_tasks) == 1
+        assert started_tasks[-1].uid == check
+
+    def test_batched_dispatch(self):
+        """
+        Ensure results are all dispatched in batched mode, within the time budget
+        of each event loop iteration.
+        """
+        manager = self.BackgroundTaskManager(
+            self._qapp, start_processing=True, max_threads=4, batched_dispatch=True
+        )
+        self.addCleanup(manager.shut_down)
+        dispatcher = manager._results_dispatcher
+        assert dispatcher.batched
+
+        results = []
+        manager.task_completed.connect(
+            lambda uid, group, result: results.append(result)
+        )
+        for i in range(100):
+            manager.add_task(lambda value=i: value)
+        before = time.time()
+        while len(results) < 100 and time.time() - before < 10:
+            sgtk.platform.qt.QtGui.QApplication.processEvents()
+        assert sorted(results) == list(range(100))
+
+        # With no time budget, a single event is processed per event loop iteration.
+        manager.task_completed.disconnect()
+        dispatched = []
+        dispatcher.task_completed.connect(
+            lambda thread, task, result: dispatched.append(result)
+        )
+        dispatcher._time_budget = 0
+        results_poller = self.framework.import_module("task_manager").results_poller
+        with dispatcher._batch_lock:
+            for i in range(3):
+                dispatcher._batch.append(
+                    results_poller._TaskCompletedEvent(None, None, i)
+                )
+            dispatcher._batch_invoke_scheduled = True
+        dispatcher._do_invoke_batch()
+        assert dispatched == [0]
+        assert dispatcher._batch_invoke_scheduled
+        before = time.time()
+        while dispatcher._batch_invoke_scheduled and time.time() - before < 10:
+            sgtk.platform.qt.QtGui.QApplication.processEvents()
+        assert dispatched == [0, 1, 2]
+
+    def test_group_scheduling(self):
+        """
+        Ensure groups with the same priority take turns, according to their weight
+        and within their limit of running tasks.
+        """
+        manager, thread, started_tasks = self._create_manager_with_fake_thread()
+        manager._max_threads = 3
+        with self.assertRaises(sgtk.TankError):
+            manager.configure_group("a", weight=0)
+        manager.configure_group("a", max_concurrent_tasks=1)
+        manager.configure_group("c", weight=2)
+        for group in ["a", "b", "c"]:
+            for _ in range(4):
+                manager.add_task(lambda: {}, group=group, priority=1)
+        # Higher priorities still come first.
+        manager.add_task(lambda: {}, group="b", priority=2)
+
+        manager.start_processing()
+        assert [(task.group, task.priority) for task in started_tasks] == [
+            ("b", 2),
+            ("c", 1),
+            ("a", 1),
+        ]
+        groups = []
+        while started_tasks:
+            task = started_tasks.pop(0)
+            groups.append(task.group)
+            manager._on_worker_thread_task_completed(thread, task, {})
+            # Only one task from group "a" runs at any time.
+            assert [task.group for task in started_tasks].count("a") <= 1
+        # Group "c" gets more turns than group "b", and group "a" is held back
+        # by its limit.
+        assert "".join(groups) == "bcabccabcabba"
+        assert manager._tasks_by_id == {}
+
+    def test_task_metrics(self):
+        """
+        Ensure task metrics are aggregated per group and can be exported as a
+        Chrome trace.
+        """
+        manager, thread, started_tasks = self._create_manager_with_fake_thread()
+        with self.assertRaises(sgtk.TankError):
+            manager.get_task_stats()
+        manager.enable_metrics()
+        recorded = []
+        manager.task_metrics_recorded.connect(
+            lambda uid, group, metrics: recorded.append((uid, group, metrics))
+        )
+
+        manager.add_task(lambda: {}, group="a")
+        manager.add_task(lambda: {}, group="a")
+        failing = manager.add_task(lambda: {}, group="b")
+        manager.start_processing()
+        while started_tasks:
+            task = started_tasks.pop(0)
+            # Simulate the task being run by the worker thread.
+            task.timings["run_started"] = task.timings["started"] + 0.5
+            task.timings["run_finished"] = task.timings["run_started"] + 1.0
+            task.timings["thread_id"] = 1
+            if task.uid == failing:
+                manager._on_worker_thread_task_failed(thread, task, "Failed", "")
+            else:
+                manager._on_worker_thread_task_completed(thread, task, {})
+
+        # Groups take turns.
+        assert [(uid, group) for uid, group, _ in recorded] == [
+            (0, "a"),
+            (2, "b"),
+            (1, "a"),
+        ]
+        assert abs(recorded[0][2]["run_time"] - 1.0) < 1e-6
+        stats = manager.get_task_stats()
+        assert stats["all"]["count"] == 3
+        assert stats["all"]["failed"] == 1
+        assert stats["groups"]["a"]["count"] == 2
+        assert stats["groups"]["a"]["failed"] == 0
+        assert abs(stats["groups"]["a"]["run_time"]["mean"] - 1.0) < 1e-6
+        assert stats["groups"]["b"]["queue_wait"]["max"] >= 0.5
+
+        trace_path = os.path.join(self.tank_temp, "task_trace.json")
+        manager.export_chrome_trace(trace_path)
+        with open(trace_path) as fh:
+            trace = json.load(fh)
+        run_events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        assert [e["args"]["uid"] for e in run_events] == [0, 2, 1]
+        assert [e["args"]["failed"] for e in run_events] == [False, True, False]
+        assert all(e["tid"] == 1 and e["dur"] == 1000000 for e in run_events)
+
+        # The timeline doesn't keep the tasks, and their arguments, alive.
+        payload = _Payload()
+        payload_ref = weakref.ref(payload)
+        manager.add_task(lambda payload: {}, task_kwargs={"payload": payload})
+        del payload
+        task = started_tasks.pop(0)
+        manager._on_worker_thread_task_completed(thread, task, {})
+        del task
+        gc.collect()
+        assert payload_ref() is None
+        assert len(manager.metrics.get_trace_events()) > len(trace["traceEvents"])
+
+    def test_task_futures(self):
+        """
+        Ensure futures are resolved with task results and errors, and are cancelled
+        with their task.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        manager, thread, started_tasks = self._create_manager_with_fake_thread()
+        first = manager.add_task(lambda: {})
+        downstream = manager.add_task(lambda: {}, upstream_task_ids=[first])
+        stopped = manager.add_task(lambda: {})
+        cancelled = manager.add_task(lambda: {})
+        first_future = manager.get_future(first)
+        assert manager.get_future(first) is first_future
+        downstream_future = manager.get_future(downstream)
+        stopped_future = manager.get_future(stopped)
+        with self.assertRaises(sgtk.TankError):
+            manager.get_future(1000)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        async_future = manager.get_async_future(first, loop)
+
+        # Stopping a task cancels its future, and the other way around.
+        manager.stop_task(stopped, stop_upstream=False)
+        assert stopped_future.cancelled()
+        assert manager.get_future(cancelled).cancel()
+        assert cancelled not in manager._tasks_by_id
+
+        manager.start_processing()
+        task = started_tasks.pop()
+        assert task.uid == first
+        manager._on_worker_thread_task_completed(thread, task, {"value": 1})
+        assert first_future.result() == {"value": 1}
+        assert loop.run_until_complete(async_future) == {"value": 1}
+
+        task = started_tasks.pop()
+        assert task.uid == downstream
+        manager._on_worker_thread_task_failed(thread, task, "Failed", "Traceback")
+        error = downstream_future.exception()
+        assert isinstance(error, task_manager.TaskFailedError)
+        assert str(error) == "Failed"
+        assert error.traceback == "Traceback"
+        assert manager._futures._futures == {}
+
+    def test_headless_task_manager(self):
+        """
+        Ensure the headless task manager runs tasks and hands their results back
+        when events are processed.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        manager = task_manager.HeadlessTaskManager(start_processing=True, max_threads=2)
+        self.addCleanup(manager.shut_down)
+        results = []
+        manager.task_completed.connect(
+            lambda uid, group, result: results.append(result)
+        )
+        for i in range(10):
+            manager.add_task(lambda value=i: value)
+        failing_future = manager.get_future(manager.add_task(lambda: 1 / 0))
+        assert manager.wait_for_tasks(timeout=10)
+        assert sorted(results) == list(range(10))
+        assert isinstance(failing_future.exception(), task_manager.TaskFailedError)
+
+        # Tasks can be stopped by cancelling their future from another thread.
+        def _wait_until_cancelled():
+            task_manager.CancellationToken.current().wait(10)
+
+        task_id = manager.add_task(_wait_until_cancelled)
+        future = manager.get_future(task_id)
+        threading.Thread(target=future.cancel).start()
+        assert manager.wait_for_tasks([task_id], timeout=10)
+        assert future.cancelled()
+
+    def test_generator_tasks(self):
+        """
+        Ensure values yielded by generator tasks are emitted as progress before
+        the value they return is emitted as their result.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        manager = task_manager.HeadlessTaskManager(start_processing=True)
+        self.addCleanup(manager.shut_down)
+        events = []
+        manager.task_progress.connect(
+            lambda uid, group, partial: events.append(("progress", partial))
+        )
+        manager.task_completed.connect(
+            lambda uid, group, result: events.append(("completed", result))
+        )
+
+        def _count(num):
+            for i in range(num):
+                yield i
+            return num
+
+        future = manager.get_future(manager.add_task(_count, task_args=[3]))
+        assert manager.wait_for_tasks(timeout=10)
+        assert events == [
+            ("progress", 0),
+            ("progress", 1),
+            ("progress", 2),
+            ("completed", 3),
+        ]
+        assert future.result() == 3
+
+        # Generator tasks stop between two yields once cancelled.
+        def _count_forever():
+            i = 0
+            while True:
+                yield i
+                i += 1
+
+        task_id = manager.add_task(_count_forever)
+        manager.process_events(timeout=10)
+        manager.stop_task(task_id)
+        assert manager.wait_for_tasks(timeout=10)
+        num_events = len(events)
+        manager.process_events(timeout=0.1)
+        assert len(events) == num_events
+
+        # Generators can't be sent to worker processes.
+        with self.assertRaises(sgtk.TankError):
+            manager.add_task(_count, task_args=[3], executor="process")
+
+    def test_process_executor(self):
+        """
+        Ensure tasks can be run in worker processes and chained with tasks run
+        in threads.
+        """
+        manager = self.BackgroundTaskManager(
+            self._qapp, start_processing=True, max_processes=2
+        )
+        self.addCleanup(manager.shut_down)
+        with self.assertRaises(sgtk.TankError):
+            manager.add_task(sum, executor="gpu")
+
+        results = {}
+        failures = {}
+        manager.task_completed.connect(
+            lambda uid, group, result: results.__setitem__(uid, result)
+        )
+        manager.task_failed.connect(
+            lambda uid, group, msg, tb: failures.__setitem__(uid, msg)
+        )
+        # Use builtins, which can be pickled and run in a fresh interpreter.
+        sum_task = manager.add_task(sum, task_args=[[1, 2, 3]], executor="process")
+        dict_task = manager.add_task(dict, task_kwargs={"value": 3}, executor="process")
+        ds_task = manager.add_task(
+            lambda value: value * 2, upstream_task_ids=[dict_task]
+        )
+        failed_task = manager.add_task(int, task_args=["foo"], executor="process")
+        ds_failed_task = manager.add_task(lambda: None, upstream_task_ids=[failed_task])
+        # Callables which can't be pickled are reported as failures.
+        unpicklable_task = manager.add_task(lambda: None, executor="process")
+
+        before = time.time()
+        while len(results) + len(failures) < 6 and time.time() - before < 60:
+            sgtk.platform.qt.QtGui.QApplication.processEvents()
+        assert results == {sum_task: 6, dict_task: {"value": 3}, ds_task: 6}
+        assert sorted(failures) == sorted(
+            [failed_task, ds_failed_task, unpicklable_task]
+        )
+        assert "invalid literal" in failures[failed_task]
+        assert manager._running_process_task_ids == set()
+
+    def test_cancellation_token(self):
+        """
+        Ensure cancellation tokens can be cancelled or time out.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        assert task_manager.CancellationToken.current() is None
+
+        token = task_manager.CancellationToken()
+        assert not token.is_cancelled
+        assert token.remaining is None
+        assert not token.wait(0.01)
+        token.raise_if_cancelled()
+        token.cancel()
+        assert token.is_cancelled
+        assert not token.timed_out
+        assert token.wait()
+        with self.assertRaisesRegex(task_manager.TaskCancelledError, "cancelled"):
+            token.raise_if_cancelled()
+
+        token = task_manager.CancellationToken(timeout=0.05)
+        assert not token.is_cancelled
+        # Waiting stops when the token times out.
+        assert token.wait(10)
+        assert token.timed_out
+        with self.assertRaisesRegex(task_manager.TaskCancelledError, "timed out"):
+            token.raise_if_cancelled()
+
+    def test_task_cancellation(self):
+        """
+        Ensure running tasks are cancelled when stopped or when they time out.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        manager = self.BackgroundTaskManager(
+            self._qapp, start_processing=True, max_threads=1
+        )
+        self.addCleanup(manager.shut_down)
+        failures = {}
+        manager.task_failed.connect(
+            lambda uid, group, msg, tb: failures.__setitem__(uid, msg)
+        )
+
+        def _wait_for_cancellation():
+            token = task_manager.CancellationToken.current()
+            token.wait(30)
+            token.raise_if_cancelled()
+
+        def _process_events_until(condition):
+            before = time.time()
+            while not condition() and time.time() - before < 10:
+                sgtk.platform.qt.QtGui.QApplication.processEvents()
+            assert condition()
+
+        timed_out_task = manager.add_task(_wait_for_cancellation, timeout=0.1)
+        _process_events_until(lambda: timed_out_task in failures)
+        assert failures[timed_out_task] == "Task timed out."
+        # The worker thread is released once the task returns.
+        _process_events_until(lambda: len(manager._available_threads) == 1)
+
+        stopped_task = manager.add_task(_wait_for_cancellation)
+        _process_events_until(lambda: stopped_task in manager._running_tasks)
+        task = manager._running_tasks[stopped_task][0]
+        manager.stop_task(stopped_task)
+        assert task.cancellation_token.is_cancelled
+        _process_events_until(lambda: len(manager._available_threads) == 1)
+        # Failures of stopped tasks are not reported.
+        assert stopped_task not in failures
+
+    def test_shared_pool(self):
+        """
+        Ensure task managers can share a pool of threads fairly.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        pool = task_manager.SharedWorkerPool(max_threads=2, idle_timeout=0)
+        self.addCleanup(pool.shut_down)
+
+        class FakeManager(object):
+            def __init__(self):
+                self.threads = []
+
+            def _start_tasks(self):
+                thread = pool.acquire_thread(self)
+                if thread:
+                    self.threads.append(thread)
+
+        manager_a = FakeManager()
+        manager_b = FakeManager()
+        manager_a._start_tasks()
+        manager_a._start_tasks()
+        assert len(manager_a.threads) == 2
+        # No thread left, managers wait for one.
+        manager_b._start_tasks()
+        manager_a._start_tasks()
+        assert manager_b.threads == []
+        assert pool._waiting_managers == [manager_b, manager_a]
+        # The released thread goes to the manager which doesn't have any.
+        pool.release_thread(manager_a.threads.pop())
+        assert len(manager_a.threads) == 1
+        assert len(manager_b.threads) == 1
+        assert pool._waiting_managers == [manager_a]
+        # Still no thread available.
+        assert pool.acquire_thread(manager_a) is None
+        pool.unregister_manager(manager_a)
+        for manager in [manager_a, manager_b]:
+            pool.release_thread(manager.threads.pop())
+        assert pool.num_threads == 2
+        # Idle threads are shut down.
+        pool._reap_idle_threads()
+        assert pool.num_threads == 0
+
+        # Run tasks from several managers with the pool threads.
+        results = []
+        managers = []
+        for _ in range(3):
+            manager = self.BackgroundTaskManager(
+                self._qapp, start_processing=True, shared_pool=pool
+            )
+            self.addCleanup(manager.shut_down)
+            manager.task_completed.connect(
+                lambda uid, group, result: results.append(result)
+            )
+            managers.append(manager)
+        for i in range(30):
+            managers[i % 3].add_task(lambda value=i: value)
+        before = time.time()
+        while len(results) < 30 and time.time() - before < 10:
+            sgtk.platform.qt.QtGui.QApplication.processEvents()
+        assert sorted(results) == list(range(30))
+        assert pool.num_threads <= 2
+        assert managers[0]._all_threads == []
+
+        # Managers use the global pool once enabled.
+        assert task_manager.SharedWorkerPool.global_pool() is None
+        global_pool = task_manager.SharedWorkerPool.enable_global_pool()
+        self.addCleanup(task_manager.SharedWorkerPool.disable_global_pool)
+        manager = self.BackgroundTaskManager(self._qapp)
+        self.addCleanup(manager.shut_down)
+        assert manager._shared_pool is global_pool
+        manager = self.BackgroundTaskManager(self._qapp, shared_pool=False)
+        self.addCleanup(manager.shut_down)
+        assert manager._shared_pool is None
+
+    @unittest.skipUnless(
+        os.environ.get("SHOTGUNUTILS_RUN_BENCHMARKS"),
+        "Set SHOTGUNUTILS_RUN_BENCHMARKS to run benchmarks.",
+    )
+    def test_scheduling_benchmark(self):
+        """
+        Benchmark the cost of scheduling a task with many tasks queued. The
+        cost per task should stay roughly flat as the queue grows.
+        """
+        costs = {}
+        for num_tasks in [100, 1000, 10000, 100000]:
+            manager, thread, started_tasks = self._create_manager_with_fake_thread()
+            before = time.perf_counter()
+            for i in range(num_tasks):
+                # chain every other task to the previous one, like thumbnail
+                # check and download tasks.
+                manager.add_task(
+                    lambda: {},
+                    priority=i % 3,
+                    upstream_task_ids=[i - 1] if i % 2 else None,
+                )
+            manager.start_processing()
+            while started_tasks:
+                manager._on_worker_thread_task_completed(
+                    thread, started_tasks.pop(), {}
+                )
+            costs[num_tasks] = (time.perf_counter() - before) / num_tasks
+            print(
+                "%d tasks: %.2f us per task" % (num_tasks, costs[num_tasks] * 1000000)
+            )
+            assert manager._tasks_by_id == {}
+        assert costs[100000] < costs[1000] * 5
+
     def _stop_background_task_manager_task(self):
         """
         Shuts down the background task manager
@@ -8,7 +8,11 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
-from . import ExternalConfigBase
+import os
+
+from unittest.mock import Mock
+
+from . import ExternalConfigBase, _MockedSignal
 from tank_test.tank_test_base import setUpModule  # noqa
 
 
@@ -66,3 +70,88 @@ class TestConfigurationState(ExternalConfigBase):
         self.assertNotEqual(foo.get_hash(), None)
         self.assertNotEqual(bar.get_hash(), None)
         self.assertNotEqual(foo.get_hash(), bar.get_hash())
+
+    def test_config_state_summary_refresh(self):
+        """
+        Make sure records are only queried again when their summary changes.
+        """
+        model = self.external_config.configuration_state.ConfigStateModel(
+            "Software", [], self.bg_task_manager, None
+        )
+        model._load_data = Mock()
+        model._refresh_data = Mock()
+        model._sg_data_retriever.execute_method = Mock(return_value="summary")
+        model.data_refreshed = _MockedSignal()
+
+        def refresh(summary):
+            model.load_and_refresh()
+            model._on_summary_completed("summary", "method", {"return_value": summary})
+
+        refresh({"id": 2, "updated_at": "2026-01-01"})
+        self.assertEqual(model._refresh_data.call_count, 1)
+
+        # unchanged records are not queried again.
+        refresh({"id": 2, "updated_at": "2026-01-01"})
+        self.assertEqual(model._refresh_data.call_count, 1)
+        model.data_refreshed.emit.assert_called_once_with(False)
+
+        refresh({"id": 3, "updated_at": "2026-01-01"})
+        self.assertEqual(model._refresh_data.call_count, 2)
+        refresh({"id": 3, "updated_at": "2026-01-02"})
+        self.assertEqual(model._refresh_data.call_count, 3)
+
+        # records which could not be queried are queried again.
+        model._on_refresh_failed("error")
+        refresh({"id": 3, "updated_at": "2026-01-02"})
+        self.assertEqual(model._refresh_data.call_count, 4)
+
+        # records are queried if they can't be summarized.
+        model.load_and_refresh()
+        model._on_summary_failed("summary", "error")
+        self.assertEqual(model._refresh_data.call_count, 5)
+
+        # results of other requests are ignored.
+        model._on_summary_completed("other", "method", {"return_value": {}})
+        self.assertEqual(model._refresh_data.call_count, 5)
+        model.destroy()
+
+    def test_config_state_saved_summary(self):
+        """
+        Make sure records cached on disk are not queried again by a new model if
+        their summary didn't change.
+        """
+        ConfigStateModel = self.external_config.configuration_state.ConfigStateModel
+        summary = {"id": 1, "updated_at": "2026-01-01"}
+
+        def create_model():
+            model = ConfigStateModel("Software", [], self.bg_task_manager, None)
+            self.addCleanup(model.destroy)
+            model._refresh_data = Mock()
+            model._sg_data_retriever.execute_method = Mock(return_value="summary")
+            model.data_refreshed = _MockedSignal()
+            model.load_and_refresh()
+            model._on_summary_completed("summary", "method", {"return_value": summary})
+            return model
+
+        def cache_records(model, records):
+            model._data_handler.update_data(records)
+            model._data_handler.save_cache()
+
+        model = create_model()
+        self.assertEqual(model._refresh_data.call_count, 1)
+        # the summary is saved once the records are queried.
+        cache_records(model, [{"type": "Software", "id": 1, "updated_at": "a"}])
+        model._data_handler.generate_child_nodes(
+            None, model.invisibleRootItem(), model._create_item
+        )
+        model._on_data_refreshed(True)
+        self.assertTrue(os.path.exists(model._get_summary_path()))
+
+        model = create_model()
+        model._refresh_data.assert_not_called()
+        model.data_refreshed.emit.assert_called_once_with(False)
+
+        # the summary is ignored if the cached records were saved without it.
+        cache_records(model, [{"type": "Software", "id": 2, "updated_at": "a"}])
+        model = create_model()
+        self.assertEqual(model._refresh_data.call_count, 1)
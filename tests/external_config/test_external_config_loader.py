@@ -11,6 +11,8 @@
 import os
 import sys
 
+from unittest.mock import Mock
+
 from sgtk.bootstrap import ToolkitManager
 from . import ExternalConfigBase, _MockedSignal
 from tank_test.tank_test_base import setUpModule  # noqa
@@ -125,6 +127,40 @@ class TestExternalConfigLoader(ExternalConfigBase):
         self.assertEqual(len(ec._task_ids.items()), 1)  # No duplicate of task ids
         self.bg_task_manager.add_task.assert_called_once()
 
+    def test_prefetch_commands(self):
+        """
+        Make sure the commands loaded for an entity type are prefetched by the
+        other configurations of the project.
+        """
+        ec = self.external_config_loader
+        project_id = self._project["id"]
+        configs = [Mock(), Mock()]
+        ec._set_project_configurations(project_id, configs)
+        for config in configs:
+            config.commands_loaded.connect.assert_called_once_with(
+                ec._on_commands_loaded
+            )
+
+        ec._on_commands_loaded(project_id, "Shot", 1, None, configs[0], [])
+        configs[0].prefetch_commands.assert_not_called()
+        configs[1].prefetch_commands.assert_called_once_with(project_id, ["Shot"], None)
+
+        # Entity types previously loaded are prefetched too, only once.
+        configs[1].prefetch_commands.reset_mock()
+        ec._on_commands_loaded(project_id, "Asset", 2, None, configs[1], [])
+        configs[0].prefetch_commands.assert_called_once_with(
+            project_id, ["Asset"], None
+        )
+        configs[1].prefetch_commands.assert_not_called()
+        ec._on_commands_loaded(project_id, "Shot", 3, None, configs[0], [])
+        configs[0].prefetch_commands.assert_called_once()
+        configs[1].prefetch_commands.assert_not_called()
+
+        # Commands loaded by configurations which were replaced are ignored.
+        ec._set_project_configurations(project_id, [configs[1]])
+        ec._on_commands_loaded(project_id, "Task", 4, None, configs[0], [])
+        configs[1].prefetch_commands.assert_not_called()
+
 
 class TestExternalConfigScript(ExternalConfigBase):
     def test_external_runner_import(self):
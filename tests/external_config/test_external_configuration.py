@@ -0,0 +1,155 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import itertools
+from unittest.mock import Mock
+
+from sgtk.bootstrap import ToolkitManager
+from . import ExternalConfigBase, _MockedSignal
+from tank_test.tank_test_base import setUpModule  # noqa
+
+
+class TestExternalConfiguration(ExternalConfigBase):
+    """
+    Tests for external configurations.
+    """
+
+    def setUp(self):
+        """
+        Initial setup.
+        """
+        super().setUp()
+
+        ec = self.external_config_loader
+        ec.configurations_loaded = _MockedSignal()
+        result = ec._execute_get_configurations(
+            self._project["id"],
+            "123",
+            toolkit_manager=ToolkitManager(self._mocked_sg_user),
+        )
+        ec._task_ids["1234"] = "test"
+        ec._task_completed("1234", "test", result)
+        _, configs = ec.configurations_loaded.emit.call_args[0]
+        self.config = configs[0]
+
+        # cache commands without launching external processes.
+        self.cached_entity_types = []
+        self.priorities = []
+        self.config._run_external_process = Mock(side_effect=self._cache_commands)
+        self.bg_task_manager.add_task.reset_mock()
+
+    def tearDown(self):
+        """
+        Cleanup
+        """
+        self.config = None
+        super().tearDown()
+
+    def _cache_commands(
+        self, cache_requests, engine_name, pre_cache=False, priority=None
+    ):
+        """
+        Write an empty list of commands for each requested entity.
+        """
+        self.priorities.append(priority)
+        self.cached_entity_types.append(
+            [cache_request["entity_type"] for cache_request in cache_requests]
+        )
+        for cache_request in cache_requests:
+            self.external_config.file_cache.write_cache_file(
+                cache_request["cache_path"],
+                {
+                    "generation": self.external_config.external_command_utils.FORMAT_GENERATION,
+                    "commands": [],
+                },
+            )
+
+    def _run_tasks(self):
+        """
+        Run the tasks added to the mocked background task manager, the ones
+        with the highest priority first.
+
+        :returns: The results of the tasks.
+        """
+        results = []
+        calls = sorted(
+            self.bg_task_manager.add_task.call_args_list,
+            key=lambda call: -(call[1].get("priority") or 0),
+        )
+        for call in calls:
+            results.append(call[0][0](**call[1]["task_kwargs"]))
+        self.bg_task_manager.add_task.reset_mock()
+        return results
+
+    def test_batched_requests(self):
+        """
+        Make sure the commands of queued requests are cached by a single external
+        process, unless they are for another project or fallback engine.
+        """
+        project_id = self._project["id"]
+        other_project = self.mockgun.create("Project", {"name": "other_project"})
+
+        self.config.request_commands(project_id, "Shot", 1, None)
+        self.config.request_commands(project_id, "Asset", 2, None)
+        self.config.request_commands(project_id, "Task", 3, "Shot")
+        self.config.request_commands(project_id, "Shot", 4, None)
+        self.config.request_commands(other_project["id"], "Version", 5, None)
+        self.config.request_commands(project_id, "Note", 6, None, "tk-fallback")
+
+        results = self._run_tasks()
+        self.assertEqual(
+            self.cached_entity_types,
+            [["Shot", "Asset", "Task"], ["Version"], ["Note"]],
+        )
+        self.assertEqual(len(results), 6)
+        for result in results:
+            self.assertEqual(result["commands"], [])
+        self.assertEqual(self.config._queued_requests, {})
+        self.assertEqual(self.config._batched_requests, {})
+
+        # cached commands are not cached again.
+        self.cached_entity_types = []
+        self.config.request_commands(project_id, "Shot", 1, None)
+        self.config.request_commands(project_id, "PublishedFile", 7, None)
+        self.config.request_commands(project_id, "Asset", 2, None)
+        self._run_tasks()
+        self.assertEqual(self.cached_entity_types, [["PublishedFile"]])
+
+    def test_prefetch(self):
+        """
+        Make sure prefetched commands are cached after the requested ones,
+        without emitting signals.
+        """
+        project_id = self._project["id"]
+        project = {"type": "Project", "id": project_id}
+        self.mockgun.create("Shot", {"code": "shot", "project": project})
+        self.mockgun.create("Asset", {"code": "asset", "project": project})
+        self.bg_task_manager.add_task.side_effect = itertools.count()
+        self.config.commands_loaded = _MockedSignal()
+
+        self.config.prefetch_commands(project_id, ["Shot", "Asset"])
+        # entity types which are being prefetched are skipped.
+        self.config.prefetch_commands(project_id, ["Shot"])
+        self.config.request_commands(project_id, "Task", 3, None, priority=1)
+        calls = self.bg_task_manager.add_task.call_args_list
+        self.assertEqual(
+            [call[1]["priority"] for call in calls],
+            [self.config.PREFETCH_PRIORITY, self.config.PREFETCH_PRIORITY, 1],
+        )
+
+        # the requested commands are not cached along with the prefetched ones.
+        results = self._run_tasks()
+        self.assertEqual(self.cached_entity_types, [["Task"], ["Shot", "Asset"]])
+        self.assertEqual(self.priorities, [1, self.config.PREFETCH_PRIORITY])
+
+        for task_id, result in zip([2, 0, 1], results):
+            self.config._task_completed(task_id, self.config.TASK_GROUP, result)
+        self.assertEqual(self.config.commands_loaded.emit.call_count, 1)
+        self.assertEqual(self.config._prefetch_task_ids, {})
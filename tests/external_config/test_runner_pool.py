@@ -0,0 +1,228 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import sys
+import threading
+
+from sgtk.util.process import SubprocessCalledProcessError
+from . import ExternalConfigBase
+from tank_test.tank_test_base import setUpModule  # noqa
+
+
+class TestExternalRunnerPool(ExternalConfigBase):
+    """
+    Tests for the pool of long-lived external runners.
+    """
+
+    def setUp(self):
+        """
+        Initial setup.
+        """
+        super().setUp()
+        self.runner_pool = self.external_config.runner_pool
+        self.task_manager = self.framework.import_module("task_manager")
+        self._pool = self.runner_pool.ExternalRunnerPool(max_processes=4)
+        self.addCleanup(self._pool.shut_down)
+
+        self._args = [
+            sys.executable,
+            os.path.join(self.fixtures_root, "modules", "echo_runner.py"),
+        ]
+        self._parameters = {
+            "runner_connection": os.path.join(
+                self.framework_root, "python", "external_config", "runner_connection.py"
+            )
+        }
+
+    def _execute(self, key, request, token=None, pool=None):
+        """
+        Send a request to the echo runner for the given key.
+
+        :returns: The process id of the runner and the value of the request.
+        """
+        output = (pool or self._pool).execute(
+            key, self._args, self._parameters, request, token
+        )
+        pid, value = output.split()
+        return int(pid), value
+
+    def test_reuse(self):
+        """
+        Make sure requests with the same key are served by the same runner.
+        """
+        pid, value = self._execute("a", {"value": "first"})
+        self.assertEqual(value, "first")
+        self.assertNotEqual(pid, os.getpid())
+        self.assertEqual(self._execute("a", {"value": "second"}), (pid, "second"))
+
+        other_pid, _ = self._execute("b", {"value": "other"})
+        self.assertNotEqual(other_pid, pid)
+        self.assertEqual(self._execute("a", {"value": "third"}), (pid, "third"))
+
+    def test_failures(self):
+        """
+        Make sure failed requests are reported like failed processes, or as
+        runner errors once the runner was used, and discard the runner.
+        """
+        with self.assertRaises(SubprocessCalledProcessError) as cm:
+            self._execute("a", {"returncode": 2})
+        self.assertEqual(cm.exception.returncode, 2)
+
+        pid, _ = self._execute("a", {"value": "first"})
+        with self.assertRaises(self.runner_pool.ExternalRunnerError):
+            self._execute("a", {"returncode": 1})
+        new_pid, _ = self._execute("a", {"value": "second"})
+        self.assertNotEqual(new_pid, pid)
+
+        # runners which can't be started are reported as runner errors.
+        self._args = [sys.executable, "-c", "pass"]
+        with self.assertRaises(self.runner_pool.ExternalRunnerError):
+            self._execute("b", {"value": "first"})
+
+    def test_idle_timeout(self):
+        """
+        Make sure idle runners are shut down.
+        """
+        pool = self.runner_pool.ExternalRunnerPool(idle_timeout=0)
+        self.addCleanup(pool.shut_down)
+
+        pid, _ = self._execute("a", {"value": "first"}, pool=pool)
+        runner = pool._runners["a"]
+        new_pid, _ = self._execute("a", {"value": "second"}, pool=pool)
+        self.assertNotEqual(new_pid, pid)
+        self.assertTrue(runner.is_closed)
+        self.assertTrue(runner.has_exited)
+
+    def test_cancel(self):
+        """
+        Make sure cancelling a request kills its runner.
+        """
+        self._execute("a", {"value": "first"})
+        runner = self._pool._runners["a"]
+
+        token = self.task_manager.CancellationToken(timeout=0.5)
+        with self.assertRaises(self.task_manager.TaskCancelledError):
+            self._execute("a", {"value": "second", "sleep": 30}, token)
+        self.assertTrue(runner.has_exited)
+        self.assertNotIn("a", self._pool._runners)
+
+    def test_shut_down(self):
+        """
+        Make sure shutting down the pool shuts down its runners.
+        """
+        self._execute("a", {"value": "first"})
+        self._execute("b", {"value": "first"})
+        runners = list(self._pool._runners.values())
+
+        self._pool.shut_down()
+        self.assertEqual(self._pool._runners, {})
+        for runner in runners:
+            self.assertTrue(runner.has_exited)
+
+    def test_shared_pool_users(self):
+        """
+        Make sure the runners of the shared pool are only shut down once all its
+        users released it.
+        """
+        ExternalRunnerPool = self.runner_pool.ExternalRunnerPool
+        pool = ExternalRunnerPool.acquire()
+        self.assertIs(ExternalRunnerPool.acquire(), pool)
+        self.addCleanup(pool.shut_down)
+
+        self._execute("a", {"value": "first"}, pool=pool)
+        runner = pool._runners["a"]
+        ExternalRunnerPool.release()
+        self.assertFalse(runner.is_closed)
+        self.assertEqual(
+            self._execute("a", {"value": "second"}, pool=pool)[1], "second"
+        )
+
+        ExternalRunnerPool.release()
+        self.assertTrue(runner.has_exited)
+        self.assertEqual(pool._runners, {})
+        # releasing a pool without users doesn't do anything.
+        ExternalRunnerPool.release()
+        self.assertIs(ExternalRunnerPool.get_instance(), pool)
+
+    def test_process_slots(self):
+        """
+        Make sure processes are bounded and handed out by priority, leaving one
+        for the processes which don't have a negative priority.
+        """
+        pool = self.runner_pool.ExternalRunnerPool(max_processes=2)
+        self.addCleanup(pool.shut_down)
+        self.assertEqual(pool.max_processes, 2)
+        self.assertGreaterEqual(self.runner_pool.ExternalRunnerPool().max_processes, 1)
+
+        started = []
+
+        def run(name, priority, release):
+            with pool.process_slot(priority):
+                started.append(name)
+                release.wait()
+
+        def start(name, priority, release):
+            thread = threading.Thread(target=run, args=(name, priority, release))
+            thread.start()
+            self.addCleanup(thread.join)
+            return thread
+
+        first = threading.Event()
+        start("first", 0, first)
+        # a single process is left, which is only used by non negative priorities.
+        background = threading.Event()
+        background_thread = start("background", -1, background)
+        background_thread.join(1)
+        self.assertEqual(started, ["first"])
+
+        second = threading.Event()
+        start("second", 0, second)
+        third = threading.Event()
+        third_thread = start("third", 0, third)
+        high = threading.Event()
+        start("high", 5, high)
+        third_thread.join(1)
+        self.assertEqual(started, ["first", "second"])
+
+        # the request with the highest priority runs first.
+        first.set()
+        third_thread.join(1)
+        self.assertEqual(started, ["first", "second", "high"])
+        second.set()
+        third_thread.join(1)
+        self.assertEqual(started, ["first", "second", "high", "third"])
+        high.set()
+        third.set()
+        background_thread.join(1)
+        self.assertEqual(started[-1], "background")
+        background.set()
+        background_thread.join()
+
+        token = self.task_manager.CancellationToken(timeout=0.5)
+        with pool.process_slot():
+            with pool.process_slot():
+                with self.assertRaises(self.task_manager.TaskCancelledError):
+                    with pool.process_slot(token=token):
+                        pass
+
+    def test_shut_down_idle_runners(self):
+        """
+        Make sure idle runners are shut down to start new ones when the maximum
+        number of processes is reached.
+        """
+        pool = self.runner_pool.ExternalRunnerPool(max_processes=1)
+        self.addCleanup(pool.shut_down)
+
+        self._execute("a", {"value": "first"}, pool=pool)
+        runner = pool._runners["a"]
+        self._execute("b", {"value": "first"}, pool=pool)
+        self.assertEqual(list(pool._runners), ["b"])
+        self.assertTrue(runner.is_closed)
@@ -0,0 +1,47 @@
+# Copyright (c) 2026 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+External runner serving requests like external_runner.py, which replies to
+each request with its process id and the request's value.
+"""
+
+import os
+import sys
+import time
+import pickle
+import binascii
+import importlib.util
+
+with open(sys.argv[-1], "rb") as fh:
+    parameters = pickle.load(fh)
+
+spec = importlib.util.spec_from_file_location(
+    "runner_connection", parameters["runner_connection"]
+)
+runner_connection = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(runner_connection)
+
+connection = runner_connection.RunnerConnection.connect(
+    parameters["address"], binascii.unhexlify(parameters["token"])
+)
+while connection.poll(parameters["idle_timeout"]):
+    try:
+        request = connection.receive()
+    except EOFError:
+        break
+    time.sleep(request.get("sleep", 0))
+    if request.get("returncode"):
+        connection.send({"returncode": request["returncode"], "output": "failed"})
+        break
+    connection.send(
+        {"returncode": 0, "output": "%s %s" % (os.getpid(), request["value"])}
+    )
+connection.close()
@@ -7,11 +7,13 @@
 
 import sys
 import os
+import asyncio
 import time
 import shutil
 
 from unittest.mock import patch
 from tank_test.tank_test_base import setUpModule  # noqa
+import sgtk
 
 # import the test base class
 test_python_path = os.path.abspath(
@@ -128,6 +130,535 @@ class TestDataRetriever(TestShotgunUtilsFramework):
         )
         self.assertGreaterEqual(os.path.getmtime(thumb_path), now)
 
+    def test_thumbnail_variants(self):
+        """
+        Test pre-scaled thumbnail variants generation and lookup.
+        """
+        QtGui = sgtk.platform.qt.QtGui
+        retriever = self.shotgun_data.ShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+
+        thumb_path, thumb_exists = retriever._get_thumbnail_path(
+            "https://foo/bar/variants.png", self.framework
+        )
+        self.assertFalse(thumb_exists)
+        thumb_path = "%s.png" % thumb_path
+        self.framework.ensure_folder_exists(os.path.dirname(thumb_path))
+        image = QtGui.QImage(200, 100, QtGui.QImage.Format_RGB32)
+        image.fill(0)
+        self.assertTrue(image.save(thumb_path))
+
+        # The smallest variant at least as large as the requested size is used.
+        variant_path = retriever._get_thumbnail_variant(thumb_path, 100)
+        self.assertEqual(
+            variant_path, retriever._get_thumbnail_variant_path(thumb_path, 128)
+        )
+        variant = QtGui.QImage(variant_path)
+        self.assertEqual((variant.width(), variant.height()), (128, 64))
+        self.assertTrue(
+            os.path.exists(retriever._get_thumbnail_variant_path(thumb_path, 64))
+        )
+        # Images are never upscaled, the full thumbnail is used instead.
+        self.assertFalse(
+            os.path.exists(retriever._get_thumbnail_variant_path(thumb_path, 256))
+        )
+        self.assertEqual(retriever._get_thumbnail_variant(thumb_path, 250), thumb_path)
+        self.assertEqual(retriever._get_thumbnail_variant(thumb_path, 512), thumb_path)
+
+        # Variants don't interfere with the lookup of the cached thumbnail.
+        self.assertEqual(
+            retriever._get_thumbnail_path(
+                "https://foo/bar/variants.png", self.framework
+            ),
+            (thumb_path, True),
+        )
+        result = retriever._task_check_thumbnail(
+            "https://foo/bar/variants.png", True, size=32
+        )
+        self.assertEqual(
+            result["thumb_path"],
+            retriever._get_thumbnail_variant_path(thumb_path, 64),
+        )
+        self.assertEqual(result["image"].width(), 64)
+
+    def test_thumbnail_source_batch(self):
+        """
+        Test batched thumbnail source requests.
+        """
+        retriever = self.shotgun_data.ShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+        self.add_to_sg_mock_db(
+            [
+                {"type": "Asset", "id": 1, "image": "https://foo/asset/1.png"},
+                {"type": "Asset", "id": 2, "image": None},
+                {"type": "Shot", "id": 3, "image": "https://foo/shot/3.png"},
+            ]
+        )
+
+        # Entities without a thumbnail are resolved with a query per entity type.
+        result = retriever._task_resolve_thumbnail_sources(
+            {"Asset": [1, 2], "Shot": [3]}
+        )
+        self.assertEqual(result["has_thumbnail"], set([("Asset", 1), ("Shot", 3)]))
+
+        # Run the batch without actually running tasks.
+        added_tasks = []
+
+        def _add_task(cbl, *args, **kwargs):
+            added_tasks.append((cbl, kwargs.get("task_kwargs")))
+            return len(added_tasks)
+
+        completed = []
+        retriever.work_completed.connect(
+            lambda uid, request_type, data: completed.append((uid, request_type, data))
+        )
+        group = retriever._bg_tasks_group
+        with patch.object(retriever._task_manager, "add_task", side_effect=_add_task):
+            request_ids = retriever.request_thumbnail_sources(
+                [("Asset", 1), ("Asset", 2), ("Shot", 3)],
+                max_concurrent_downloads=1,
+            )
+            # One resolve task and one check task per entity.
+            self.assertEqual(len(added_tasks), 4)
+            self.assertEqual(request_ids[("Asset", 1)], "2")
+            self.assertEqual(added_tasks[0][1]["entity_ids_by_type"]["Asset"], [1, 2])
+
+            # Nothing is cached, nothing is downloaded before sources are resolved.
+            for task_id in (2, 3, 4):
+                retriever._on_task_completed(
+                    task_id,
+                    group,
+                    {"action": "check_thumbnail", "thumb_path": None, "image": None},
+                )
+            self.assertEqual(len(added_tasks), 4)
+            retriever._on_task_completed(1, group, result)
+            # Asset 2 has no thumbnail, only one download runs at a time.
+            self.assertEqual(
+                completed,
+                [("3", "download_thumbnail", {"thumb_path": None, "image": None})],
+            )
+            self.assertEqual(len(added_tasks), 5)
+            self.assertEqual(added_tasks[4][1]["entity_id"], 1)
+
+            retriever._on_task_completed(
+                5,
+                group,
+                {"action": "download_thumbnail", "thumb_path": "/a/1", "image": None},
+            )
+            self.assertEqual(completed[-1][0], "2")
+            self.assertEqual(len(added_tasks), 6)
+            self.assertEqual(added_tasks[5][1]["entity_type"], "Shot")
+            retriever._on_task_failed(6, group, "Failed", None)
+            self.assertEqual(len(added_tasks), 6)
+        self.assertEqual(retriever._thumb_batch_task_map, {})
+        self.assertEqual(retriever._thumb_task_id_map, {})
+
+    def test_stop_thumbnail_source_batch(self):
+        """
+        Test stopped requests of a thumbnail source batch release their download.
+        """
+        retriever = self.shotgun_data.ShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+        entities = [("Asset", 1), ("Asset", 2), ("Shot", 3)]
+        result = {"action": "resolve_thumbnail_sources", "has_thumbnail": set(entities)}
+
+        added_tasks = []
+
+        def _add_task(cbl, *args, **kwargs):
+            added_tasks.append(kwargs.get("task_kwargs"))
+            return len(added_tasks)
+
+        group = retriever._bg_tasks_group
+        task_manager = retriever._task_manager
+        with patch.object(task_manager, "add_task", side_effect=_add_task):
+            with patch.object(task_manager, "stop_task") as stop_task:
+                request_ids = retriever.request_thumbnail_sources(
+                    entities, max_concurrent_downloads=1
+                )
+                for task_id in (2, 3, 4):
+                    retriever._on_task_completed(
+                        task_id,
+                        group,
+                        {
+                            "action": "check_thumbnail",
+                            "thumb_path": None,
+                            "image": None,
+                        },
+                    )
+                retriever._on_task_completed(1, group, result)
+                self.assertEqual(len(added_tasks), 5)
+
+                # Stopping a request waiting for a download drops it, stopping a
+                # downloading one stops its download and starts the next one.
+                retriever.stop_work(request_ids[("Asset", 2)])
+                retriever.stop_work(request_ids[("Asset", 1)])
+                stop_task.assert_any_call(5)
+                self.assertEqual(len(added_tasks), 6)
+                self.assertEqual(added_tasks[5]["entity_type"], "Shot")
+
+                retriever._on_task_completed(
+                    6,
+                    group,
+                    {"action": "download_thumbnail", "thumb_path": "/a", "image": None},
+                )
+        self.assertEqual(retriever._thumb_batch_task_map, {})
+        self.assertEqual(retriever._thumb_task_id_map, {})
+
+    def test_thumbnail_request_scheduling(self):
+        """
+        Test thumbnail requests made in a deferred scheduling block are scheduled
+        in a single pass, without holding back the other tasks of the task manager
+        once it is exited.
+        """
+        retriever = self.shotgun_data.HeadlessShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+        manager = retriever._task_manager
+        with patch.object(manager, "_start_next_task", return_value=False) as patched:
+            with retriever.deferred_scheduling():
+                request_ids = [
+                    retriever.request_thumbnail(
+                        "https://foo/bar/%d.png" % i, "Asset", i, "image"
+                    )
+                    for i in range(100)
+                ]
+                self.assertEqual(patched.call_count, 0)
+            self.assertEqual(len(set(request_ids)), 100)
+            self.assertEqual(patched.call_count, 1)
+            self.assertEqual(len(manager._pending_tasks), 200)
+
+            # The check and download of a single request are scheduled together.
+            retriever.request_thumbnail(
+                "https://foo/bar/100.png", "Asset", 100, "image"
+            )
+            self.assertEqual(patched.call_count, 2)
+
+            # Tasks added afterwards are scheduled right away.
+            manager.add_task(lambda: {})
+            self.assertEqual(patched.call_count, 3)
+
+    def test_request_futures(self):
+        """
+        Test futures for the results of requests.
+        """
+        retriever = self.shotgun_data.ShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+        task_manager = self.framework.import_module("task_manager")
+        group = retriever._bg_tasks_group
+
+        find_id = retriever.execute_find("Asset", [])
+        find_future = retriever.get_future(find_id)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        async_future = retriever.get_async_future(find_id, loop)
+        retriever._on_task_completed(
+            int(find_id), group, {"action": "find", "sg_result": []}
+        )
+        self.assertEqual(find_future.result(), {"sg": []})
+        self.assertEqual(loop.run_until_complete(async_future), {"sg": []})
+
+        failed_id = retriever.execute_find("Asset", [])
+        failed_future = retriever.get_future(failed_id)
+        retriever._on_task_failed(int(failed_id), group, "Failed", None)
+        self.assertIsInstance(failed_future.exception(), task_manager.TaskFailedError)
+
+        # Cancelling a future stops the request.
+        cancelled_id = retriever.execute_find("Asset", [])
+        self.assertTrue(retriever.get_future(cancelled_id).cancel())
+        self.assertNotIn(int(cancelled_id), retriever._task_manager._tasks_by_id)
+        stopped_future = retriever.get_future(retriever.execute_find("Asset", []))
+        retriever.clear()
+        self.assertTrue(stopped_future.cancelled())
+
+    def test_headless_retriever(self):
+        """
+        Test the data retriever which doesn't depend on Qt.
+        """
+        retriever = self.shotgun_data.HeadlessShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+        retriever.start()
+        self.add_to_sg_mock_db([{"type": "Asset", "id": 1, "code": "foo"}])
+        completed = []
+        retriever.work_completed.connect(
+            lambda uid, request_type, data: completed.append((uid, request_type))
+        )
+
+        def _fail(sg):
+            raise ValueError("bad")
+
+        find_id = retriever.execute_find("Asset", [], ["code"])
+        failed_id = retriever.execute_method(_fail)
+        find_future = retriever.get_future(find_id)
+        failed_future = retriever.get_future(failed_id)
+        self.assertTrue(retriever.wait_for_requests([find_id, failed_id], timeout=10))
+        self.assertEqual(completed, [(find_id, "find")])
+        self.assertEqual(find_future.result()["sg"][0]["code"], "foo")
+        self.assertEqual(str(failed_future.exception()), "bad")
+
+    def test_streamed_requests(self):
+        """
+        Test partial results are emitted for streamed finds and attachments.
+        """
+        retriever = self.shotgun_data.HeadlessShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+        retriever.start()
+        progress = []
+        retriever.work_progress.connect(
+            lambda uid, request_type, data: progress.append((request_type, data))
+        )
+
+        page_size = retriever._FIND_PAGE_SIZE
+        records = [{"type": "Asset", "id": i} for i in range(page_size * 2 + 1)]
+
+        def _find(entity_type, filters, fields=None, limit=0, page=0, **kwargs):
+            return records[(page - 1) * limit : page * limit]
+
+        with patch.object(self.mockgun, "find", side_effect=_find):
+            find_id = retriever.execute_find("Asset", [], ["id"], stream_pages=True)
+            find_future = retriever.get_future(find_id)
+            self.assertTrue(retriever.wait_for_requests([find_id], timeout=10))
+        self.assertEqual(
+            [data["sg"] for request_type, data in progress],
+            [records[:page_size], records[page_size:-1], records[-1:]],
+        )
+        self.assertEqual(find_future.result()["sg"], records)
+
+        # Cached attachments are reported one by one.
+        attachments = []
+        for i in range(1, 3):
+            file_path = os.path.join(self.tank_temp, "attachment_%d.txt" % i)
+            open(file_path, "w").close()
+            attachments.append(
+                {
+                    "type": "Attachment",
+                    "id": i,
+                    "this_file": {"url": "https://foo/%d" % i, "name": file_path},
+                }
+            )
+        del progress[:]
+        with patch.object(
+            retriever,
+            "_get_attachment_path",
+            side_effect=lambda entity, bundle: entity["this_file"]["name"],
+        ):
+            request_id = retriever.request_attachments(attachments)
+            future = retriever.get_future(request_id)
+            self.assertTrue(retriever.wait_for_requests([request_id], timeout=10))
+        self.assertEqual(
+            [
+                (request_type, data["attachment"]["id"])
+                for request_type, data in progress
+            ],
+            [("download_attachments", 1), ("download_attachments", 2)],
+        )
+        self.assertEqual(
+            future.result()["file_paths"],
+            {
+                1: attachments[0]["this_file"]["name"],
+                2: attachments[1]["this_file"]["name"],
+            },
+        )
+
+    def test_query_cache(self):
+        """
+        Test memoization of query results.
+        """
+        QueryResultCache = self.shotgun_data.QueryResultCache
+
+        # Keys don't depend on the order of named parameters or dictionary keys.
+        key = QueryResultCache.make_key(
+            "find",
+            ["Asset", [["project", "is", {"type": "Project", "id": 1}]]],
+            {"fields": ["code"], "order": []},
+        )
+        self.assertEqual(
+            key,
+            QueryResultCache.make_key(
+                "find",
+                ["Asset", [["project", "is", {"id": 1, "type": "Project"}]]],
+                {"order": [], "fields": ["code"]},
+            ),
+        )
+        self.assertNotEqual(
+            key, QueryResultCache.make_key("find_one", ["Asset", []], {})
+        )
+
+        cache = QueryResultCache(max_entries=2)
+        self.assertEqual(cache.get(key), (False, None))
+        cache.put(key, [{"type": "Asset", "id": 1}], 60)
+        found, result = cache.get(key)
+        self.assertTrue(found)
+        self.assertEqual(result, [{"type": "Asset", "id": 1}])
+        # Cached data can't be modified through a returned result.
+        result.append({"type": "Asset", "id": 2})
+        self.assertEqual(cache.get(key)[1], [{"type": "Asset", "id": 1}])
+
+        # Least recently used entries are evicted first.
+        cache.put("foo", 1, 60)
+        cache.get(key)
+        cache.put("bar", 2, 60)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("foo"), (False, None))
+        self.assertTrue(cache.get(key)[0])
+
+        # Expired entries are not returned.
+        cache.put("expired", 3, -1)
+        self.assertEqual(cache.get("expired"), (False, None))
+
+        # Entries survive a save and load round trip.
+        cache_path = os.path.join(self.framework.cache_location, "query_cache.test")
+        cache = QueryResultCache(cache_path=cache_path)
+        cache.put(key, [{"type": "Asset", "id": 1}], 60)
+        cache.put("expired", 3, -1)
+        cache.save()
+        cache = QueryResultCache(cache_path=cache_path)
+        self.assertTrue(cache.load())
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get(key), (True, [{"type": "Asset", "id": 1}]))
+
+    @patch("time.sleep")
+    def test_retry_transient_errors(self, patched_sleep):
+        """
+        Test read calls are retried with a backoff on transient errors.
+        """
+        retriever = self.shotgun_data.ShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+
+        # A fake server which fails twice before answering.
+        sg_find = self.mockgun.find
+        with patch.object(
+            self.mockgun,
+            "find",
+            side_effect=[ConnectionError("reset"), ConnectionError("reset"), []],
+        ):
+            result = retriever._task_execute_find("Asset", [])
+        self.assertEqual(result, {"action": "find", "sg_result": []})
+        self.assertEqual(retriever.retry_count, 2)
+        self.assertEqual(patched_sleep.call_count, 2)
+        # The backoff delay grows between attempts.
+        first_delay = patched_sleep.call_args_list[0][0][0]
+        self.assertLessEqual(first_delay, retriever._RETRY_BASE_DELAY)
+
+        # Errors which are not transient are raised straight away.
+        with patch.object(self.mockgun, "find", side_effect=ValueError("bad")):
+            with self.assertRaises(ValueError):
+                retriever._task_execute_find("Asset", [])
+        self.assertEqual(retriever.retry_count, 2)
+
+        # Writes are never retried.
+        with patch.object(self.mockgun, "create", side_effect=ConnectionError("reset")):
+            with self.assertRaises(ConnectionError):
+                retriever._task_execute_create("Asset", {})
+        self.assertEqual(retriever.retry_count, 2)
+
+        # Give up after the maximum number of retries.
+        with patch.object(self.mockgun, "find", side_effect=TimeoutError("slow")):
+            with self.assertRaises(TimeoutError):
+                retriever._task_execute_find("Asset", [])
+        self.assertEqual(retriever.retry_count, 2 + retriever._MAX_RETRIES)
+        self.assertEqual(retriever.get_throttling_stats()["retries"], 5)
+        self.assertIs(self.mockgun.find, sg_find)
+
+    @patch("time.sleep")
+    def test_retry_transient_download_errors(self, patched_sleep):
+        """
+        Test downloads and url refreshes are retried with a backoff on transient
+        errors, which are reported to the concurrency limiter.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        limiter = task_manager.AdaptiveConcurrencyLimiter()
+        manager = task_manager.BackgroundTaskManager(None, concurrency_limiter=limiter)
+        self.addCleanup(manager.shut_down)
+        retriever = self.shotgun_data.ShotgunDataRetriever(bg_task_manager=manager)
+        self.addCleanup(retriever.stop)
+        file_path = os.path.join(self.tank_temp, "download_retry.png")
+        with open(file_path, "w"):
+            pass
+
+        attempts = []
+
+        def _download_url(sg, url, path, use_url_extension=False):
+            attempts.append(url)
+            if len(attempts) <= 2:
+                # sgtk.util.download_url reports errors as TankErrors.
+                try:
+                    raise ConnectionResetError("reset")
+                except ConnectionResetError as e:
+                    raise sgtk.TankError("Could not download %s: %s" % (url, e))
+            return path
+
+        with patch.object(sgtk.util, "download_url", side_effect=_download_url):
+            self.assertEqual(
+                retriever._download_url(
+                    file_path, "https://foo/1.png", "Asset", 1, "image"
+                ),
+                file_path,
+            )
+        self.assertEqual(attempts, ["https://foo/1.png"] * 3)
+        self.assertEqual(retriever.retry_count, 2)
+        self.assertEqual(patched_sleep.call_count, 2)
+        self.assertEqual(limiter.get_stats()["failures"], 2)
+        self.assertEqual(limiter.get_stats()["successes"], 1)
+
+        # Expired urls are refreshed, which is retried as well.
+        self.add_to_sg_mock_db(
+            [{"type": "Asset", "id": 1, "image": "https://foo/2.png"}]
+        )
+        asset = self.mockgun.find_one("Asset", [["id", "is", 1]], ["image"])
+        with patch.object(
+            sgtk.util,
+            "download_url",
+            side_effect=[sgtk.TankError("expired"), file_path],
+        ) as download_url:
+            with patch.object(
+                self.mockgun, "find_one", side_effect=[ConnectionError("reset"), asset]
+            ):
+                retriever._download_url(
+                    file_path, "https://foo/1.png", "Asset", 1, "image"
+                )
+        self.assertEqual(download_url.call_args[0][1], "https://foo/2.png")
+        self.assertEqual(retriever.retry_count, 3)
+        self.assertEqual(limiter.get_stats()["failures"], 3)
+
+    def test_cancellable_find(self):
+        """
+        Test finds run by tasks which can be cancelled are paged.
+        """
+        task_manager = self.framework.import_module("task_manager")
+        retriever = self.shotgun_data.ShotgunDataRetriever()
+        self.addCleanup(retriever.stop)
+        token = task_manager.CancellationToken()
+        task_manager.CancellationToken._set_current(token)
+        self.addCleanup(task_manager.CancellationToken._set_current, None)
+
+        page_size = retriever._FIND_PAGE_SIZE
+        records = [{"type": "Asset", "id": i} for i in range(page_size * 2 + 1)]
+
+        def _find(entity_type, filters, fields=None, limit=0, page=0, **kwargs):
+            return records[(page - 1) * limit : page * limit]
+
+        with patch.object(self.mockgun, "find", side_effect=_find) as patched:
+            result = retriever._task_execute_find("Asset", [], ["id"])
+            self.assertEqual(result["sg_result"], records)
+            self.assertEqual(patched.call_count, 3)
+            # Explicit limits are not paged.
+            result = retriever._task_execute_find("Asset", [], limit=1, page=2)
+            self.assertEqual(result["sg_result"], records[1:2])
+            self.assertEqual(patched.call_count, 4)
+            # A limit or page of 0 is the same as no limit or page.
+            result = retriever._task_execute_find("Asset", [], ["id"], limit=0, page=0)
+            self.assertEqual(result["sg_result"], records)
+            self.assertEqual(patched.call_count, 7)
+
+            # Cancelled finds stop between pages.
+            def _cancelling_find(*args, **kwargs):
+                token.cancel()
+                return _find(*args, **kwargs)
+
+            patched.side_effect = _cancelling_find
+            with self.assertRaises(task_manager.TaskCancelledError):
+                retriever._task_execute_find("Asset", [])
+            self.assertEqual(patched.call_count, 8)
+
     def test_cleaning_cached_data(self):
         """
         Test cleaning up cached data.
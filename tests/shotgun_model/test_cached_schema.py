@@ -8,8 +8,12 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+import os
 import sys
+import copy
 import time
+import threading
+import unittest
 
 from unittest import mock
 
@@ -30,6 +34,16 @@ class TestCachedSchema(TestShotgunUtilsFramework):
 
         self._patch_mockgun("schema_read")
         self._patch_mockgun("schema_entity_read")
+        field_schema = self.mockgun.schema_read()
+        patcher = mock.patch.object(
+            self.mockgun,
+            "schema_field_read",
+            side_effect=lambda entity_type, project_entity=None: field_schema[
+                entity_type
+            ],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
         # We need a background task manager so the schema can be cached in a background thread.
         self._bg_task_manager = self.framework.import_module(
@@ -115,6 +129,355 @@ class TestCachedSchema(TestShotgunUtilsFramework):
         assert invalid_type not in valid_entity_types
         assert not self._cached_schema.is_valid_entity_type(invalid_type)
 
+    def test_schema_store(self):
+        """
+        Test the fields of each entity type are only decoded when looked up.
+        """
+        schema_store = self._shotgun_globals.schema_store
+        field_schema = self.mockgun.schema_read()
+        type_schema = self.mockgun.schema_entity_read()
+        path = os.path.join(self.tank_temp, "test_schema.store")
+        schema_store.SchemaStore.write(path, field_schema, type_schema)
+
+        store = schema_store.SchemaStore(path)
+        assert store.type_schema == type_schema
+        assert sorted(store.field_schema) == sorted(field_schema)
+        assert "Asset" in store.field_schema
+        assert store._decoded_fields == {}
+        assert store.field_schema["Asset"] == field_schema["Asset"]
+        assert list(store._decoded_fields) == ["Asset"]
+        with self.assertRaises(KeyError):
+            store.field_schema["bad entity"]
+
+        # The new index is loaded if the file is written again.
+        schema_store.SchemaStore.write(
+            path, {"Shot": field_schema["Shot"]}, {"Shot": type_schema["Shot"]}
+        )
+        assert store.field_schema["Shot"] == field_schema["Shot"]
+        assert list(store.type_schema) == ["Shot"]
+        assert "Asset" not in store.field_schema
+
+        # The schema cached by the schema manager is loaded lazily.
+        self._trigger_cache_load()
+        assert os.path.isfile(self._cached_schema._get_schema_cache_path())
+        assert self._cached_schema._load_cached_schema()
+        project_id = self._cached_schema._get_current_project_id()
+        fields = self._cached_schema._field_schema[project_id]
+        assert fields._store._decoded_fields == {}
+        assert self._shotgun_globals.get_field_display_name("Asset", "code") == (
+            field_schema["Asset"]["code"]["name"]["value"]
+        )
+        assert list(fields._store._decoded_fields) == ["Asset"]
+
+    def test_preload(self):
+        """
+        Test cached values are preloaded in the background without blocking lookups.
+        """
+        type_schema = self.mockgun.schema_entity_read()
+        self._trigger_cache_load()
+
+        # Forget the values loaded in memory, they'll be preloaded from disk.
+        self._cached_schema._field_schema.clear()
+        self._cached_schema._type_schema.clear()
+        self._cached_schema._status_data.clear()
+        self.mockgun.schema_read.reset_mock()
+        self.mockgun.schema_entity_read.reset_mock()
+
+        self._shotgun_globals.preload()
+        project_id = self._cached_schema._get_current_project_id()
+        assert self._cached_schema._is_preloading(project_id)
+
+        # Lookups return fallback values until the values are preloaded.
+        assert self._shotgun_globals.get_type_display_name("Asset") == "Asset"
+        assert self._cached_schema._is_schema_loaded() is False
+
+        before = time.time()
+        while self._cached_schema._is_preloading(project_id):
+            self._qapp.processEvents()
+            assert before + 5 > time.time(), "Timeout, preloading took too long."
+
+        assert self._cached_schema._is_schema_loaded() is True
+        assert self._cached_schema._is_status_loaded() is True
+        assert self._shotgun_globals.get_type_display_name("Asset") == (
+            type_schema["Asset"]["name"]["value"]
+        )
+        # The values were read from disk.
+        assert self.mockgun.schema_read.called is False
+
+    def test_shared_schema_store(self):
+        """
+        Test schema cache files are written atomically under a lock.
+        """
+        schema_store = self._shotgun_globals.schema_store
+        cache_file = self._shotgun_globals.cache_file
+        field_schema = self.mockgun.schema_read()
+        type_schema = self.mockgun.schema_entity_read()
+        path = os.path.join(self.tank_temp, "shared_schema.store")
+        schema_store.SchemaStore.write(path, field_schema, type_schema)
+        store = schema_store.SchemaStore(path)
+
+        # Writers wait for the lock to be released.
+        writer = threading.Thread(
+            target=schema_store.SchemaStore.write,
+            args=(path, {"Shot": field_schema["Shot"]}, {"Shot": type_schema["Shot"]}),
+        )
+        with cache_file.file_lock(path):
+            writer.start()
+            writer.join(0.5)
+            assert writer.is_alive()
+            assert "Asset" in schema_store.SchemaStore(path).field_schema
+        writer.join()
+
+        # The replaced file is still readable until the new one is loaded.
+        assert "Asset" in store.entity_types
+        assert store._read_blob("Asset")
+        assert store.field_schema["Shot"] == field_schema["Shot"]
+        assert list(store.entity_types) == ["Shot"]
+        assert not [
+            name for name in os.listdir(self.tank_temp) if name.endswith(".tmp")
+        ]
+
+    def test_schema_check(self):
+        """
+        Test an old cached schema is checked once, and only the changed entity
+        types are read again.
+        """
+        field_schema = self.mockgun.schema_read()
+        type_schema = copy.deepcopy(self.mockgun.schema_entity_read())
+        self._trigger_cache_load()
+        project_id = self._cached_schema._get_current_project_id()
+        schema_cache_path = self._cached_schema._get_schema_cache_path(project_id)
+
+        # Rename an entity type and load the schema from disk again.
+        type_schema["Shot"]["name"]["value"] = "Renamed Shot"
+        self.mockgun.schema_entity_read.reset_mock()
+        self.mockgun.schema_entity_read.return_value = type_schema
+        self.mockgun.schema_read.reset_mock()
+
+        # A recent cache is not checked.
+        assert self._cached_schema._load_cached_schema()
+        self._shotgun_globals.get_type_display_name("Asset")
+        assert project_id not in self._cached_schema._schema_checks
+        assert self._cached_schema._sg_schema_check_ids == {}
+        assert self.mockgun.schema_entity_read.called is False
+
+        # An old cache is checked the first time an entity type is looked up.
+        old_time = time.time() - self._cached_schema.SCHEMA_CHECK_INTERVAL - 60
+        os.utime(schema_cache_path, (old_time, old_time))
+        assert self._cached_schema._load_cached_schema()
+        self._shotgun_globals.get_type_display_name("Asset")
+        assert self._shotgun_globals.get_type_display_name("Shot") != "Renamed Shot"
+
+        before = time.time()
+        while self._cached_schema._sg_schema_check_ids:
+            self._qapp.processEvents()
+            assert before + 5 > time.time(), "Timeout, the check took too long."
+
+        # Only the fields of the looked up and renamed entity types were read.
+        assert self.mockgun.schema_read.called is False
+        assert self.mockgun.schema_entity_read.call_count == 1
+        assert sorted(
+            call[0][0] for call in self.mockgun.schema_field_read.call_args_list
+        ) == ["Asset", "Shot"]
+        assert self._shotgun_globals.get_type_display_name("Shot") == "Renamed Shot"
+
+        # The schema is not checked again.
+        assert project_id not in self._cached_schema._schema_checks
+        self._shotgun_globals.get_type_display_name("Version")
+        assert self._cached_schema._sg_schema_check_ids == {}
+
+        # The changes were merged into the cache, which is recent again.
+        assert os.path.getmtime(schema_cache_path) > old_time + 60
+        assert self._cached_schema._load_cached_schema()
+        assert project_id not in self._cached_schema._schema_checks
+        assert self._shotgun_globals.get_type_display_name("Shot") == "Renamed Shot"
+        fields = self._cached_schema._field_schema[project_id]
+        for entity_type in field_schema:
+            assert fields[entity_type] == field_schema[entity_type]
+
+    def test_schema_check_up_to_date(self):
+        """
+        Test an old cached schema which is up to date is not checked again.
+        """
+        self._trigger_cache_load()
+        project_id = self._cached_schema._get_current_project_id()
+        schema_cache_path = self._cached_schema._get_schema_cache_path(project_id)
+
+        old_time = time.time() - self._cached_schema.SCHEMA_CHECK_INTERVAL - 60
+        os.utime(schema_cache_path, (old_time, old_time))
+        with open(schema_cache_path, "rb") as fh:
+            content = fh.read()
+        assert self._cached_schema._load_cached_schema()
+        self._shotgun_globals.get_type_display_name("Asset")
+
+        before = time.time()
+        while self._cached_schema._sg_schema_check_ids:
+            self._qapp.processEvents()
+            assert before + 5 > time.time(), "Timeout, the check took too long."
+
+        # The cache was touched rather than written again.
+        with open(schema_cache_path, "rb") as fh:
+            assert fh.read() == content
+        assert os.path.getmtime(schema_cache_path) > old_time + 60
+        assert self._cached_schema._load_cached_schema()
+        assert project_id not in self._cached_schema._schema_checks
+
+    def test_prefetch_statuses(self):
+        """
+        Test the statuses of several projects are loaded with a single query.
+        """
+        project_id = self._cached_schema._get_current_project_id()
+        project_ids = [project_id, project_id + 1, project_id + 2]
+        loaded_project_ids = []
+        self._cached_schema.status_loaded.connect(loaded_project_ids.append)
+
+        with mock.patch.object(
+            self.mockgun, "find", wraps=self.mockgun.find
+        ) as patched_find:
+            self._shotgun_globals.prefetch_statuses(project_ids)
+            # Statuses looked up in the meantime don't trigger another query.
+            self._shotgun_globals.get_status_display_name("ip", project_id + 3)
+
+            before = time.time()
+            while self._cached_schema._sg_status_query_ids:
+                self._qapp.processEvents()
+                assert before + 5 > time.time(), "Timeout, statuses took too long."
+
+        assert patched_find.call_count == 1
+        assert sorted(loaded_project_ids) == project_ids + [project_id + 3]
+        site_statuses = self._cached_schema._site_status_data
+        for loaded_project_id in loaded_project_ids:
+            assert self._cached_schema._status_data[loaded_project_id] is site_statuses
+
+        # Other projects use the site-wide status cache.
+        assert os.path.isfile(self._cached_schema._get_site_status_cache_path())
+        self._cached_schema._site_status_data = None
+        self._shotgun_globals.prefetch_statuses([project_id + 4])
+        assert self._cached_schema._is_status_loaded(project_id + 4)
+        assert self._cached_schema._sg_status_query_ids == {}
+
+    def test_memoized_lookups(self):
+        """
+        Test lookups are memoized once values are loaded, until they are loaded again.
+        """
+        field_schema = self.mockgun.schema_read()
+        project_id = self._cached_schema._get_current_project_id()
+
+        # Fallback values are not memoized.
+        assert self._shotgun_globals.get_field_display_name("Asset", "code") == "code"
+        assert self._cached_schema._field_display_names == {}
+
+        self._trigger_cache_load()
+        display_name = field_schema["Asset"]["code"]["name"]["value"]
+        assert self._shotgun_globals.get_field_display_name("Asset", "code") == (
+            display_name
+        )
+        assert self._shotgun_globals.get_status_color("ip") is None
+        assert self._cached_schema._field_display_names == {
+            project_id: {("Asset", "code"): display_name}
+        }
+        assert self._cached_schema._status_colors == {project_id: {"ip": None}}
+
+        # Memoized values are used until the values are loaded again.
+        self._cached_schema._field_schema[project_id] = {}
+        assert self._shotgun_globals.get_field_display_name("Asset", "code") == (
+            display_name
+        )
+        assert self._cached_schema._load_cached_schema()
+        assert self._cached_schema._field_display_names == {}
+        assert self._cached_schema._status_colors == {project_id: {"ip": None}}
+        assert self._cached_schema._load_cached_status()
+        assert self._cached_schema._status_colors == {}
+
+    def test_reloaded_schema_lookups(self):
+        """
+        Test memoized lookups are reset when the schema cache file written by
+        another process is reloaded.
+        """
+        schema_store = self._shotgun_globals.schema_store
+        field_schema = self.mockgun.schema_read()
+        type_schema = copy.deepcopy(self.mockgun.schema_entity_read())
+        self._trigger_cache_load()
+        assert self._cached_schema._load_cached_schema()
+        project_id = self._cached_schema._get_current_project_id()
+        assert self._shotgun_globals.get_type_display_name("Asset") == (
+            type_schema["Asset"]["name"]["value"]
+        )
+        assert "Asset" in self._cached_schema._type_display_names[project_id]
+
+        # Another process updates the cache file.
+        type_schema["Asset"]["name"]["value"] = "Renamed Asset"
+        schema_store.SchemaStore.write(
+            self._cached_schema._get_schema_cache_path(project_id),
+            field_schema,
+            type_schema,
+        )
+        assert self._shotgun_globals.get_type_display_name("Asset") != "Renamed Asset"
+
+        # It is reloaded when fields are decoded, which resets the lookups.
+        self._shotgun_globals.get_field_display_name("Shot", "code")
+        assert "Asset" not in self._cached_schema._type_display_names.get(
+            project_id, {}
+        )
+        assert self._shotgun_globals.get_type_display_name("Asset") == "Renamed Asset"
+
+    @unittest.skipUnless(
+        os.environ.get("SHOTGUNUTILS_RUN_BENCHMARKS"),
+        "Set SHOTGUNUTILS_RUN_BENCHMARKS to run benchmarks.",
+    )
+    def test_lookup_benchmark(self):
+        """
+        Benchmark memoized display name lookups against the public lookups which
+        looked them up in the schema on each call.
+        """
+        cached_schema = self._cached_schema
+        account_for_bubble_fields = (
+            self._shotgun_globals.cached_schema._account_for_bubble_fields
+        )
+
+        def get_field_display_name(sg_entity_type, field_name, project_id=None):
+            # the lookup done by get_field_display_name before it was memoized.
+            project_id = project_id or cached_schema._get_current_project_id()
+            sg_entity_type, field_name = account_for_bubble_fields(
+                sg_entity_type, field_name
+            )
+            cached_schema._check_schema_refresh(
+                sg_entity_type, field_name, project_id=project_id
+            )
+            if field_name == "type":
+                return "Type"
+            elif (
+                project_id in cached_schema._type_schema
+                and sg_entity_type in cached_schema._type_schema[project_id]
+            ):
+                fields = cached_schema._field_schema[project_id][sg_entity_type]
+                if field_name in fields:
+                    return fields[field_name]["name"]["value"]
+            return field_name
+
+        self._trigger_cache_load()
+        num_lookups = 1000000
+        assert get_field_display_name("Asset", "sg_status_list") == (
+            self._shotgun_globals.get_field_display_name("Asset", "sg_status_list")
+        )
+
+        before = time.perf_counter()
+        for i in range(num_lookups):
+            get_field_display_name("Asset", "sg_status_list")
+        schema_cost = time.perf_counter() - before
+
+        before = time.perf_counter()
+        for i in range(num_lookups):
+            self._shotgun_globals.get_field_display_name("Asset", "sg_status_list")
+        memoized_cost = time.perf_counter() - before
+
+        self.assertLess(
+            memoized_cost,
+            schema_cost,
+            "%d lookups: %.2fs from the schema, %.2fs memoized"
+            % (num_lookups, schema_cost, memoized_cost),
+        )
+
     def _assert_no_unicode(self, value):
         """
         Asserts that a value is not a Python 2 ``unicode`` object.
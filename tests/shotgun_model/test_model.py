@@ -101,3 +101,61 @@ class TestModel(TestShotgunUtilsFramework):
         self.assertEqual("asset1-renamed", model.item(0, 0).text())
         self.assertEqual("asset1-renamed", model.item(0, 1).text())
         self.assertEqual("fin", model.item(0, 3).text())
+
+    def test_thumbnail_request_scheduling(self):
+        """
+        Test the thumbnails requested by the items of a model are scheduled with a
+        single pass when it is populated.
+        """
+        model = self.shotgun_model.ShotgunModel(
+            None, bg_task_manager=self._bg_task_manager
+        )
+        self.addCleanup(model.destroy)
+        model._load_data(
+            entity_type="Asset",
+            filters=None,
+            hierarchy=["code"],
+            fields=["code", "image"],
+        )
+
+        num_items = 50
+        sg_data = [
+            {
+                "code": "asset%d" % i,
+                "id": i,
+                "image": "https://foo/bar/%d.png" % i,
+                "type": "Asset",
+            }
+            for i in range(num_items)
+        ]
+        with patch.object(model._sg_data_retriever, "execute_method"), patch.object(
+            self._bg_task_manager, "_start_next_task", return_value=False
+        ) as patched:
+            model._ShotgunQueryModel__on_sg_data_arrived(sg_data)
+
+        self.assertEqual(model.rowCount(), num_items)
+        self.assertEqual(len(model._ShotgunQueryModel__thumb_map), num_items)
+        self.assertEqual(patched.call_count, 1)
+
+    def test_thumbnail_size(self):
+        """
+        Test thumbnails are requested at the size set on the model.
+        """
+        model = self.shotgun_model.ShotgunModel(
+            None, bg_task_manager=self._bg_task_manager
+        )
+        self.addCleanup(model.destroy)
+        self.assertIsNone(model.thumbnail_size)
+
+        url = "https://foo/bar/1.png"
+        item = self.shotgun_model.ShotgunStandardItem("asset")
+        with patch.object(
+            model._sg_data_retriever, "request_thumbnail", return_value="1234"
+        ) as patched:
+            model._request_thumbnail_download(item, "image", url, "Asset", 1)
+            self.assertIsNone(patched.call_args[1]["size"])
+
+            model.set_thumbnail_size(64)
+            self.assertEqual(model.thumbnail_size, 64)
+            model._request_thumbnail_download(item, "image", url, "Asset", 1)
+            self.assertEqual(patched.call_args[1]["size"], 64)